@@ -0,0 +1,62 @@
+"""Compares two benchmark result files of the same suite.
+
+Usage::
+
+    python benchmarks/compare.py baseline.json current.json [--threshold 0.1]
+
+Prints the relative change of each benchmark and exits with status 1
+if the throughput of any benchmark regressed by more than the
+threshold.
+"""
+import argparse
+import sys
+
+import results
+
+
+def compare(baseline, current, threshold):
+    """Prints the comparison and returns the names of the regressed
+    benchmarks."""
+    base = {entry["name"]: entry for entry in baseline["results"]}
+    regressions = []
+
+    print("{:<32} {:>12} {:>12} {:>9}".format(
+        "name", "baseline", "current", "change"))
+    for entry in current["results"]:
+        reference = base.get(entry["name"])
+        if reference is None or not reference.get("throughput"):
+            continue
+
+        change = entry["throughput"] / reference["throughput"] - 1
+        flag = ""
+        if change < -threshold:
+            flag = " REGRESSION"
+            regressions.append(entry["name"])
+
+        print("{:<32} {:>12.1f} {:>12.1f} {:>+8.1%}{}".format(
+            entry["name"], reference["throughput"], entry["throughput"],
+            change, flag))
+
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("baseline")
+    parser.add_argument("current")
+    parser.add_argument("--threshold", type=float, default=0.1,
+                        help="Tolerated relative throughput loss")
+    args = parser.parse_args()
+
+    baseline = results.load(args.baseline)
+    current = results.load(args.current)
+    if baseline["suite"] != current["suite"]:
+        sys.exit("Cannot compare {} results with {} results".format(
+            baseline["suite"], current["suite"]))
+
+    if compare(baseline, current, args.threshold):
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,107 @@
+"""Resources and synthetic data shared by the benchmarks."""
+from collections import OrderedDict
+
+from marshmallow_jsonapi import Schema, fields
+from tornado import gen, web
+
+from tornado_rest_jsonapi.api import Api
+from tornado_rest_jsonapi.resource import ResourceDetails, ResourceList
+from tornado_rest_jsonapi.tests.resource_handlers import WorkingDataLayer
+
+
+class TeacherSchema(Schema):
+    class Meta:
+        type_ = "teacher"
+        self_url = '/api/v1/teachers/{id}/'
+        self_url_kwargs = {'id': '<id>'}
+        self_url_many = '/api/v1/teachers/'
+
+    id = fields.Str()
+    name = fields.String(required=True)
+    discipline = fields.String()
+
+
+class StudentSchema(Schema):
+    class Meta:
+        type_ = "student"
+        self_url = '/api/v1/students/{id}/'
+        self_url_kwargs = {'id': '<id>'}
+        self_url_many = '/api/v1/students/'
+
+    id = fields.Str()
+    name = fields.String(required=True)
+    age = fields.Int(required=True)
+    email = fields.String()
+    bio = fields.String()
+    tutor = fields.Relationship(
+        related_url='/api/v1/teachers/{teacher_id}/',
+        related_url_kwargs={'teacher_id': '<tutor.id>'},
+        include_resource_linkage=True,
+        type_='teacher',
+        schema='TeacherSchema')
+
+
+class BenchDataLayer(WorkingDataLayer):
+    """In-memory data layer, supporting sorting on top of the
+    test data layer."""
+
+    collection = OrderedDict()
+    id = 0
+
+    @gen.coroutine
+    def get_collection(self, qs, view_kwargs):
+        values = list(self.collection.values())
+        for sort in reversed(qs.sorting):
+            values.sort(key=lambda x: x[sort["field"]],
+                        reverse=sort["order"] == "desc")
+
+        pagination = qs.pagination
+        number = pagination.get("number", 0)
+        size = pagination.get("size", 10)
+        return len(values), values[number*size:(number+1)*size]
+
+
+class StudentList(ResourceList):
+    schema = StudentSchema
+    data_layer = {"class": BenchDataLayer}
+
+
+class StudentDetails(ResourceDetails):
+    schema = StudentSchema
+    data_layer = {"class": BenchDataLayer}
+
+
+def populate(num_items, num_teachers=10, bio_length=160):
+    """Fills the data layer with synthetic students, each with a
+    tutor among num_teachers teachers, and a biography of bio_length
+    characters."""
+    teachers = [
+        dict(id=str(i), name="teacher {}".format(i), discipline="maths")
+        for i in range(num_teachers)
+    ]
+
+    collection = OrderedDict()
+    for i in range(num_items):
+        identifier = str(i)
+        collection[identifier] = dict(
+            id=identifier,
+            name="student {}".format(i),
+            age=18 + (i * 7) % 30,
+            email="student{}@example.com".format(i),
+            bio=("A rather long biography. " * (bio_length // 25 + 1))[
+                :bio_length],
+            tutor=teachers[i % num_teachers],
+        )
+
+    BenchDataLayer.collection = collection
+    BenchDataLayer.id = num_items
+
+
+def make_application(**settings):
+    """Returns a tornado application and its Api, with the student
+    resources registered."""
+    application = web.Application(**settings)
+    api = Api(application, base_urlpath='/api/v1/')
+    api.route(StudentList, "students", "/students/")
+    api.route(StudentDetails, "student", "/students/(?P<id>[0-9]+)/")
+    return application, api
@@ -0,0 +1,274 @@
+"""Local load generator.
+
+Serves the fixture resources from a separate process, with a synthetic
+data set, and loads it with a mix of GET, POST, PATCH and DELETE
+requests from increasing numbers of concurrent clients. For each
+concurrency level it reports throughput, latency percentiles per
+operation and errors, and samples the memory of the server process
+over time. No external service is needed.
+
+Usage::
+
+    python benchmarks/loadgen.py [--items N] [--bio-length N]
+        [--levels 1,8,32,128] [--duration 10]
+        [--mix get=60,list=20,post=10,patch=5,delete=5]
+        [--output results.json]
+"""
+import argparse
+import collections
+import json
+import os
+import random
+import signal
+import time
+
+from tornado import gen
+from tornado.httpclient import AsyncHTTPClient, HTTPRequest
+from tornado.ioloop import IOLoop, PeriodicCallback
+from tornado.testing import bind_unused_port
+
+import fixtures
+import results
+
+OPERATIONS = ("get", "list", "post", "patch", "delete")
+
+
+def parse_mix(value):
+    """Parses a mix specification such as "get=60,post=40" into a
+    list of (operation, weight) pairs."""
+    mix = []
+    for entry in value.split(","):
+        operation, _, weight = entry.partition("=")
+        operation = operation.strip()
+        if operation not in OPERATIONS:
+            raise argparse.ArgumentTypeError(
+                "Unknown operation {}".format(operation))
+        mix.append((operation, float(weight or 1)))
+    return mix
+
+
+def server_rss(pid):
+    """Returns the resident set size, in bytes, of a process, or None
+    if it cannot be determined on this platform."""
+    try:
+        with open("/proc/{}/statm".format(pid)) as f:
+            pages = int(f.read().split()[1])
+    except (OSError, IndexError, ValueError):
+        return None
+    return pages * os.sysconf("SC_PAGE_SIZE")
+
+
+def serve(sock, args):
+    """Runs the server. Executed in the forked server process."""
+    from tornado.httpserver import HTTPServer
+
+    fixtures.populate(args.items, bio_length=args.bio_length)
+    application, _ = fixtures.make_application()
+    server = HTTPServer(application)
+    server.add_sockets([sock])
+
+    io_loop = IOLoop.current()
+    signal.signal(signal.SIGTERM,
+                  lambda *_: io_loop.add_callback_from_signal(io_loop.stop))
+    io_loop.start()
+
+
+class LoadState:
+    """Keeps track of the identifiers known to exist, so that the
+    generated requests mostly address existing resources."""
+
+    def __init__(self, num_items, bio_length):
+        self.ids = list(range(num_items))
+        self.next_name = 0
+        self.bio = "x" * bio_length
+
+    def request(self, base_url, operation):
+        url = base_url + "/api/v1/students/"
+        if operation == "list":
+            return HTTPRequest(url + "?page%5Bsize%5D=20")
+
+        if operation == "post":
+            self.next_name += 1
+            return HTTPRequest(url, method="POST", body=json.dumps({
+                "data": {
+                    "type": "student",
+                    "attributes": {
+                        "name": "load {}".format(self.next_name),
+                        "age": 20,
+                        "bio": self.bio,
+                    }
+                }
+            }))
+
+        identifier = random.choice(self.ids) if self.ids else 0
+        url += "{}/".format(identifier)
+        if operation == "get":
+            return HTTPRequest(url)
+
+        if operation == "patch":
+            return HTTPRequest(url, method="PATCH", body=json.dumps({
+                "data": {
+                    "type": "student",
+                    "id": str(identifier),
+                    "attributes": {"age": random.randint(18, 60)}
+                }
+            }))
+
+        if identifier in self.ids:
+            self.ids.remove(identifier)
+        return HTTPRequest(url, method="DELETE")
+
+    def response(self, operation, response):
+        if operation == "post" and response.code == 201:
+            location = response.headers["Location"]
+            self.ids.append(int(location.rstrip("/").rsplit("/", 1)[1]))
+
+
+@gen.coroutine
+def run_level(base_url, concurrency, duration, mix, state):
+    """Loads the server with the given number of concurrent clients
+    for duration seconds. Returns the result entry of the level."""
+    io_loop = IOLoop.current()
+    client = AsyncHTTPClient(force_instance=True, max_clients=concurrency)
+    total_weight = sum(weight for _, weight in mix)
+
+    def choose_operation():
+        point = random.uniform(0, total_weight)
+        for operation, weight in mix:
+            point -= weight
+            if point <= 0:
+                break
+        return operation
+
+    latencies = collections.defaultdict(list)
+    errors = collections.Counter()
+    deadline = io_loop.time() + duration
+
+    @gen.coroutine
+    def worker():
+        while io_loop.time() < deadline:
+            operation = choose_operation()
+            request = state.request(base_url, operation)
+            start = io_loop.time()
+            response = yield client.fetch(request, raise_error=False)
+            latencies[operation].append(io_loop.time() - start)
+            if response.code >= 400 or response.code < 100:
+                errors[operation] += 1
+            state.response(operation, response)
+
+    start = io_loop.time()
+    yield [worker() for _ in range(concurrency)]
+    elapsed = io_loop.time() - start
+    client.close()
+
+    all_latencies = [value
+                     for values in latencies.values()
+                     for value in values]
+    entry = results.summarize("concurrency-{}".format(concurrency),
+                              all_latencies,
+                              elapsed,
+                              concurrency=concurrency,
+                              errors=sum(errors.values()))
+    entry["operations"] = {
+        operation: results.summarize(operation,
+                                     values,
+                                     elapsed,
+                                     errors=errors[operation])
+        for operation, values in latencies.items()
+    }
+    return entry
+
+
+@gen.coroutine
+def run(args, base_url, server_pid):
+    state = LoadState(args.items, args.bio_length)
+    start = time.time()
+    memory = []
+
+    def sample():
+        memory.append({"time": time.time() - start,
+                       "rss": server_rss(server_pid)})
+
+    sampler = PeriodicCallback(sample, args.sample_interval * 1000)
+    sample()
+    sampler.start()
+
+    entries = []
+    try:
+        # Wait for the server to accept connections
+        client = AsyncHTTPClient()
+        for _ in range(100):
+            response = yield client.fetch(base_url + "/api/v1/students/",
+                                          raise_error=False)
+            if response.code == 200:
+                break
+            yield gen.sleep(0.05)
+
+        for concurrency in args.levels:
+            entry = yield run_level(base_url, concurrency, args.duration,
+                                    args.mix, state)
+            sample()
+            entry["rss"] = memory[-1]["rss"]
+            entries.append(entry)
+    finally:
+        sampler.stop()
+
+    saturation = max(entries, key=lambda entry: entry["throughput"])
+    return entries, memory, saturation
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--items", type=int, default=1000,
+                        help="Number of resources in the data set")
+    parser.add_argument("--bio-length", type=int, default=160,
+                        help="Size of the text attribute of resources")
+    parser.add_argument("--levels",
+                        type=lambda v: [int(x) for x in v.split(",")],
+                        default=[1, 8, 32, 128],
+                        help="Comma separated concurrency levels")
+    parser.add_argument("--duration", type=float, default=10.0,
+                        help="Seconds of load per concurrency level")
+    parser.add_argument("--mix", type=parse_mix,
+                        default=parse_mix(
+                            "get=60,list=20,post=10,patch=5,delete=5"),
+                        help="Weighted mix of operations")
+    parser.add_argument("--sample-interval", type=float, default=1.0,
+                        help="Seconds between memory samples")
+    parser.add_argument("--output",
+                        help="Path of the JSON file for the results")
+    args = parser.parse_args()
+
+    sock, port = bind_unused_port()
+    pid = os.fork()
+    if pid == 0:
+        try:
+            serve(sock, args)
+        finally:
+            os._exit(0)
+
+    sock.close()
+    base_url = "http://127.0.0.1:{}".format(port)
+    try:
+        entries, memory, saturation = IOLoop.current().run_sync(
+            lambda: run(args, base_url, pid))
+    finally:
+        os.kill(pid, signal.SIGTERM)
+        os.waitpid(pid, 0)
+
+    results.print_table(entries, ["throughput", "p50", "p99", "errors"])
+    print("Saturation throughput: {:.1f} req/s at concurrency {}".format(
+        saturation["throughput"], saturation["concurrency"]))
+    if memory[0]["rss"] is not None:
+        print("Server RSS: {:.1f} MiB -> {:.1f} MiB".format(
+            memory[0]["rss"] / 2**20, memory[-1]["rss"] / 2**20))
+
+    if args.output:
+        results.save(args.output, "load", entries + [{
+            "name": "memory",
+            "samples": memory,
+        }])
+
+
+if __name__ == "__main__":
+    main()
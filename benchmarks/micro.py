@@ -0,0 +1,104 @@
+"""Micro benchmarks of the individual stages of the request pipeline:
+query string parsing, schema computation, serialization, pagination
+links and error rendering.
+
+Usage::
+
+    python benchmarks/micro.py [--number N] [--output results.json]
+"""
+import argparse
+import timeit
+
+from tornado_rest_jsonapi import exceptions
+from tornado_rest_jsonapi.errors import Error, Source, jsonapi_errors
+from tornado_rest_jsonapi.pagination import pagination_links
+from tornado_rest_jsonapi.querystring import QueryStringManager
+from tornado_rest_jsonapi.schema import compute_schema
+
+import fixtures
+import results
+
+QUERY = {
+    "page[number]": [b"3"],
+    "page[size]": [b"50"],
+    "include": [b"tutor"],
+    "fields[student]": [b"name,age,tutor"],
+    "sort": [b"-age,name"],
+    "filter": [b'[{"name": "age", "op": "gt", "val": 20}]'],
+}
+
+
+def benchmarks():
+    """Returns the (name, callable) pairs to measure."""
+    schema_cls = fixtures.StudentSchema
+    qs = QueryStringManager(QUERY, schema_cls)
+    empty_qs = QueryStringManager({}, schema_cls)
+    items = list(fixtures.BenchDataLayer.collection.values())[:50]
+
+    plain_schema = compute_schema(schema_cls, {"many": True}, empty_qs, [])
+    include_schema = compute_schema(
+        schema_cls, {"many": True}, qs, qs.include)
+
+    validation_error = exceptions.ValidationError([
+        Error(source=Source(pointer="/data/attributes/age"),
+              detail="Not a valid integer.",
+              title="Validation error",
+              status=exceptions.ValidationError.status)
+        for _ in range(5)
+    ])
+
+    return [
+        ("qs-init", lambda: QueryStringManager(QUERY, schema_cls)),
+        ("qs-pagination", lambda: qs.pagination),
+        ("qs-fields", lambda: qs.fields),
+        ("qs-sorting", lambda: qs.sorting),
+        ("qs-include", lambda: qs.include),
+        ("qs-filters", lambda: qs.filters),
+        ("compute-schema", lambda: compute_schema(
+            schema_cls, {"many": True}, empty_qs, [])),
+        ("compute-schema-include", lambda: compute_schema(
+            schema_cls, {"many": True}, qs, qs.include)),
+        ("dump-50", lambda: plain_schema.dump(items)),
+        ("dump-50-include", lambda: include_schema.dump(items)),
+        ("pagination-links", lambda: pagination_links(
+            1000, qs, "http://localhost/api/v1/students/")),
+        ("jsonapi-errors-not-found", lambda: jsonapi_errors(
+            exceptions.ObjectNotFound())),
+        ("jsonapi-errors-validation", lambda: jsonapi_errors(
+            validation_error)),
+    ]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--number", type=int, default=1000,
+                        help="Number of calls per measurement")
+    parser.add_argument("--repeat", type=int, default=5,
+                        help="Number of measurements per benchmark")
+    parser.add_argument("--output",
+                        help="Path of the JSON file for the results")
+    args = parser.parse_args()
+
+    fixtures.populate(1000)
+
+    entries = []
+    for name, function in benchmarks():
+        timings = timeit.repeat(function,
+                                number=args.number,
+                                repeat=args.repeat)
+        per_call = [t / args.number for t in timings]
+        best = min(per_call)
+        entries.append({
+            "name": name,
+            "throughput": 1 / best,
+            "mean": 1000 * sum(per_call) / len(per_call),
+            "best": 1000 * best,
+        })
+
+    results.print_table(entries, ["throughput", "mean", "best"])
+    if args.output:
+        results.save(args.output, "micro", entries)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,114 @@
+"""Benchmarks of the full request pipeline.
+
+Drives the ResourceList and ResourceDetails handlers over real HTTP,
+with the in-memory data layer, for a set of page sizes, include
+depths, sparse fieldsets and sort keys.
+
+Usage::
+
+    python benchmarks/pipeline.py [--requests N] [--concurrency C]
+                                  [--items N] [--output results.json]
+"""
+import argparse
+import urllib.parse
+
+from tornado import gen
+from tornado.httpclient import AsyncHTTPClient
+from tornado.httpserver import HTTPServer
+from tornado.ioloop import IOLoop
+from tornado.testing import bind_unused_port
+
+import fixtures
+import results
+
+# (name, path, query arguments)
+SCENARIOS = [
+    ("details", "/api/v1/students/1/", {}),
+    ("details-include", "/api/v1/students/1/", {"include": "tutor"}),
+    ("list-size10", "/api/v1/students/", {"page[size]": 10}),
+    ("list-size100", "/api/v1/students/", {"page[size]": 100}),
+    ("list-size500", "/api/v1/students/", {"page[size]": 500}),
+    ("list-size100-include", "/api/v1/students/",
+     {"page[size]": 100, "include": "tutor"}),
+    ("list-size100-fields", "/api/v1/students/",
+     {"page[size]": 100, "fields[student]": "name,age"}),
+    ("list-size100-sort", "/api/v1/students/",
+     {"page[size]": 100, "sort": "-age,name"}),
+    ("list-size100-all", "/api/v1/students/",
+     {"page[size]": 100, "include": "tutor",
+      "fields[student]": "name,tutor", "sort": "-age"}),
+]
+
+
+@gen.coroutine
+def run_scenario(base_url, path, query, num_requests, concurrency):
+    """Performs num_requests GET requests to the given path, with the
+    given concurrency. Returns the latencies and the elapsed time."""
+    client = AsyncHTTPClient()
+    url = base_url + path
+    if query:
+        url += "?" + urllib.parse.urlencode(query)
+
+    # Warm up
+    yield client.fetch(url)
+
+    io_loop = IOLoop.current()
+    latencies = []
+    remaining = [num_requests]
+
+    @gen.coroutine
+    def worker():
+        while remaining[0] > 0:
+            remaining[0] -= 1
+            start = io_loop.time()
+            yield client.fetch(url)
+            latencies.append(io_loop.time() - start)
+
+    start = io_loop.time()
+    yield [worker() for _ in range(concurrency)]
+    return latencies, io_loop.time() - start
+
+
+@gen.coroutine
+def run(args):
+    fixtures.populate(args.items)
+    application, _ = fixtures.make_application()
+
+    sock, port = bind_unused_port()
+    server = HTTPServer(application)
+    server.add_sockets([sock])
+    base_url = "http://127.0.0.1:{}".format(port)
+    AsyncHTTPClient.configure(None, max_clients=args.concurrency)
+
+    entries = []
+    try:
+        for name, path, query in SCENARIOS:
+            latencies, elapsed = yield run_scenario(
+                base_url, path, query, args.requests, args.concurrency)
+            entries.append(results.summarize(name, latencies, elapsed))
+    finally:
+        server.stop()
+
+    return entries
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--requests", type=int, default=200,
+                        help="Number of requests per scenario")
+    parser.add_argument("--concurrency", type=int, default=1,
+                        help="Number of concurrent requests")
+    parser.add_argument("--items", type=int, default=1000,
+                        help="Number of resources in the data layer")
+    parser.add_argument("--output",
+                        help="Path of the JSON file for the results")
+    args = parser.parse_args()
+
+    entries = IOLoop.current().run_sync(lambda: run(args))
+    results.print_table(entries, ["throughput", "mean", "p50", "p99"])
+    if args.output:
+        results.save(args.output, "pipeline", entries)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,110 @@
+"""Statistics and storage of benchmark results.
+
+Results are stored as JSON documents of the form::
+
+    {
+        "suite": "pipeline",
+        "environment": {...},
+        "results": [
+            {"name": "...", "throughput": ..., "p50": ..., ...},
+            ...
+        ]
+    }
+
+so that two runs of the same suite can be compared with compare.py.
+Latencies are in milliseconds, throughputs in operations per second.
+"""
+import json
+import platform
+import subprocess
+import time
+
+import marshmallow
+import marshmallow_jsonapi
+import tornado
+
+
+def percentile(samples, fraction):
+    """Returns the given percentile of the samples, with linear
+    interpolation between the closest ranks."""
+    if not samples:
+        return None
+
+    ordered = sorted(samples)
+    position = (len(ordered) - 1) * fraction
+    lower = int(position)
+    upper = min(lower + 1, len(ordered) - 1)
+    weight = position - lower
+    return ordered[lower] * (1 - weight) + ordered[upper] * weight
+
+
+def summarize(name, latencies, elapsed, **extra):
+    """Summarizes the latencies (in seconds) of a run lasting elapsed
+    seconds into a result entry."""
+    result = {
+        "name": name,
+        "count": len(latencies),
+        "throughput": len(latencies) / elapsed if elapsed else None,
+        "mean": 1000 * sum(latencies) / len(latencies),
+        "p50": 1000 * percentile(latencies, 0.50),
+        "p90": 1000 * percentile(latencies, 0.90),
+        "p99": 1000 * percentile(latencies, 0.99),
+        "max": 1000 * max(latencies),
+    }
+    result.update(extra)
+    return result
+
+
+def environment():
+    """Returns a description of the environment of the run."""
+    try:
+        revision = subprocess.check_output(
+            ["git", "rev-parse", "--short", "HEAD"],
+            stderr=subprocess.DEVNULL).decode().strip()
+    except (OSError, subprocess.CalledProcessError):
+        revision = None
+
+    return {
+        "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S%z"),
+        "revision": revision,
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "tornado": tornado.version,
+        "marshmallow": marshmallow.__version__,
+        "marshmallow_jsonapi": marshmallow_jsonapi.__version__,
+    }
+
+
+def save(path, suite, results):
+    """Writes the results of a suite to a JSON file."""
+    with open(path, "w") as f:
+        json.dump({
+            "suite": suite,
+            "environment": environment(),
+            "results": results,
+        }, f, indent=2, sort_keys=True)
+
+
+def load(path):
+    """Reads the results written by save."""
+    with open(path) as f:
+        return json.load(f)
+
+
+def print_table(results, columns):
+    """Prints the results as a plain text table."""
+    width = max([len(r["name"]) for r in results] + [4])
+    header = "{:<{width}}".format("name", width=width)
+    for column in columns:
+        header += " {:>12}".format(column)
+    print(header)
+
+    for result in results:
+        line = "{:<{width}}".format(result["name"], width=width)
+        for column in columns:
+            value = result.get(column)
+            if value is None:
+                line += " {:>12}".format("-")
+            else:
+                line += " {:>12.3f}".format(value)
+        print(line)
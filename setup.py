@@ -36,6 +36,9 @@ setup(
         "marshmallow>=2.13",
         "marshmallow_jsonapi>=0.14",
     ],
+    extras_require={
+        "msgpack": ["msgpack>=0.5.2"],
+    },
     packages=find_packages(),
     include_package_data=True,
     zip_safe=False
@@ -1,5 +1,6 @@
 from .api import Api  # noqa
 from .authenticator import Authenticator, NullAuthenticator  # noqa
 from .exceptions import *  # noqa
-from .resource import Resource, ResourceList, ResourceDetails  # noqa
+from .resource import (  # noqa
+    Resource, ResourceList, ResourceDetails, StreamingResourceList)
 from .version import __version__ # noqa
@@ -0,0 +1,256 @@
+import collections
+import math
+import time
+
+from . import exceptions
+from .pagination import DEFAULT_PAGE_SIZE
+from .resource import ResourceList
+
+#: Default maximum number of clients whose rate is tracked.
+DEFAULT_MAX_CLIENTS = 10000
+
+#: Default Retry-After, in seconds, when too many requests are in flight.
+DEFAULT_RETRY_AFTER = 1
+
+
+def estimate_cost(handler):
+    """Estimates the cost of a request, in tokens.
+
+    Each request costs one token, plus one for each relationship
+    traversed by its include parameter. For collections, the cost is
+    multiplied by the requested page size, in units of the default
+    page size. The requests for whole collections, unpaginated with a
+    page size of 0 or exported, cost an infinite number of tokens, so
+    that the AdmissionController charges them its maximum, the burst.
+
+    Parameters
+    ----------
+    handler: Resource
+        The handler of the request
+
+    Returns
+    -------
+    float: the cost of the request
+    """
+    if handler.request.method != "GET":
+        return 1.0
+
+    include = handler.get_query_argument("include", "")
+    depth = sum(len(path.split(".")) for path in include.split(",") if path)
+    cost = 1.0 + depth
+
+    if isinstance(handler, ResourceList):
+        if handler.is_export():
+            return math.inf
+
+        try:
+            size = int(handler.get_query_argument("page[size]",
+                                                  DEFAULT_PAGE_SIZE))
+        except ValueError:
+            # Rejected later by the query string validation
+            size = DEFAULT_PAGE_SIZE
+        if size == 0:
+            return math.inf
+        cost *= max(1.0, size / DEFAULT_PAGE_SIZE)
+
+    return cost
+
+
+def client_key(handler):
+    """Returns the key identifying the client of a request for rate
+    limiting: the current user if authenticated, else the remote IP.
+
+    The user is identified by its str, which must then be stable and
+    unique to the user: users with the same str, such as dicts with the
+    same content, share a bucket. Otherwise, pass a key function
+    returning the identifier of the user to the AdmissionController.
+    """
+    if handler.current_user is not None:
+        return "user:{}".format(handler.current_user)
+
+    return "ip:{}".format(handler.request.remote_ip)
+
+
+class AdmissionController:
+    """Decides if the requests to the resources are served, according
+    to per client rate limits and per resource concurrency limits.
+
+    Each client has a token bucket, refilled at the given rate up to
+    the burst size, and each request consumes the tokens of its
+    estimated cost. A client without enough tokens is answered with
+    429 Too Many Requests. A resource class already handling its
+    maximum number of requests answers with 503 Service Unavailable.
+    Both responses carry a Retry-After header.
+    """
+
+    def __init__(self,
+                 rate=None,
+                 burst=None,
+                 max_in_flight=None,
+                 cost=estimate_cost,
+                 key=client_key,
+                 max_clients=DEFAULT_MAX_CLIENTS):
+        """Defines the controller.
+
+        Parameters
+        ----------
+        rate: float or None
+            The tokens per second granted to each client. None disables
+            rate limiting.
+        burst: float or None
+            The maximum tokens a client can accumulate. Defaults to the
+            rate.
+        max_in_flight: int or None
+            The maximum number of requests handled at the same time by
+            each resource class, unless the class defines its own
+            max_in_flight. None means unlimited.
+        cost: callable
+            Called with the handler, returns the tokens consumed by the
+            request.
+        key: callable
+            Called with the handler, returns the hashable key of the
+            client. See client_key for the default.
+        max_clients: int
+            The number of clients whose bucket is kept. The least
+            recently seen clients are forgotten first.
+
+        Raises
+        ------
+        ValueError:
+            if rate limiting is enabled with a rate or burst that is
+            not positive.
+        """
+        if burst is None:
+            burst = rate
+
+        if rate is not None:
+            if rate <= 0:
+                raise ValueError("rate must be positive, or None to "
+                                 "disable rate limiting")
+            if burst <= 0:
+                raise ValueError("burst must be positive")
+
+        self.rate = rate
+        self.burst = burst
+        self.max_in_flight = max_in_flight
+        self.cost = cost
+        self.key = key
+        self.max_clients = max_clients
+
+        self._buckets = collections.OrderedDict()
+        self._in_flight = collections.Counter()
+
+    def in_flight(self, resource_cls):
+        """Returns the number of admitted requests of a resource class
+        that are not finished yet."""
+        return self._in_flight[resource_cls]
+
+    def admit(self, handler):
+        """Admits a request, or rejects it.
+
+        Parameters
+        ----------
+        handler: Resource
+            The handler of the request, after authentication.
+
+        Returns
+        -------
+        Ticket: to be released when the request is finished.
+
+        Raises
+        ------
+        ServiceUnavailable:
+            if the resource is handling too many requests.
+        TooManyRequests:
+            if the client exceeded its rate.
+        """
+        resource_cls = type(handler)
+        limit = resource_cls.max_in_flight
+        if limit is None:
+            limit = self.max_in_flight
+
+        if limit is not None and self._in_flight[resource_cls] >= limit:
+            raise exceptions.ServiceUnavailable(
+                retry_after=DEFAULT_RETRY_AFTER)
+
+        if self.rate is not None:
+            wait = self._bucket(self.key(handler)).consume(
+                min(self.cost(handler), self.burst))
+            if wait > 0:
+                raise exceptions.TooManyRequests(retry_after=wait)
+
+        self._in_flight[resource_cls] += 1
+        return Ticket(self, resource_cls)
+
+    def release(self, resource_cls):
+        """Accounts for the end of an admitted request."""
+        self._in_flight[resource_cls] -= 1
+        if self._in_flight[resource_cls] <= 0:
+            del self._in_flight[resource_cls]
+
+    def _bucket(self, key):
+        """Returns the bucket of a client."""
+        try:
+            bucket = self._buckets[key]
+        except KeyError:
+            bucket = self._buckets[key] = TokenBucket(self.rate, self.burst)
+            if len(self._buckets) > self.max_clients:
+                self._buckets.popitem(last=False)
+        else:
+            self._buckets.move_to_end(key)
+
+        return bucket
+
+
+class Ticket:
+    """An admitted request"""
+    __slots__ = ("_controller", "_resource_cls")
+
+    def __init__(self, controller, resource_cls):
+        self._controller = controller
+        self._resource_cls = resource_cls
+
+    def release(self):
+        """Releases the admission. Can be called more than once."""
+        if self._controller is not None:
+            self._controller.release(self._resource_cls)
+            self._controller = None
+
+
+class TokenBucket:
+    """A token bucket, refilled at a constant rate."""
+    __slots__ = ("rate", "burst", "tokens", "timestamp")
+
+    def __init__(self, rate, burst):
+        """Initializes a full bucket.
+
+        Parameters
+        ----------
+        rate: float
+            The tokens added per second
+        burst: float
+            The capacity of the bucket
+        """
+        self.rate = rate
+        self.burst = burst
+        self.tokens = burst
+        self.timestamp = time.monotonic()
+
+    def consume(self, amount):
+        """Consumes tokens, if available.
+
+        Returns
+        -------
+        float: 0 if the tokens were consumed, else the seconds to wait
+        for them to be available.
+        """
+        now = time.monotonic()
+        self.tokens = min(self.burst,
+                          self.tokens + (now - self.timestamp) * self.rate)
+        self.timestamp = now
+
+        if self.tokens >= amount:
+            self.tokens -= amount
+            return 0.0
+
+        return (amount - self.tokens) / self.rate
@@ -1,9 +1,15 @@
+import inspect
 from collections import OrderedDict
 
 from .resource import Resource
 
 from .utils import url_path_join, with_end_slash
 from .authenticator import NullAuthenticator
+from .changefeed import DEFAULT_KEEPALIVE, ChangeFeed, ChangeFeedHandler
+from .compression import DEFAULT_MAX_DECOMPRESSED_SIZE
+from .metrics import Metrics, MetricsHandler
+from .pool import PoolRegistry
+from .representations import Representations
 
 
 class Api:
@@ -33,6 +39,27 @@ class Api:
         self._register = OrderedDict()
         self._authenticator = NullAuthenticator
         self._base_urlpath = base_urlpath
+        self._compression = None
+        self._max_decompressed_body_size = DEFAULT_MAX_DECOMPRESSED_SIZE
+        self._offload_policy = None
+        self._compile_schemas = False
+        self._admission = None
+        self._single_flight = None
+        self._timeouts = {}
+        self._change_feeds = {}
+        self._representations = Representations()
+        self._memory_profiler = None
+        self._invalidation_bus = None
+        self._pools = PoolRegistry()
+        self._metrics = None
+        self._startup_hooks = []
+        self._shutdown_hooks = []
+        self._in_flight = 0
+
+    @property
+    def application(self):
+        """The tornado web application the Api is bound to"""
+        return self._application
 
     @property
     def authenticator(self):
@@ -42,10 +69,330 @@ class Api:
     def authenticator(self, authenticator):
         self._authenticator = authenticator
 
+    @property
+    def representations(self):
+        """The Representations registry, negotiating the encoding of
+        the payloads. Register additional representations on it, such
+        as a MessagePackRepresentation."""
+        return self._representations
+
+    @representations.setter
+    def representations(self, representations):
+        self._representations = representations
+
+    @property
+    def compression(self):
+        """The ResponseCompression policy applied to the resource
+        payloads, or None if responses are sent uncompressed."""
+        return self._compression
+
+    @compression.setter
+    def compression(self, compression):
+        self._compression = compression
+
+    @property
+    def max_decompressed_body_size(self):
+        """The maximum size, in bytes, of a compressed request payload
+        once decompressed."""
+        return self._max_decompressed_body_size
+
+    @max_decompressed_body_size.setter
+    def max_decompressed_body_size(self, max_decompressed_body_size):
+        self._max_decompressed_body_size = max_decompressed_body_size
+
+    @property
+    def offload_policy(self):
+        """The default OffloadPolicy for the serialization and validation
+        work of the resources, or None to always run it on the IOLoop
+        thread."""
+        return self._offload_policy
+
+    @offload_policy.setter
+    def offload_policy(self, offload_policy):
+        self._offload_policy = offload_policy
+
+    @property
+    def compile_schemas(self):
+        """If True, the resources serialize and validate with code
+        compiled from their schemas where possible, instead of
+        marshmallow."""
+        return self._compile_schemas
+
+    @compile_schemas.setter
+    def compile_schemas(self, compile_schemas):
+        self._compile_schemas = compile_schemas
+
+    @property
+    def admission(self):
+        """The AdmissionController deciding if the requests to the
+        resources are served, or None to serve all of them."""
+        return self._admission
+
+    @admission.setter
+    def admission(self, admission):
+        self._admission = admission
+
+    @property
+    def single_flight(self):
+        """The SingleFlight coalescing the identical GET requests in
+        progress, or None to handle each of them independently."""
+        return self._single_flight
+
+    @single_flight.setter
+    def single_flight(self, single_flight):
+        self._single_flight = single_flight
+
+    @property
+    def timeouts(self):
+        """The default timeouts, in seconds, of the data layer
+        operations of the resources, by operation name. The "default"
+        entry applies to the operations not listed."""
+        return self._timeouts
+
+    @timeouts.setter
+    def timeouts(self, timeouts):
+        self._timeouts = timeouts
+
+    @property
+    def memory_profiler(self):
+        """The MemoryProfiler sampling the requests to the resources,
+        or None if memory profiling is disabled."""
+        return self._memory_profiler
+
+    @memory_profiler.setter
+    def memory_profiler(self, memory_profiler):
+        self._memory_profiler = memory_profiler
+
+    @property
+    def invalidation_bus(self):
+        """The InvalidationBus shared with the other worker processes,
+        or None if the Api is served by a single process."""
+        return self._invalidation_bus
+
+    @invalidation_bus.setter
+    def invalidation_bus(self, invalidation_bus):
+        self._invalidation_bus = invalidation_bus
+
+    @property
+    def pools(self):
+        """The PoolRegistry of the connection pools shared by the data
+        layers, which receive it as their pools attribute. The pools
+        are started and closed with the Api."""
+        return self._pools
+
+    @pools.setter
+    def pools(self, pools):
+        self._pools = pools
+
+    @property
+    def metrics(self):
+        """The Metrics collected on the resources, or None if they are
+        not collected. Set by route_metrics."""
+        return self._metrics
+
+    @metrics.setter
+    def metrics(self, metrics):
+        self._metrics = metrics
+
+    @property
+    def in_flight(self):
+        """The number of requests currently handled by the resources"""
+        return self._in_flight
+
+    def request_started(self, handler):
+        """Called by a resource handler when it starts handling
+        a request."""
+        self._in_flight += 1
+
+    def request_finished(self, handler):
+        """Called by a resource handler when it has finished handling
+        a request."""
+        self._in_flight -= 1
+        if self._metrics is not None:
+            self._metrics.request_finished(handler)
+
+    def add_startup_hook(self, hook):
+        """Adds a callable to invoke when the Api starts serving
+        requests in a process.
+
+        Parameters
+        ----------
+        hook: callable
+            Called with the Api as argument. It can return a future
+            or coroutine, which will be waited for.
+        """
+        self._startup_hooks.append(hook)
+
+    def add_shutdown_hook(self, hook):
+        """Adds a callable to invoke when the Api stops serving
+        requests in a process. Shutdown hooks are invoked in reverse
+        order of addition.
+
+        Parameters
+        ----------
+        hook: callable
+            Called with the Api as argument. It can return a future
+            or coroutine, which will be waited for.
+        """
+        self._shutdown_hooks.append(hook)
+
+    async def startup(self):
+        """Starts the connection pools and the data layers of the
+        registered resources, then invokes the startup hooks. Must be
+        called once per process, before serving requests."""
+        self._pools.start()
+
+        for data_layer_cls, options in self.data_layers():
+            result = data_layer_cls.startup(self, options)
+            if inspect.isawaitable(result):
+                await result
+
+        for hook in self._startup_hooks:
+            result = hook(self)
+            if inspect.isawaitable(result):
+                await result
+
+    async def shutdown(self):
+        """Closes the change feeds, invokes the shutdown hooks, then
+        shuts down the data layers of the registered resources and
+        closes the connection pools. Must be called once per process,
+        after serving requests."""
+        for feed in self._change_feeds.values():
+            feed.close()
+
+        for hook in reversed(self._shutdown_hooks):
+            result = hook(self)
+            if inspect.isawaitable(result):
+                await result
+
+        for data_layer_cls, options in reversed(self.data_layers()):
+            result = data_layer_cls.shutdown(self, options)
+            if inspect.isawaitable(result):
+                await result
+
+        await self._pools.close()
+
+    def data_layers(self):
+        """Returns the unique data layer classes and options of the
+        registered resources.
+
+        Returns
+        -------
+        list: the (class, options) pairs, in order of registration
+        """
+        result = []
+        seen = set()
+        for resource in self._register.values():
+            options = resource.data_layer
+            if options is None:
+                continue
+
+            key = (options["class"], id(options))
+            if key not in seen:
+                seen.add(key)
+                result.append((options["class"], options))
+
+        return result
+
     @property
     def registered(self):
         return self._register
 
+    @property
+    def change_feeds(self):
+        """The ChangeFeed of each resource type with a change feed
+        route, by type name."""
+        return self._change_feeds
+
+    def route_change_feed(self, resource, view, *urls, feed=None,
+                          keepalive=DEFAULT_KEEPALIVE):
+        """Adds a Server-Sent Events route streaming the changes of the
+        type of a resource. The resources of that type then publish
+        their creations, updates and deletions to the feed. The feeds
+        are local to the process, so an Api with change feeds must be
+        served from a single process.
+
+        Parameters
+        ----------
+        resource: Resource
+            A subclass of the Resource class, whose schema gives the
+            type of the feed.
+        view: str
+            A unique string associated to the view for named linkage.
+        *urls: str
+            URL to bind to the feed. This URL will be prefixed with the
+            base_urlpath as specified at construction.
+        feed: ChangeFeed or None
+            The feed to use. If None, the feed already defined for the
+            type, or a ChangeFeed with the default options.
+        keepalive: float
+            Interval, in seconds, of the comments sent to idle
+            subscribers to keep the connection open.
+
+        Returns
+        -------
+        ChangeFeed: the feed of the type
+
+        Raises
+        ------
+        TypeError:
+            if resource is not a subclass of Resource
+        """
+        if resource is None or not issubclass(resource, Resource):
+            raise TypeError("resource must be a subclass of Resource")
+
+        type_ = resource.schema.opts.type_
+        if feed is None:
+            feed = self._change_feeds.get(type_) or ChangeFeed()
+        self._change_feeds[type_] = feed
+
+        for url in urls:
+            self._application.wildcard_router.add_rules([
+                (
+                    with_end_slash(url_path_join(self._base_urlpath, url)),
+                    ChangeFeedHandler,
+                    dict(registry=self, feed=feed, keepalive=keepalive),
+                    view
+                )
+            ])
+
+        return feed
+
+    def route_metrics(self, view, *urls, metrics=None):
+        """Adds a route exposing the metrics of the resources in the
+        Prometheus text format, and starts collecting them.
+
+        Parameters
+        ----------
+        view: str
+            A unique string associated to the view for named linkage.
+        *urls: str
+            URL to bind to the metrics. This URL will be prefixed with
+            the base_urlpath as specified at construction.
+        metrics: Metrics or None
+            The metrics to expose. If None, the metrics already
+            collected, or a Metrics with the default options.
+
+        Returns
+        -------
+        Metrics: the metrics of the Api
+        """
+        if metrics is None:
+            metrics = self._metrics or Metrics(self)
+        self._metrics = metrics
+
+        for url in urls:
+            self._application.wildcard_router.add_rules([
+                (
+                    with_end_slash(url_path_join(self._base_urlpath, url)),
+                    MetricsHandler,
+                    dict(metrics=metrics),
+                    view
+                )
+            ])
+
+        return metrics
+
     def route(self, resource, view, *urls, **kwargs):
         """Adds a route for a resource.
         The URL must have at least one capture group for the identifier,
@@ -1,10 +1,6 @@
-from tornado import gen
-
-
 class Authenticator:
     @classmethod
-    @gen.coroutine
-    def authenticate(cls, handler):
+    async def authenticate(cls, handler):
         """Performs authentication of the access"""
         raise NotImplementedError("Missing implementation for authenticate")
 
@@ -14,8 +10,7 @@ class NullAuthenticator(Authenticator):
     returns None"""
 
     @classmethod
-    @gen.coroutine
-    def authenticate(cls, handler):
+    async def authenticate(cls, handler):
         """Called by the handler to authenticate the user.
         The handler passes itself as an argument, and expects a valid
         handler.current_user value, or None.
@@ -23,5 +18,7 @@ class NullAuthenticator(Authenticator):
         Note that returning None does not mean that the API will reject
         the request. Just that the current_user is unrecognized.
         Individual Resources must then adapt their behavior according to
-        this information"""
+        this information.
+
+        It can be a coroutine, or return the user directly."""
         return None
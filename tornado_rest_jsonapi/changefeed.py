@@ -0,0 +1,354 @@
+import collections
+import datetime
+import inspect
+import itertools
+import json
+
+from tornado import gen, iostream, locks, web
+from tornado.log import app_log
+
+#: Default number of events kept for resuming subscribers.
+DEFAULT_CAPACITY = 1000
+
+#: Default number of events a subscriber can lag behind before being
+#: dropped.
+DEFAULT_MAX_QUEUE = 100
+
+#: Default interval, in seconds, of the keepalive comments sent to idle
+#: subscribers.
+DEFAULT_KEEPALIVE = 15.0
+
+_CONTENT_TYPE_EVENT_STREAM = "text/event-stream"
+
+
+class ChangeEvent:
+    """A change of a resource, encoded once as a Server-Sent Event."""
+    __slots__ = ("id", "name", "data", "encoded")
+
+    def __init__(self, id, name, data):
+        """Defines the event.
+
+        Parameters
+        ----------
+        id: int
+            The sequence number of the event in its feed
+        name: str
+            The kind of change: "created", "updated", "deleted", or
+            "reset" if the subscriber must refetch the collection.
+        data: dict
+            The JSON serializable payload
+        """
+        self.id = id
+        self.name = name
+        self.data = data
+        self.encoded = "id: {}\nevent: {}\ndata: {}\n\n".format(
+            id, name, json.dumps(data, separators=(",", ":"))
+        ).encode("utf-8")
+
+
+class ChangeFeed:
+    """Publishes the changes of a resource type to the subscribers
+    connected to its Server-Sent Events endpoint.
+
+    The last events are kept in a ring buffer, so that subscribers
+    reconnecting with a Last-Event-ID receive the events they missed.
+    When the missed events are no longer buffered, the subscriber
+    receives a "reset" event instead, meaning that it must refetch the
+    collection. Each subscriber has a bounded queue: a subscriber
+    lagging behind by more than max_queue events is dropped, and can
+    reconnect to resume.
+
+    The subscribers receive every event, unless an authorize function
+    is given, called with the user of the subscriber and each event,
+    that returns False for the events it must not see. Reset events are
+    always delivered.
+
+    The feed is local to the process: event ids are only meaningful to
+    the worker that generated them, so a Launcher refuses to serve an
+    Api with change feeds from multiple processes.
+    """
+
+    def __init__(self,
+                 capacity=DEFAULT_CAPACITY,
+                 max_queue=DEFAULT_MAX_QUEUE,
+                 attributes=False,
+                 authorize=None):
+        """Defines the feed.
+
+        Parameters
+        ----------
+        capacity: int
+            The number of events kept for resuming subscribers.
+        max_queue: int
+            The number of events a subscriber can lag behind before
+            being dropped.
+        attributes: bool
+            If True, the events carry the attributes of the created and
+            updated resources, not only their identifiers. Requires an
+            authorize function.
+        authorize: callable or None
+            Called with the current user of a subscriber and a
+            ChangeEvent, returns True if the subscriber can receive the
+            event. None to deliver all the events to all subscribers.
+
+        Raises
+        ------
+        ValueError:
+            if attributes is True without an authorize function.
+        """
+        if attributes and authorize is None:
+            raise ValueError(
+                "The events carry attributes only with an authorize "
+                "function")
+
+        self.capacity = capacity
+        self.max_queue = max_queue
+        self.attributes = attributes
+        self.authorize = authorize
+
+        self._events = collections.deque(maxlen=capacity)
+        self._subscriptions = set()
+        self._last_id = 0
+
+        #: Number of subscribers dropped for lagging behind
+        self.dropped = 0
+
+    @property
+    def last_id(self):
+        """The id of the last event published, 0 if none"""
+        return self._last_id
+
+    @property
+    def subscribers(self):
+        """The number of connected subscribers"""
+        return len(self._subscriptions)
+
+    def publish(self, name, resource_object):
+        """Publishes a change to the subscribers.
+
+        Parameters
+        ----------
+        name: str
+            The kind of change: "created", "updated" or "deleted"
+        resource_object: dict
+            The JSON:API resource object, or identifier, of the changed
+            resource.
+
+        Returns
+        -------
+        ChangeEvent: the published event
+        """
+        data = {"type": resource_object["type"],
+                "id": str(resource_object["id"])}
+        if self.attributes and "attributes" in resource_object:
+            data["attributes"] = resource_object["attributes"]
+
+        self._last_id += 1
+        event = ChangeEvent(self._last_id, name, data)
+        self._events.append(event)
+        for subscription in list(self._subscriptions):
+            subscription._push(event)
+
+        return event
+
+    def subscribe(self, last_event_id=None, user=None):
+        """Subscribes to the events published from now on.
+
+        Parameters
+        ----------
+        last_event_id: int or None
+            The id of the last event received by a reconnecting
+            subscriber. The buffered events following it are delivered
+            first, or a reset event if some of them are gone.
+        user:
+            The current user of the subscriber, passed to the authorize
+            function.
+
+        Returns
+        -------
+        Subscription: to be closed when no longer used.
+        """
+        subscription = Subscription(self, user)
+        if last_event_id is not None:
+            missed = self.events_since(last_event_id)
+            if missed is None:
+                missed = [ChangeEvent(self._last_id, "reset", {})]
+            # The replay is not subject to the queue limit
+            subscription._pending.extend(
+                event for event in missed if subscription._allowed(event))
+
+        self._subscriptions.add(subscription)
+        return subscription
+
+    def events_since(self, last_event_id):
+        """Returns the buffered events following the given id, or None
+        if some of them are no longer buffered, or the id is unknown."""
+        if last_event_id > self._last_id or last_event_id < 0:
+            return None
+
+        if last_event_id == self._last_id:
+            return []
+
+        if not self._events or last_event_id + 1 < self._events[0].id:
+            return None
+
+        # Ids are consecutive, so the position follows from the id
+        return list(itertools.islice(
+            self._events, last_event_id + 1 - self._events[0].id, None))
+
+    def close(self):
+        """Closes all the subscriptions, ending their streams."""
+        for subscription in list(self._subscriptions):
+            subscription.close()
+
+    def _remove(self, subscription):
+        self._subscriptions.discard(subscription)
+
+
+class Subscription:
+    """The queue of the events pending for a subscriber"""
+
+    def __init__(self, feed, user=None):
+        self._feed = feed
+        self._user = user
+        self._pending = collections.deque()
+        self._ready = locks.Event()
+
+        #: True if the subscription has been closed
+        self.closed = False
+
+        #: True if the subscription has been closed for lagging behind
+        self.dropped = False
+
+    async def get(self, timeout=None):
+        """Waits for pending events.
+
+        Parameters
+        ----------
+        timeout: float or None
+            The maximum time to wait, in seconds.
+
+        Returns
+        -------
+        list or None: the pending events, empty on timeout, or None if
+        the subscription is closed.
+        """
+        if not self._pending and not self.closed:
+            self._ready.clear()
+            if timeout is None:
+                await self._ready.wait()
+            else:
+                try:
+                    await self._ready.wait(
+                        datetime.timedelta(seconds=timeout))
+                except gen.TimeoutError:
+                    pass
+
+        if self.closed:
+            return None
+
+        events = list(self._pending)
+        self._pending.clear()
+        return events
+
+    def close(self):
+        """Closes the subscription. Can be called more than once."""
+        if self.closed:
+            return
+
+        self.closed = True
+        self._pending.clear()
+        self._feed._remove(self)
+        self._ready.set()
+
+    def _allowed(self, event):
+        authorize = self._feed.authorize
+        if authorize is None or event.name == "reset":
+            return True
+
+        try:
+            return authorize(self._user, event)
+        except Exception:
+            app_log.exception("Change feed authorization failed")
+            return False
+
+    def _push(self, event):
+        if not self._allowed(event):
+            return
+
+        if len(self._pending) >= self._feed.max_queue:
+            self.dropped = True
+            self._feed.dropped += 1
+            self.close()
+            return
+
+        self._pending.append(event)
+        self._ready.set()
+
+
+class ChangeFeedHandler(web.RequestHandler):
+    """Streams the events of a ChangeFeed as Server-Sent Events.
+
+    The stream ends when the subscriber is dropped or the feed is
+    closed, in which case the client reconnects sending the
+    Last-Event-ID header to resume. The events are filtered by the
+    authorize function of the feed for the authenticated user.
+    """
+
+    def initialize(self, registry, feed, keepalive=DEFAULT_KEEPALIVE):
+        """Initialization method for when the class is instantiated."""
+        self._registry = registry
+        self._feed = feed
+        self._keepalive = keepalive
+        self._subscription = None
+
+    @property
+    def registry(self):
+        """Returns the class vs Resource registry"""
+        return self._registry
+
+    async def prepare(self):
+        """Authenticates the subscriber."""
+        current_user = self.registry.authenticator.authenticate(self)
+        if inspect.isawaitable(current_user):
+            current_user = await current_user
+        self.current_user = current_user
+
+    async def get(self, *args, **kwargs):
+        last_event_id = self.request.headers.get("Last-Event-ID")
+        if last_event_id is not None:
+            try:
+                last_event_id = int(last_event_id)
+            except ValueError:
+                # Not one of ours, so nothing can be resumed
+                last_event_id = -1
+
+        self.set_header("Content-Type", _CONTENT_TYPE_EVENT_STREAM)
+        self.set_header("Cache-Control", "no-cache")
+        self.set_header("X-Accel-Buffering", "no")
+
+        self._subscription = self._feed.subscribe(last_event_id,
+                                                  self.current_user)
+        data = b":\n\n"
+        while data is not None:
+            self.write(data)
+            try:
+                await self.flush()
+            except iostream.StreamClosedError:
+                break
+
+            events = await self._subscription.get(self._keepalive)
+            if events is None:
+                data = None
+            elif events:
+                data = b"".join(event.encoded for event in events)
+            else:
+                data = b":\n\n"
+
+    def on_connection_close(self):
+        if self._subscription is not None:
+            self._subscription.close()
+
+    def on_finish(self):
+        if self._subscription is not None:
+            self._subscription.close()
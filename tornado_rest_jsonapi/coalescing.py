@@ -0,0 +1,64 @@
+import functools
+
+from tornado import gen
+
+
+class SingleFlight:
+    """Coalesces identical concurrent computations.
+
+    The first caller for a key starts the computation, and the callers
+    with the same key arriving before it completes wait for its
+    outcome, result or exception, instead of starting their own.
+    Nothing is kept once the computation has completed.
+    """
+
+    def __init__(self):
+        self._futures = {}
+
+        #: Number of computations started
+        self.started = 0
+
+        #: Number of calls that waited for a computation in progress
+        self.shared = 0
+
+    @property
+    def in_progress(self):
+        """The number of computations in progress"""
+        return len(self._futures)
+
+    def run(self, key, fn, *args):
+        """Returns the outcome of fn(*args), or of the computation in
+        progress for the same key.
+
+        Parameters
+        ----------
+        key: hashable
+            Identifies the computation
+        fn: callable
+            A coroutine function
+        *args:
+            Its arguments
+
+        Returns
+        -------
+        Future: resolved with the outcome of the computation.
+        """
+        future = self._futures.get(key)
+        if future is not None:
+            self.shared += 1
+            return future
+
+        self.started += 1
+        future = gen.convert_yielded(fn(*args))
+        if future.done():
+            # Completed synchronously: there is nothing to share, and
+            # the callback would only run on a later iteration.
+            return future
+
+        self._futures[key] = future
+        future.add_done_callback(functools.partial(self._done, key, future))
+        return future
+
+    def _done(self, key, future, _):
+        if self._futures.get(key) is future:
+            del self._futures[key]
@@ -0,0 +1,534 @@
+import http
+
+from marshmallow import ValidationError, fields as ma_fields, missing
+from marshmallow.decorators import (
+    POST_DUMP, POST_LOAD, PRE_DUMP, PRE_LOAD, VALIDATES, VALIDATES_SCHEMA)
+from marshmallow.utils import _get_value_for_key
+from marshmallow_jsonapi import Schema
+from marshmallow_jsonapi.fields import BaseRelationship, Meta
+from marshmallow_jsonapi.utils import tpl
+from tornado.log import app_log
+
+from . import exceptions, offload
+from .errors import Error, Source
+
+# Field classes whose values of the given type, or None, are serialized
+# unchanged by marshmallow, and can be passed through inline. Values of
+# other types go through the field. None means any value.
+_INLINE_TYPES = {
+    ma_fields.Integer: int,
+    ma_fields.Float: float,
+    ma_fields.String: str,
+    ma_fields.Boolean: bool,
+    ma_fields.Raw: None,
+}
+
+# Schema methods that the compiled dumpers reimplement. A schema
+# overriding any of them is serialized by marshmallow.
+_DUMPER_METHODS = (
+    "format_json_api_response",
+    "format_item",
+    "format_items",
+    "wrap_response",
+    "get_top_level_links",
+    "get_resource_links",
+    "generate_url",
+    "render_included_data",
+    "get_attribute",
+)
+
+# Schema methods that the compiled loaders reimplement. A schema
+# overriding any of them is deserialized by marshmallow.
+_LOADER_METHODS = (
+    "load",
+    "_do_load",
+    "unwrap_request",
+    "unwrap_item",
+    "format_errors",
+    "format_error",
+    "handle_error",
+)
+
+# The processors of marshmallow_jsonapi schemas, reimplemented by the
+# compiled code. Schemas with other processors are not compiled.
+_BUILTIN_PROCESSORS = {
+    (POST_DUMP, True): ["format_json_api_response"],
+    (PRE_LOAD, True): ["unwrap_request"],
+}
+
+_DUMP_TAGS = (PRE_DUMP, POST_DUMP)
+_LOAD_TAGS = (PRE_LOAD, POST_LOAD, VALIDATES, VALIDATES_SCHEMA)
+
+# Compiled dumpers and loaders, or None if not compilable, by plan.
+_dumpers = {}
+_loaders = {}
+
+
+def dump(schema, obj):
+    """Serializes obj with the schema, returning the resulting data.
+
+    Equivalent to schema.dump(obj).data, but uses the dumper compiled
+    for the schema if possible. If the schema cannot be compiled, it
+    falls back to marshmallow, as it does for the values that
+    marshmallow reports as errors, and for the objects missing an
+    attribute of their self link. Other exceptions are raised.
+    """
+    dumper = compile_dumper(schema)
+    if dumper is not None:
+        try:
+            return dumper(schema, obj)
+        except (_Fallback, ValidationError) as e:
+            # Let marshmallow deal with, and report, the problem.
+            app_log.warning("Serializing with marshmallow for %s: %s",
+                            type(schema).__name__, e)
+
+    return schema.dump(obj).data
+
+
+def compile_dumper(schema):
+    """Returns the dumper compiled for the plan of the schema.
+
+    The plan of a schema instance is given by its class, the fields
+    it dumps, as restricted by only and exclude, and the relationships
+    whose data it includes, as set by compute_schema. Dumpers are
+    compiled once per plan and cached.
+
+    Parameters
+    ----------
+    schema: marshmallow_jsonapi.Schema
+        The schema instance
+
+    Returns
+    -------
+    callable or None: a function taking the schema and the object(s)
+    to serialize, and returning the JSON:API document, or None if the
+    schema cannot be compiled.
+    """
+    key = (type(schema),
+           tuple(schema.fields),
+           tuple(schema.include_data))
+
+    try:
+        return _dumpers[key]
+    except KeyError:
+        pass
+
+    dumper = _dumpers[key] = _compile_dumper(schema)
+    return dumper
+
+
+def load(schema, json_data):
+    """Deserializes a JSON:API document with the schema.
+
+    Equivalent to offload.load, returning the (data, errors) pair, but
+    uses the loader compiled for the schema if possible. The errors in
+    the attributes and relationships found by the compiled loader are
+    raised directly as a BadRequest, or a ValidationError for strict
+    schemas, like the resources do for the errors of marshmallow.
+    Anything else, such as a malformed document, is left to marshmallow.
+
+    Raises
+    ------
+    BadRequest, ValidationError:
+        if the resource object is not valid.
+    """
+    loader = compile_loader(schema)
+    if loader is None:
+        return offload.load(schema, json_data)
+
+    try:
+        payload = schema.unwrap_request(json_data, False)
+    except ValidationError:
+        # Including IncorrectTypeError. Let marshmallow report it.
+        return offload.load(schema, json_data)
+
+    try:
+        return loader(schema.fields, payload), {}
+    except _Fallback:
+        return offload.load(schema, json_data)
+
+
+def compile_loader(schema):
+    """Returns the loader compiled for the plan of the schema.
+
+    The plan is given by the class of the schema, the fields it loads
+    and its partial option. Loaders are compiled once per plan and
+    cached.
+
+    Parameters
+    ----------
+    schema: marshmallow_jsonapi.Schema
+        The schema instance
+
+    Returns
+    -------
+    callable or None: a function taking the fields of the schema and
+    the unwrapped resource object, and returning the loaded data, or
+    None if the schema cannot be compiled.
+    """
+    partial = schema.partial
+    if not isinstance(partial, bool):
+        partial = frozenset(partial)
+
+    key = (type(schema), tuple(schema.fields), partial)
+    try:
+        return _loaders[key]
+    except KeyError:
+        pass
+
+    loader = _loaders[key] = _compile_loader(schema)
+    return loader
+
+
+def _is_compilable(schema, methods, tags):
+    """True if the schema only relies on the given methods and
+    processors as implemented by marshmallow_jsonapi."""
+    if not isinstance(schema, Schema) or schema.opts.ordered:
+        return False
+
+    schema_cls = type(schema)
+    for name in methods:
+        if getattr(schema_cls, name) is not getattr(Schema, name):
+            return False
+
+    # Empty entries are added by marshmallow while looking them up.
+    for (tag, pass_many), names in schema_cls.__processors__.items():
+        if tag in tags and names and names != \
+                _BUILTIN_PROCESSORS.get((tag, pass_many)):
+            return False
+
+    return True
+
+
+def _compile_dumper(schema):
+    """Generates the dumper for the schema, or returns None."""
+    if not _is_compilable(schema, _DUMPER_METHODS, _DUMP_TAGS):
+        return None
+
+    if any(isinstance(field, Meta) for field in schema.fields.values()):
+        return None
+
+    lines = [
+        "def dump_item(obj, fields, accessor):",
+        "    if type(obj) is dict:",
+        "        get = obj.get",
+        "    else:",
+        "        get = _getter(obj)",
+        "    resource = {'type': %r}" % schema.opts.type_,
+        "    attributes = {}",
+        "    relationships = {}",
+        "    empty = True",
+    ]
+    namespace = {
+        "_missing": missing,
+        "_get_value_for_key": _get_value_for_key,
+        "_getter": _getter,
+        "_Fallback": _Fallback,
+    }
+
+    # The variable holding the serialized value, by dumped key
+    variables = {}
+    for index, (name, field) in enumerate(schema.fields.items()):
+        if field.load_only:
+            continue
+
+        var = "v{}".format(index)
+        dump_key = field.dump_to or name
+        variables[dump_key] = var
+
+        if name == "id":
+            target = "resource['id']"
+        elif isinstance(field, BaseRelationship):
+            target = "relationships[%r]" % schema.inflect(dump_key)
+        else:
+            target = "attributes[%r]" % schema.inflect(dump_key)
+
+        lines.extend(_field_lines(
+            name, field, var, target, namespace,
+            relationship=isinstance(field, BaseRelationship)))
+
+    lines.extend([
+        "    if empty:",
+        "        return None",
+        "    if attributes:",
+        "        resource['attributes'] = attributes",
+        "    if relationships:",
+        "        resource['relationships'] = relationships",
+    ])
+
+    if schema.opts.self_url:
+        params = []
+        for param, value in (schema.opts.self_url_kwargs or {}).items():
+            attr_name = tpl(str(value))
+            if attr_name is None:
+                params.append("%r: %r" % (param, value))
+                continue
+
+            var = variables.get(attr_name)
+            if var is None:
+                # Dotted or unknown attribute: leave it to marshmallow
+                return None
+
+            lines.extend([
+                "    if %s is _missing:" % var,
+                "        raise _Fallback(%r)" % (
+                    "missing attribute " + attr_name),
+            ])
+            params.append("%r: %s" % (param, var))
+
+        lines.append(
+            "    resource['links'] = {'self': %r.format(**{%s})}" % (
+                schema.opts.self_url, ", ".join(params)))
+
+    lines.append("    return resource")
+
+    exec("\n".join(lines), namespace)
+
+    self_url_many = schema.opts.self_url_many
+    if self_url_many:
+        self_url_many = schema.generate_url(self_url_many)
+
+    return _Dumper(namespace["dump_item"], self_url_many)
+
+
+def _field_lines(name, field, var, target, namespace, relationship):
+    """Returns the source lines serializing a field into target."""
+    key = field.attribute or name
+    inline = (type(field) in _INLINE_TYPES and
+              field.default is missing and
+              "." not in key and
+              not getattr(field, "as_string", False))
+
+    if not inline:
+        lines = [
+            "    %s = fields[%r].serialize(%r, obj, accessor)" % (
+                var, name, name),
+            "    if %s is not _missing:" % var,
+            "        empty = False",
+        ]
+        if relationship:
+            lines.extend([
+                "        if %s:" % var,
+                "            %s = %s" % (target, var),
+            ])
+        else:
+            lines.append("        %s = %s" % (target, var))
+        return lines
+
+    lines = [
+        "    %s = get(%r, _missing)" % (var, key),
+        "    if %s is _missing:" % var,
+        "        %s = _get_value_for_key(%r, obj, _missing)" % (var, key),
+        "    if %s is not _missing:" % var,
+        "        empty = False",
+    ]
+
+    value_type = _INLINE_TYPES[type(field)]
+    if value_type is not None:
+        type_var = "t_" + var
+        namespace[type_var] = value_type
+        lines.extend([
+            "        if %s is not None and type(%s) is not %s:" % (
+                var, var, type_var),
+            "            %s = fields[%r]._serialize(%s, %r, obj)" % (
+                var, name, var, name),
+        ])
+
+    lines.append("        %s = %s" % (target, var))
+    return lines
+
+
+def _getter(obj):
+    """Returns a function retrieving the values of obj as marshmallow
+    does."""
+    def get(key, default):
+        return _get_value_for_key(key, obj, default)
+
+    return get
+
+
+class _Dumper:
+    """A compiled dumper, producing the same document as the
+    dump of the schema."""
+
+    def __init__(self, dump_item, self_url_many):
+        self._dump_item = dump_item
+        self._self_url_many = self_url_many
+
+    def __call__(self, schema, obj):
+        dump_item = self._dump_item
+        fields = schema.fields
+        accessor = schema.get_attribute
+
+        if schema.many:
+            data = [dump_item(item, fields, accessor) for item in obj]
+            self_link = self._self_url_many
+        else:
+            data = dump_item(obj, fields, accessor)
+            self_link = None
+            if data is not None:
+                self_link = data.get("links", {}).get("self")
+
+        document = {"data": data}
+        if (schema.many or data) and self_link:
+            document["links"] = {"self": self_link}
+
+        if schema.included_data:
+            document["included"] = list(schema.included_data.values())
+
+        return document
+
+
+def _compile_loader(schema):
+    """Generates the loader for the schema, or returns None."""
+    if (schema.many or schema.__error_handler__ is not None or
+            not _is_compilable(schema, _LOADER_METHODS, _LOAD_TAGS)):
+        return None
+
+    lines = [
+        "def load_item(fields, payload):",
+        "    data = {}",
+        "    errors = None",
+    ]
+    namespace = {
+        "_missing": missing,
+        "_ValidationError": ValidationError,
+        "_field_errors": _field_errors,
+        "_raise_errors": _raise_errors,
+        "_strict": bool(schema.strict),
+    }
+
+    for index, (name, field) in enumerate(schema.fields.items()):
+        if field.dump_only:
+            continue
+
+        lines.extend(_load_field_lines(
+            schema, name, field, "v{}".format(index), namespace))
+
+    lines.extend([
+        "    if errors:",
+        "        _raise_errors(errors, _strict)",
+        "    return data",
+    ])
+
+    exec("\n".join(lines), namespace)
+    return namespace["load_item"]
+
+
+def _load_field_lines(schema, name, field, var, namespace):
+    """Returns the source lines deserializing a field into data."""
+    key = field.attribute or name
+    load_from = field.load_from
+    lines = [
+        "    %s = payload.get(%r, _missing)" % (var, name),
+    ]
+
+    # The name the errors are reported with, as in marshmallow
+    error_name = "%r" % _pointer(schema, name)
+    if load_from and load_from != name:
+        error_name = "p_" + var
+        lines.extend([
+            "    %s = %r" % (error_name, _pointer(schema, name)),
+            "    if %s is _missing:" % var,
+            "        %s = payload.get(%r, _missing)" % (var, load_from),
+            "        %s = %r" % (error_name, _pointer(schema, load_from)),
+        ])
+
+    partial = schema.partial
+    if partial is True or (not isinstance(partial, bool) and name in partial):
+        skip_missing = True
+    elif field.missing is not missing:
+        skip_missing = False
+        default_var = "d_" + var
+        namespace[default_var] = field.missing
+        lines.extend([
+            "    if %s is _missing:" % var,
+            "        %s = %s%s" % (var, default_var,
+                                   "()" if callable(field.missing) else ""),
+        ])
+    else:
+        skip_missing = not field.required
+
+    indent = "    "
+    if skip_missing:
+        lines.append("    if %s is not _missing:" % var)
+        indent += "    "
+
+    body = [
+        "try:",
+        "    %s = fields[%r].deserialize(%s, %r, payload)" % (
+            var, name, var, load_from or name),
+        "except _ValidationError as e:",
+        "    errors = _field_errors(errors, e.messages, %s, _strict)" % (
+            error_name),
+        "else:",
+        "    if %s is not _missing:" % var,
+        "        data[%r] = %s" % (key, var),
+    ]
+
+    value_type = _INLINE_TYPES.get(type(field), False)
+    if value_type is not False and not field.validators:
+        # Values of the native type are returned unchanged by the
+        # field, and only None needs the checks of the field.
+        if value_type is None:
+            condition = "%s is not None and %s is not _missing" % (var, var)
+        else:
+            type_var = "t_" + var
+            namespace[type_var] = value_type
+            condition = "type(%s) is %s" % (var, type_var)
+
+        body = [
+            "if %s:" % condition,
+            "    data[%r] = %s" % (key, var),
+            "else:",
+        ] + ["    " + line for line in body]
+
+    lines.extend(indent + line for line in body)
+    return lines
+
+
+def _pointer(schema, field_name):
+    """Returns the pointer of the errors of a field, as formatted by
+    marshmallow_jsonapi."""
+    field = schema.declared_fields.get(field_name)
+    if isinstance(field, BaseRelationship):
+        return "/data/relationships/{}/data".format(
+            schema.inflect(field_name))
+
+    return "/data/attributes/{}".format(schema.inflect(field_name))
+
+
+def _field_errors(errors, messages, pointer, strict):
+    """Adds the Error objects for the messages of a field to errors,
+    and returns it."""
+    if isinstance(messages, dict):
+        # Errors of nested schemas: let marshmallow format them.
+        raise _Fallback()
+
+    if errors is None:
+        errors = []
+
+    for message in messages:
+        if strict:
+            errors.append(Error(
+                source=Source(pointer=pointer),
+                detail=message,
+                title=exceptions.ValidationError.title,
+                status=http.HTTPStatus(exceptions.ValidationError.status)))
+        else:
+            errors.append(Error(source=Source(pointer=pointer),
+                                detail=message))
+
+    return errors
+
+
+def _raise_errors(errors, strict):
+    """Raises the exception reporting the given field errors."""
+    if strict:
+        raise exceptions.ValidationError(errors)
+
+    raise exceptions.BadRequest(errors)
+
+
+class _Fallback(Exception):
+    """Raised by compiled code to hand over to marshmallow."""
@@ -0,0 +1,329 @@
+import zlib
+
+from . import exceptions
+
+#: Supported content codings, in order of server preference.
+SUPPORTED_ENCODINGS = ("gzip", "deflate")
+
+#: Default minimum size, in bytes, of a payload to be compressed.
+DEFAULT_MIN_SIZE = 1024
+
+#: Default zlib compression level.
+DEFAULT_LEVEL = 6
+
+#: Default maximum size, in bytes, of a decompressed request payload.
+DEFAULT_MAX_DECOMPRESSED_SIZE = 10 * 1024 * 1024
+
+_WBITS = {
+    "gzip": 16 + zlib.MAX_WBITS,
+    "deflate": zlib.MAX_WBITS,
+}
+
+
+def compress(data, encoding, level=DEFAULT_LEVEL):
+    """Compresses data with the given content coding.
+
+    Parameters
+    ----------
+    data: bytes
+        The data to compress
+    encoding: str
+        One of the SUPPORTED_ENCODINGS
+    level: int
+        The zlib compression level, from 0 to 9.
+
+    Returns
+    -------
+    bytes: the compressed data
+    """
+    compressor = zlib.compressobj(level, zlib.DEFLATED, _WBITS[encoding])
+    return compressor.compress(data) + compressor.flush()
+
+
+def decompress(data, encoding, max_size=DEFAULT_MAX_DECOMPRESSED_SIZE):
+    """Decompresses a complete payload with the given content coding.
+
+    Parameters
+    ----------
+    data: bytes
+        The compressed payload
+    encoding: str
+        The content coding, as from the Content-Encoding header.
+    max_size: int
+        The maximum allowed size of the decompressed payload.
+
+    Returns
+    -------
+    bytes: the decompressed payload
+
+    Raises
+    ------
+    UnsupportedContentEncoding:
+        if the content coding is not supported.
+    PayloadTooLarge:
+        if the decompressed payload exceeds max_size.
+    BadRequest:
+        if the payload is not correctly compressed.
+    """
+    decompressor = Decompressor(encoding, max_size)
+    result = decompressor.feed(data)
+    decompressor.finish()
+    return result
+
+
+def parse_accept_encoding(header):
+    """Parses an Accept-Encoding header value.
+
+    Parameters
+    ----------
+    header: str
+        The header value, e.g. "gzip, deflate;q=0.5"
+
+    Returns
+    -------
+    dict: the content codings (lowercase) mapped to their quality value.
+    """
+    result = {}
+    for entry in header.split(","):
+        coding, _, params = entry.partition(";")
+        coding = coding.strip().lower()
+        if not coding:
+            continue
+
+        quality = 1.0
+        for param in params.split(";"):
+            key, _, value = param.partition("=")
+            if key.strip().lower() == "q":
+                try:
+                    quality = float(value)
+                except ValueError:
+                    quality = 0.0
+
+        result[coding] = quality
+
+    return result
+
+
+class Decompressor:
+    """Incremental decoder of a compressed payload.
+
+    The decompressed output is produced at most max_size + 1 bytes at
+    a time, so that a small but highly compressed payload is rejected
+    before it is fully inflated in memory.
+    """
+
+    def __init__(self, encoding, max_size=DEFAULT_MAX_DECOMPRESSED_SIZE):
+        """Initializes the decoder.
+
+        Parameters
+        ----------
+        encoding: str
+            The content coding, as from the Content-Encoding header.
+        max_size: int
+            The maximum allowed size of the decompressed payload.
+
+        Raises
+        ------
+        UnsupportedContentEncoding:
+            if the content coding is not supported.
+        """
+        encoding = encoding.strip().lower()
+        if encoding not in _WBITS:
+            raise exceptions.UnsupportedContentEncoding.from_message(
+                "Content-Encoding {} is not supported".format(encoding))
+
+        self.max_size = max_size
+        self.size = 0
+        self._decompressobj = zlib.decompressobj(_WBITS[encoding])
+
+    def feed(self, chunk):
+        """Decompresses a chunk of the payload.
+
+        Parameters
+        ----------
+        chunk: bytes
+            The next chunk of compressed data
+
+        Returns
+        -------
+        bytes: the decompressed data available so far.
+
+        Raises
+        ------
+        PayloadTooLarge:
+            if the decompressed payload exceeds max_size.
+        BadRequest:
+            if the payload is not correctly compressed.
+        """
+        pieces = []
+        data = chunk
+        while data:
+            try:
+                piece = self._decompressobj.decompress(
+                    data, self.max_size - self.size + 1)
+            except zlib.error:
+                raise exceptions.BadRequest.from_message(
+                    "Invalid compressed payload")
+
+            self.size += len(piece)
+            if self.size > self.max_size:
+                raise exceptions.PayloadTooLarge()
+
+            pieces.append(piece)
+            data = self._decompressobj.unconsumed_tail
+
+        if len(pieces) == 1:
+            return pieces[0]
+
+        return b"".join(pieces)
+
+    def finish(self):
+        """Checks that the compressed payload was complete.
+
+        Raises
+        ------
+        BadRequest:
+            if the compressed stream is truncated.
+        """
+        if not self._decompressobj.eof:
+            raise exceptions.BadRequest.from_message(
+                "Truncated compressed payload")
+
+
+class ResponseBody:
+    """An encoded response payload, together with its compressed variants.
+
+    Variants are computed on first request and kept on the instance,
+    so that a ResponseBody stored in a response cache is compressed
+    only once per content coding and level, no matter how many
+    times it is sent.
+    """
+
+    def __init__(self, data):
+        """Initializes the body.
+
+        Parameters
+        ----------
+        data: bytes
+            The encoded, uncompressed payload.
+        """
+        self.data = data
+        self._variants = {}
+
+    def __len__(self):
+        return len(self.data)
+
+    def variant(self, encoding, level=DEFAULT_LEVEL):
+        """Returns the payload compressed with the given content coding.
+
+        Parameters
+        ----------
+        encoding: str
+            One of the SUPPORTED_ENCODINGS
+        level: int
+            The zlib compression level.
+
+        Returns
+        -------
+        bytes: the compressed payload
+        """
+        key = (encoding, level)
+        try:
+            return self._variants[key]
+        except KeyError:
+            compressed = compress(self.data, encoding, level)
+            self._variants[key] = compressed
+            return compressed
+
+
+class ResponseCompression:
+    """Compression policy for the responses of the resources.
+
+    An instance is set on the Api to enable compression of the
+    JSON:API documents sent by the resources.
+    """
+
+    def __init__(self,
+                 min_size=DEFAULT_MIN_SIZE,
+                 level=DEFAULT_LEVEL,
+                 encodings=SUPPORTED_ENCODINGS):
+        """Defines the compression policy.
+
+        Parameters
+        ----------
+        min_size: int
+            Payloads smaller than this amount of bytes are sent
+            uncompressed.
+        level: int
+            The zlib compression level, from 0 to 9.
+        encodings: tuple
+            The content codings to offer, in order of preference.
+            Must be a subset of SUPPORTED_ENCODINGS.
+
+        Raises
+        ------
+        ValueError:
+            if an encoding is not supported, or level is out of range.
+        """
+        for encoding in encodings:
+            if encoding not in SUPPORTED_ENCODINGS:
+                raise ValueError(
+                    "Unsupported content coding {}".format(encoding))
+
+        if not 0 <= level <= 9:
+            raise ValueError("Compression level must be between 0 and 9")
+
+        self.min_size = min_size
+        self.level = level
+        self.encodings = tuple(encodings)
+
+    def negotiate(self, accept_encoding):
+        """Selects the content coding for a given Accept-Encoding header.
+
+        Parameters
+        ----------
+        accept_encoding: str
+            The value of the Accept-Encoding request header.
+
+        Returns
+        -------
+        str or None: the selected content coding, or None if the payload
+        must be sent uncompressed.
+        """
+        if not accept_encoding:
+            return None
+
+        accepted = parse_accept_encoding(accept_encoding)
+        wildcard = accepted.get("*", 0.0)
+
+        best, best_quality = None, 0.0
+        for encoding in self.encodings:
+            quality = accepted.get(encoding, wildcard)
+            if quality > best_quality:
+                best, best_quality = encoding, quality
+
+        return best
+
+    def apply(self, body, accept_encoding):
+        """Returns the payload to send for a given Accept-Encoding header.
+
+        Parameters
+        ----------
+        body: ResponseBody
+            The response payload
+        accept_encoding: str
+            The value of the Accept-Encoding request header.
+
+        Returns
+        -------
+        tuple: the content coding (or None if not compressed) and the
+        bytes to send.
+        """
+        if len(body) < self.min_size:
+            return None, body.data
+
+        encoding = self.negotiate(accept_encoding)
+        if encoding is None:
+            return None, body.data
+
+        return encoding, body.variant(encoding, self.level)
@@ -1,4 +1,11 @@
-from tornado import gen, log
+import inspect
+from copy import deepcopy
+
+from tornado import locks, log
+
+# The attributes describing the request served by a data layer.
+_REQUEST_CONTEXT = ("application", "current_user", "read_only",
+                    "consistency_token", "pools")
 
 
 class BaseDataLayer:
@@ -8,8 +15,27 @@ class BaseDataLayer:
 
     The Data Layer exports two member vars: application and current_user.
     They are equivalent to the members in the tornado web handler.
+    The resource also sets read_only, the consistency_token sent by the
+    client, if any, and the PoolRegistry of the Api as pools. A data
+    layer setting consistency_token during a write has it returned to
+    the client.
+
+    The operations can be reimplemented as native coroutines, as tornado
+    coroutines, or as plain methods returning their result directly,
+    which avoids any scheduling for data that is readily available.
     """
 
+    #: True if the request being served does not modify data
+    read_only = False
+
+    #: The token identifying the state of the backend the client has
+    #: seen, as sent in the X-Consistency-Token header of the request,
+    #: or as set by the data layer after a write.
+    consistency_token = None
+
+    #: The PoolRegistry of the Api, to check connections out from
+    pools = None
+
     def __init__(self, kwargs):
         """Initializes the Resource with a given application and user instance
 
@@ -27,8 +53,76 @@ class BaseDataLayer:
 
         self.log = log.app_log
 
-    @gen.coroutine
-    def create_object(self, data, view_kwargs):
+    def nested_data_layer(self, options):
+        """Returns an instance of another data layer, serving the same
+        request as this one. For the data layers delegating their
+        operations to other data layers.
+
+        Parameters
+        ----------
+        options: dict
+            The data_layer dictionary of the other data layer, with its
+            class.
+        """
+        options = dict(options)
+        data_layer_cls = options.pop("class")
+        for name in _REQUEST_CONTEXT:
+            options[name] = getattr(self, name, None)
+
+        return data_layer_cls(options)
+
+    @property
+    def cancellation(self):
+        """A tornado.locks.Event, set when the operations in progress
+        are cancelled, for example because they timed out. Long running
+        operations can wait on it, or check cancelled, to abort the
+        backend work."""
+        try:
+            return self._cancellation
+        except AttributeError:
+            self._cancellation = locks.Event()
+            return self._cancellation
+
+    @property
+    def cancelled(self):
+        """True if the operations in progress have been cancelled"""
+        return self.cancellation.is_set()
+
+    def cancel(self):
+        """Cancels the operations in progress. Called by the resource
+        when an operation times out, its result being discarded.
+        Reimplement it to abort the backend work, e.g. cancelling a
+        database query, calling the base implementation."""
+        self.cancellation.set()
+
+    @classmethod
+    async def startup(cls, api, options):
+        """Called once per process when the Api starts serving requests,
+        to set up the resources shared by the data layer instances,
+        such as connection pools.
+
+        Parameters
+        ----------
+        api: Api
+            The Api serving the resources
+        options: dict
+            The data_layer dictionary of the resource.
+        """
+
+    @classmethod
+    async def shutdown(cls, api, options):
+        """Called once per process when the Api stops serving requests,
+        to release the resources acquired in startup.
+
+        Parameters
+        ----------
+        api: Api
+            The Api serving the resources
+        options: dict
+            The data_layer dictionary of the resource.
+        """
+
+    async def create_object(self, data, view_kwargs):
         """Called to create a resource with the given data.
         The member is passed with an instance of Resource, pre-filled
         with the data from the passed (and decoded) payload.
@@ -61,8 +155,7 @@ class BaseDataLayer:
         """
         raise NotImplementedError()
 
-    @gen.coroutine
-    def get_object(self, view_kwargs):
+    async def get_object(self, view_kwargs):
         """Called to retrieve a specific resource given its
         identifier. Correspond to a GET operation on the resource URL.
 
@@ -85,8 +178,7 @@ class BaseDataLayer:
         """
         raise NotImplementedError()
 
-    @gen.coroutine
-    def update_object(self, obj, data, view_kwargs):
+    async def update_object(self, obj, data, view_kwargs):
         """Called to update (partially) a specific Resource given its
         identifier with new data. Correspond to a PATCH operation on the
         Resource URL.
@@ -114,8 +206,7 @@ class BaseDataLayer:
         """
         raise NotImplementedError()
 
-    @gen.coroutine
-    def delete_object(self, obj, view_kwargs):
+    async def delete_object(self, obj, view_kwargs):
         """Called to delete a specific resource given its identifier.
         Corresponds to a DELETE operation on the resource URL.
 
@@ -139,8 +230,7 @@ class BaseDataLayer:
         """
         raise NotImplementedError()
 
-    @gen.coroutine
-    def get_collection(self, qs, view_kwargs):
+    async def get_collection(self, qs, view_kwargs):
         """Invoked when a GET request is performed to the collection URL.
 
         Parameters
@@ -161,6 +251,84 @@ class BaseDataLayer:
         """
         raise NotImplementedError()
 
+    async def get_collection_batch(self, qs, cursor, size, view_kwargs):
+        """Invoked repeatedly to export the whole collection, one batch
+        at a time, honoring the filters and sorting of the query.
+
+        The default implementation pages through get_collection, so
+        each batch costs an offset query and a count, and the objects
+        changed during the export can be skipped or repeated.
+        Reimplement it with a server side cursor or keyset pagination
+        for the export to be streamed from the backend.
+
+        Parameters
+        ----------
+        qs:
+            The QueryManager information, without pagination.
+        cursor:
+            None for the first batch, then the cursor returned with
+            the previous batch.
+        size: int
+            The suggested number of objects in the batch.
+        view_kwargs: dict
+            The view kwargs passed by the URL capture groups
+
+        Returns
+        -------
+        tuple: the list of objects of the batch, and the cursor of the
+        next batch, or None if the batch is the last one.
+        """
+        number = cursor or 0
+        page_qs = deepcopy(qs)
+        page_qs["page[number]"] = number
+        page_qs["page[size]"] = size
+
+        result = self.get_collection(page_qs, view_kwargs)
+        if inspect.isawaitable(result):
+            result = await result
+
+        total_num, items = result
+        if (number + 1) * size >= total_num or not items:
+            return items, None
+
+        return items, number + 1
+
+    async def get_changes(self, qs, since, view_kwargs):
+        """Invoked when a GET request to the collection URL has a since
+        parameter, to return the changes of the collection after the
+        point identified by the token. Reimplement it to support delta
+        queries, for example with a ChangeLog.
+
+        Parameters
+        ----------
+        qs:
+            The QueryManager information. The page size limits the
+            number of changes returned.
+        since: str
+            The token returned by a previous delta query, or an empty
+            string for the initial synchronization, which returns all
+            the objects.
+        view_kwargs: dict
+            The view kwargs passed by the URL capture groups
+
+        Returns
+        -------
+        tuple: the created or updated objects, the identifiers of the
+        deleted objects, the token of the point reached, and True if
+        more changes follow it.
+
+        Raises
+        ------
+        InvalidSince:
+            If the token is malformed.
+        SyncTokenExpired:
+            If the changes after the token are no longer known, so that
+            the client must synchronize again from scratch.
+        NotImplementedError:
+            If the resource collection does not support delta queries.
+        """
+        raise NotImplementedError()
+
     def create_relationship(self, json_data, relationship_field,
                             related_id_field, view_kwargs):
         """Create a relationship
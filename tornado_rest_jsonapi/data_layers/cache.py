@@ -0,0 +1,512 @@
+import collections
+import inspect
+import json
+import sys
+import time
+
+from .base import BaseDataLayer
+
+#: Default time to live, in seconds, of the cached objects.
+DEFAULT_TTL = 60.0
+
+#: Default maximum number of cached entries.
+DEFAULT_MAX_ENTRIES = 10000
+
+_MISSING = object()
+
+
+def estimate_size(value):
+    """Estimates the memory retained by a value, in bytes, following
+    the containers and the attributes of the objects it refers to.
+    Shared objects are counted once."""
+    seen = set()
+    pending = [value]
+    size = 0
+    while pending:
+        obj = pending.pop()
+        if id(obj) in seen:
+            continue
+        seen.add(id(obj))
+        size += sys.getsizeof(obj)
+
+        if isinstance(obj, (str, bytes, bytearray, int, float, bool)):
+            continue
+        if isinstance(obj, dict):
+            pending.extend(obj.keys())
+            pending.extend(obj.values())
+        elif isinstance(obj, (list, tuple, set, frozenset)):
+            pending.extend(obj)
+        elif hasattr(obj, "__dict__"):
+            pending.append(obj.__dict__)
+
+    return size
+
+
+def _freeze(value):
+    """Converts the lists of a decoded JSON value into tuples."""
+    if isinstance(value, list):
+        return tuple(_freeze(item) for item in value)
+    return value
+
+
+class _Fill:
+    """A computation of a value to cache, started with start_fill"""
+    __slots__ = ("groups", "generations")
+
+    def __init__(self, groups, generations):
+        self.groups = groups
+        self.generations = generations
+
+
+class _Entry:
+    __slots__ = ("value", "expires", "size", "groups")
+
+    def __init__(self, value, expires, size, groups):
+        self.value = value
+        self.expires = expires
+        self.size = size
+        self.groups = groups
+
+
+class ObjectCache:
+    """An in-memory cache of the results of the data layers, bounded in
+    number of entries, in estimated memory and in time.
+
+    Entries expire after the time to live, and the least recently used
+    ones are evicted when a bound is exceeded. Each entry can belong to
+    groups, which are invalidated as a whole. When attached to an
+    InvalidationBus, group invalidations are broadcast to the caches of
+    the same name in the other workers.
+
+    Cached values are shared by all the requests hitting them, and must
+    not be modified.
+
+    A value computed while one of its groups is invalidated may be
+    stale. Such values are not cached if the computation is delimited
+    by start_fill and end_fill.
+    """
+
+    def __init__(self,
+                 name="default",
+                 ttl=DEFAULT_TTL,
+                 max_entries=DEFAULT_MAX_ENTRIES,
+                 max_bytes=None,
+                 sizeof=estimate_size):
+        """Defines the cache.
+
+        Parameters
+        ----------
+        name: str
+            Identifies the cache among the workers.
+        ttl: float or None
+            The time to live of the entries, in seconds. None for no
+            expiration.
+        max_entries: int or None
+            The maximum number of entries. None for no limit.
+        max_bytes: int or None
+            The memory budget, in estimated bytes. None for no limit.
+        sizeof: callable
+            Returns the estimated size of a value, in bytes. Only used
+            with a memory budget.
+        """
+        self.name = name
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.sizeof = sizeof
+
+        self._entries = collections.OrderedDict()
+        self._groups = collections.defaultdict(set)
+        self._bytes = 0
+        self._bus = None
+
+        # The generation of the groups with fills in progress, and the
+        # number of these fills, by group
+        self._fills = {}
+
+        #: Number of lookups finding a valid entry
+        self.hits = 0
+
+        #: Number of lookups finding no valid entry
+        self.misses = 0
+
+        #: Number of entries evicted to honor the bounds
+        self.evictions = 0
+
+    def __len__(self):
+        return len(self._entries)
+
+    @property
+    def size(self):
+        """The estimated size of the cached values, in bytes, if the
+        cache has a memory budget, else 0."""
+        return self._bytes
+
+    def get(self, key, default=None):
+        """Returns the value cached for a key, or default.
+
+        Parameters
+        ----------
+        key: hashable
+            The key
+        default:
+            The value returned if the key is not cached or expired.
+        """
+        entry = self._entries.get(key)
+        if entry is None:
+            self.misses += 1
+            return default
+
+        if entry.expires is not None and entry.expires <= time.monotonic():
+            self._remove(key)
+            self.misses += 1
+            return default
+
+        self._entries.move_to_end(key)
+        self.hits += 1
+        return entry.value
+
+    def put(self, key, value, groups=()):
+        """Caches a value, evicting the least recently used entries if
+        needed.
+
+        Parameters
+        ----------
+        key: hashable
+            The key
+        value:
+            The value to cache
+        groups: iterable
+            The hashable groups the entry belongs to.
+        """
+        if key in self._entries:
+            self._remove(key)
+
+        size = 0
+        if self.max_bytes is not None:
+            size = self.sizeof(value)
+            if size > self.max_bytes:
+                return
+
+        expires = None
+        if self.ttl is not None:
+            expires = time.monotonic() + self.ttl
+
+        groups = tuple(groups)
+        self._entries[key] = _Entry(value, expires, size, groups)
+        self._bytes += size
+        for group in groups:
+            self._groups[group].add(key)
+
+        while ((self.max_entries is not None and
+                len(self._entries) > self.max_entries) or
+               (self.max_bytes is not None and
+                self._bytes > self.max_bytes)):
+            self._remove(next(iter(self._entries)))
+            self.evictions += 1
+
+    def start_fill(self, groups):
+        """Marks the start of the computation of a value to cache.
+
+        Parameters
+        ----------
+        groups: iterable
+            The hashable groups the value will belong to.
+
+        Returns
+        -------
+        object: to be passed to end_fill once the computation is over,
+        successful or not.
+        """
+        groups = tuple(groups)
+        generations = []
+        for group in groups:
+            state = self._fills.get(group)
+            if state is None:
+                state = self._fills[group] = [0, 0]
+            state[1] += 1
+            generations.append(state[0])
+
+        return _Fill(groups, tuple(generations))
+
+    def end_fill(self, fill):
+        """Marks the end of a computation started with start_fill.
+
+        Returns
+        -------
+        bool: True if none of the groups has been invalidated since the
+        start of the computation, so that its value can be cached.
+        """
+        valid = True
+        for group, generation in zip(fill.groups, fill.generations):
+            state = self._fills[group]
+            if state[0] != generation:
+                valid = False
+            state[1] -= 1
+            if state[1] == 0:
+                del self._fills[group]
+
+        return valid
+
+    def invalidate(self, key):
+        """Removes the entry of a key, if any."""
+        if key in self._entries:
+            self._remove(key)
+
+    def invalidate_group(self, group):
+        """Removes all the entries of a group, here and, if attached to
+        an InvalidationBus, in the other workers.
+
+        Parameters
+        ----------
+        group: hashable
+            The group, made of JSON serializable values if the cache is
+            attached to an InvalidationBus.
+        """
+        self._invalidate_group(group)
+        if self._bus is not None:
+            self._bus.publish({"object_cache": self.name, "group": group})
+
+    def clear(self):
+        """Removes all the entries."""
+        self._entries.clear()
+        self._groups.clear()
+        self._bytes = 0
+        for state in self._fills.values():
+            state[0] += 1
+
+    def attach(self, bus):
+        """Attaches the cache to an InvalidationBus."""
+        if self._bus is not None:
+            return
+
+        self._bus = bus
+        bus.subscribe(self._on_message)
+
+    def detach(self):
+        """Detaches the cache from its InvalidationBus."""
+        if self._bus is None:
+            return
+
+        self._bus.unsubscribe(self._on_message)
+        self._bus = None
+
+    def _on_message(self, message):
+        if message.get("object_cache") == self.name:
+            self._invalidate_group(_freeze(message["group"]))
+
+    def _invalidate_group(self, group):
+        state = self._fills.get(group)
+        if state is not None:
+            state[0] += 1
+
+        for key in list(self._groups.pop(group, ())):
+            self._remove(key)
+
+    def _remove(self, key):
+        entry = self._entries.pop(key)
+        self._bytes -= entry.size
+        for group in entry.groups:
+            keys = self._groups.get(group)
+            if keys is not None:
+                keys.discard(key)
+                if not keys:
+                    del self._groups[group]
+
+
+def shared_scope(current_user):
+    """Cache scope sharing the entries among all the users."""
+    return None
+
+
+def user_scope(current_user):
+    """Cache scope keeping separate entries for each user. The requests
+    of the users that are not hashable are not cached."""
+    return current_user
+
+
+class CachingDataLayer(BaseDataLayer):
+    """Read-through cache around another data layer.
+
+    The results of get_object are cached by view kwargs, and those of
+    get_collection by filters, sorting, pagination and view kwargs.
+    Creating, updating or deleting an object through this data layer
+    invalidates the cached collections, and the cached object. Cache
+    hits are returned without involving the wrapped data layer or any
+    future. The results of lookups that run concurrently with such a
+    change are not cached. Only the read only requests, GET and HEAD,
+    use the cache: the other requests, which may modify the objects
+    they get, read them from the wrapped data layer.
+
+    It is configured in the data_layer dictionary of the resource::
+
+        data_layer = {
+            "class": CachingDataLayer,
+            "wrapped": {"class": MyDataLayer, "session": ...},
+            "cache": ObjectCache(ttl=30, max_bytes=64 * 1024 * 1024),
+            "scope": shared_scope,
+        }
+
+    The scope function receives the current user, and returns the
+    hashable part of the keys that depends on it. The default,
+    user_scope, keeps separate entries per user, and shared_scope
+    shares the entries among all users. The requests whose scope is
+    not hashable, such as a user represented by a dict, do not use the
+    cache. The namespace, by default the
+    name of the wrapped class, separates the entries of different
+    collections sharing the same cache.
+
+    Changes performed by other means than this data layer are only
+    seen once the entries expire.
+    """
+
+    #: The options of the wrapped data layer, with its class
+    wrapped = None
+
+    #: The ObjectCache holding the entries
+    cache = None
+
+    #: Returns the part of the keys depending on the current user
+    scope = staticmethod(user_scope)
+
+    #: Separates the entries of different collections in the cache
+    namespace = None
+
+    def __init__(self, kwargs):
+        super().__init__(kwargs)
+        self.wrapped_layer = self.nested_data_layer(self.wrapped)
+
+        if self.namespace is None:
+            self.namespace = self.wrapped["class"].__name__
+
+        self._scope = self.scope(self.current_user)
+        self._cached = self.read_only
+        if self._cached:
+            try:
+                hash(self._scope)
+            except TypeError:
+                self._cached = False
+
+    @classmethod
+    async def startup(cls, api, options):
+        bus = api.invalidation_bus
+        if bus is not None:
+            options.get("cache", cls.cache).attach(bus)
+
+        wrapped = dict(options.get("wrapped", cls.wrapped))
+        result = wrapped["class"].startup(api, wrapped)
+        if inspect.isawaitable(result):
+            await result
+
+    @classmethod
+    async def shutdown(cls, api, options):
+        wrapped = dict(options.get("wrapped", cls.wrapped))
+        result = wrapped["class"].shutdown(api, wrapped)
+        if inspect.isawaitable(result):
+            await result
+
+        options.get("cache", cls.cache).detach()
+
+    def cancel(self):
+        super().cancel()
+        self.wrapped_layer.cancel()
+
+    def get_object(self, view_kwargs):
+        if not self._cached:
+            return self._call("get_object", view_kwargs)
+
+        key = self._object_key(view_kwargs)
+        obj = self.cache.get(key, _MISSING)
+        if obj is not _MISSING:
+            return obj
+
+        return self._get_and_cache(
+            key, (self._object_group(view_kwargs), ),
+            "get_object", view_kwargs)
+
+    def get_collection(self, qs, view_kwargs):
+        if not self._cached:
+            return self._call("get_collection", qs, view_kwargs)
+
+        key = (self.namespace,
+               "collection",
+               self._scope,
+               json.dumps(qs.filters, sort_keys=True),
+               tuple((item["field"], item["order"]) for item in qs.sorting),
+               tuple(sorted(qs.pagination.items())),
+               _view_key(view_kwargs))
+        result = self.cache.get(key, _MISSING)
+        if result is not _MISSING:
+            return result
+
+        return self._get_and_cache(
+            key, (self._collection_group(), ),
+            "get_collection", qs, view_kwargs)
+
+    async def create_object(self, data, view_kwargs):
+        try:
+            return await self._write("create_object", data, view_kwargs)
+        finally:
+            self.cache.invalidate_group(self._collection_group())
+
+    async def update_object(self, obj, data, view_kwargs):
+        try:
+            return await self._write("update_object", obj, data, view_kwargs)
+        finally:
+            self._invalidate_object(view_kwargs)
+
+    async def delete_object(self, obj, view_kwargs):
+        try:
+            return await self._write("delete_object", obj, view_kwargs)
+        finally:
+            self._invalidate_object(view_kwargs)
+
+    async def get_collection_batch(self, qs, cursor, size, view_kwargs):
+        return await self._call(
+            "get_collection_batch", qs, cursor, size, view_kwargs)
+
+    async def get_changes(self, qs, since, view_kwargs):
+        return await self._call("get_changes", qs, since, view_kwargs)
+
+    async def _get_and_cache(self, key, groups, operation, *args):
+        fill = self.cache.start_fill(groups)
+        try:
+            result = await self._call(operation, *args)
+        finally:
+            valid = self.cache.end_fill(fill)
+
+        if valid:
+            self.cache.put(key, result, groups)
+        return result
+
+    async def _write(self, operation, *args):
+        """Calls a write operation, and takes the consistency token it
+        produced, such as the one of a ReplicatedDataLayer."""
+        result = await self._call(operation, *args)
+        self.consistency_token = self.wrapped_layer.consistency_token
+        return result
+
+    async def _call(self, operation, *args):
+        result = getattr(self.wrapped_layer, operation)(*args)
+        if inspect.isawaitable(result):
+            result = await result
+        return result
+
+    def _invalidate_object(self, view_kwargs):
+        self.cache.invalidate_group(self._collection_group())
+        self.cache.invalidate_group(self._object_group(view_kwargs))
+
+    def _object_key(self, view_kwargs):
+        return (self.namespace, "object", self._scope,
+                _view_key(view_kwargs))
+
+    def _object_group(self, view_kwargs):
+        return (self.namespace, "object", _view_key(view_kwargs))
+
+    def _collection_group(self):
+        return (self.namespace, "collection")
+
+
+def _view_key(view_kwargs):
+    return tuple(sorted((key, str(value))
+                        for key, value in view_kwargs.items()))
@@ -0,0 +1,178 @@
+import bisect
+import collections
+import uuid
+
+from .. import exceptions
+
+#: Default number of tombstones kept for the deleted objects.
+DEFAULT_MAX_TOMBSTONES = 10000
+
+
+class ChangeLog:
+    """Tracks the changes of a collection in memory, so that a data
+    layer can serve delta queries.
+
+    The log keeps, for each identifier, the sequence number of its last
+    change and whether it was a deletion, ordered by sequence number.
+    Its size is therefore bounded by the size of the collection plus
+    the tombstones of the deleted objects. The oldest tombstones beyond
+    max_tombstones are discarded, and the tokens preceding them expire.
+    A page of changes is found by bisection on the sequence numbers,
+    so that its cost does not depend on the changes before the token.
+
+    Tokens have the form "<epoch>.<sequence>". The epoch identifies the
+    log, so that the tokens of another process, or from before a
+    restart, are reported as expired.
+
+    Example::
+
+        class MyDataLayer(BaseDataLayer):
+            changelog = ChangeLog()
+
+            async def create_object(self, data, view_kwargs):
+                ...
+                self.changelog.record(obj.id)
+
+            async def get_changes(self, qs, since, view_kwargs):
+                ids, deleted, token, more = self.changelog.changes(
+                    since, qs.pagination.get("size", DEFAULT_PAGE_SIZE))
+                return [self.load(id) for id in ids], deleted, token, more
+    """
+
+    def __init__(self, max_tombstones=DEFAULT_MAX_TOMBSTONES):
+        """Defines the log.
+
+        Parameters
+        ----------
+        max_tombstones: int
+            The number of deleted identifiers remembered.
+        """
+        self.max_tombstones = max_tombstones
+        self.epoch = uuid.uuid4().hex[:12]
+
+        # The sequence number of the last change of each identifier,
+        # and whether it was a deletion
+        self._entries = {}
+        self._tombstones = collections.OrderedDict()
+        self._seq = 0
+        self._horizon = 0
+
+        # The changes in sequence order, including those superseded by
+        # a later change of the same identifier until the next compaction
+        self._seqs = []
+        self._identifiers = []
+        self._superseded = 0
+
+    @property
+    def token(self):
+        """The token of the current point of the log"""
+        return self._token(self._seq)
+
+    def record(self, identifier, deleted=False):
+        """Records the creation, update or deletion of an object.
+
+        Parameters
+        ----------
+        identifier: str
+            The identifier of the object
+        deleted: bool
+            True if the object has been deleted
+        """
+        self._seq += 1
+        if identifier in self._entries:
+            self._superseded += 1
+        self._tombstones.pop(identifier, None)
+        self._entries[identifier] = (self._seq, deleted)
+        self._seqs.append(self._seq)
+        self._identifiers.append(identifier)
+
+        if deleted:
+            self._tombstones[identifier] = self._seq
+            if len(self._tombstones) > self.max_tombstones:
+                oldest, seq = self._tombstones.popitem(last=False)
+                del self._entries[oldest]
+                self._superseded += 1
+                self._horizon = seq
+
+        if self._superseded > len(self._entries):
+            self._compact()
+
+    def changes(self, since, limit=None):
+        """Returns the changes following a token, oldest first.
+
+        Parameters
+        ----------
+        since: str
+            A token of this log, or an empty string for all the
+            existing objects.
+        limit: int or None
+            The maximum number of changes returned. None or 0 for all.
+
+        Returns
+        -------
+        tuple: the identifiers of the created or updated objects, the
+        identifiers of the deleted objects, the token of the point
+        reached, and True if more changes follow it.
+
+        Raises
+        ------
+        InvalidSince:
+            if the token is malformed
+        SyncTokenExpired:
+            if the token is not of this log or has expired
+        """
+        initial = since == ""
+        seq = 0 if initial else self._parse(since)
+
+        # One more than the limit, to know if more changes follow
+        wanted = limit + 1 if limit else None
+        entries = []
+        for index in range(bisect.bisect_right(self._seqs, seq),
+                           len(self._seqs)):
+            identifier = self._identifiers[index]
+            entry_seq, deleted = self._entries.get(identifier, (None, None))
+            if entry_seq != self._seqs[index]:
+                # Superseded
+                continue
+            if initial and deleted:
+                continue
+            entries.append((identifier, entry_seq, deleted))
+            if len(entries) == wanted:
+                break
+
+        more = bool(limit) and len(entries) > limit
+        if more:
+            entries = entries[:limit]
+            token = self._token(entries[-1][1])
+        else:
+            token = self.token
+
+        updated = [identifier for identifier, _, deleted in entries
+                   if not deleted]
+        deleted = [identifier for identifier, _, deleted in entries
+                   if deleted]
+        return updated, deleted, token, more
+
+    def _compact(self):
+        """Drops the superseded changes."""
+        live = [(seq, identifier)
+                for seq, identifier in zip(self._seqs, self._identifiers)
+                if self._entries.get(identifier, (None, ))[0] == seq]
+        self._seqs = [seq for seq, _ in live]
+        self._identifiers = [identifier for _, identifier in live]
+        self._superseded = 0
+
+    def _token(self, seq):
+        return "{}.{}".format(self.epoch, seq)
+
+    def _parse(self, token):
+        epoch, _, seq = token.partition(".")
+        try:
+            seq = int(seq)
+        except ValueError:
+            raise exceptions.InvalidSince()
+
+        if epoch != self.epoch or seq > self._seq or seq < self._horizon:
+            raise exceptions.SyncTokenExpired()
+
+        return seq
@@ -0,0 +1,276 @@
+import inspect
+
+from .base import BaseDataLayer
+
+#: Sends the reads to the replicas in turn.
+ROUND_ROBIN = "round_robin"
+
+#: Sends the reads to the replica with the fewest reads in progress.
+LEAST_OUTSTANDING = "least_outstanding"
+
+# The index standing for the primary in the export cursors.
+_PRIMARY = -1
+
+
+class ReplicaSet:
+    """The balancing state of the replicas of a ReplicatedDataLayer,
+    shared by the data layer instances of all the requests.
+
+    Besides the reads in progress on each replica, it remembers the
+    highest replication position seen for each of them. Positions only
+    grow, so a replica known to have reached a token is not asked for
+    its position again.
+    """
+
+    def __init__(self, balancing=ROUND_ROBIN):
+        """Defines the replica set.
+
+        Parameters
+        ----------
+        balancing: str
+            ROUND_ROBIN or LEAST_OUTSTANDING.
+
+        Raises
+        ------
+        ValueError:
+            if the balancing is unknown
+        """
+        if balancing not in (ROUND_ROBIN, LEAST_OUTSTANDING):
+            raise ValueError("Unknown balancing {!r}".format(balancing))
+
+        self.balancing = balancing
+        self._next = 0
+
+        #: The number of reads in progress, by replica index
+        self.outstanding = {}
+
+        #: The highest replication position seen, by replica index
+        self.positions = {}
+
+        #: Number of reads served by the replicas
+        self.replica_reads = 0
+
+        #: Number of reads served by the primary
+        self.primary_reads = 0
+
+    def order(self, num_replicas):
+        """Returns the indexes of the replicas, in order of preference
+        for the next read."""
+        indexes = list(range(num_replicas))
+        if self.balancing == ROUND_ROBIN:
+            start = self._next % num_replicas
+            self._next = start + 1
+            return indexes[start:] + indexes[:start]
+
+        return sorted(indexes,
+                      key=lambda index: self.outstanding.get(index, 0))
+
+    def acquire(self, index):
+        """Records the start of a read on a replica, or on the primary
+        for index -1."""
+        if index == _PRIMARY:
+            self.primary_reads += 1
+            return
+
+        self.replica_reads += 1
+        self.outstanding[index] = self.outstanding.get(index, 0) + 1
+
+    def release(self, index):
+        """Records the end of a read."""
+        if index != _PRIMARY:
+            self.outstanding[index] -= 1
+
+    def reached(self, index, position):
+        """Records the replication position of a replica, returning the
+        highest seen."""
+        position = max(position, self.positions.get(index, position))
+        self.positions[index] = position
+        return position
+
+
+class ReplicatedDataLayer(BaseDataLayer):
+    """Routes the operations between a primary data layer, taking the
+    writes, and replica data layers, serving the reads.
+
+    The reads of the GET requests are balanced among the replicas. All
+    the operations of the other requests go to the primary, so that
+    the objects they update are read from it.
+
+    Replicas lag behind the primary. To read their own writes, clients
+    send back the X-Consistency-Token header returned by the writes: the
+    reads carrying a token only go to a replica that has caught up with
+    it, or else to the primary. Tokens are the replication positions of
+    the backend, as returned by the replication_position method of the
+    data layers: an increasing integer, such as a log sequence number,
+    which can be a plain method or a coroutine. If the primary does not
+    report positions, no token is returned; if a replica does not, it
+    is never considered caught up.
+
+    It is configured in the data_layer dictionary of the resource::
+
+        data_layer = {
+            "class": ReplicatedDataLayer,
+            "primary": {"class": MyDataLayer, "url": "db://primary"},
+            "replicas": [
+                {"class": MyDataLayer, "url": "db://replica0"},
+                {"class": MyDataLayer, "url": "db://replica1"},
+            ],
+            "replica_set": ReplicaSet(LEAST_OUTSTANDING),
+        }
+
+    Without a replica_set option, startup sets a ReplicaSet with the
+    default balancing in the options.
+
+    Delta queries are served by the primary, as change tokens are
+    specific to a backend.
+    """
+
+    #: The options of the primary data layer, with its class
+    primary = None
+
+    #: The options of the replica data layers, each with its class
+    replicas = ()
+
+    #: The ReplicaSet balancing the reads, shared by the instances
+    replica_set = None
+
+    def __init__(self, kwargs):
+        super().__init__(kwargs)
+        if self.replica_set is None:
+            raise ValueError(
+                "ReplicatedDataLayer has no replica_set: set it in the "
+                "data_layer options, or start the Api up")
+
+        self._layers = {}
+
+    @classmethod
+    async def startup(cls, api, options):
+        if options.get("replica_set", cls.replica_set) is None:
+            options["replica_set"] = ReplicaSet()
+
+        for layer in cls._layer_options(options):
+            await _resolve(layer["class"].startup(api, dict(layer)))
+
+    @classmethod
+    async def shutdown(cls, api, options):
+        for layer in cls._layer_options(options):
+            await _resolve(layer["class"].shutdown(api, dict(layer)))
+
+    @classmethod
+    def _layer_options(cls, options):
+        """Returns the options of the primary, then of the replicas."""
+        return ([options.get("primary", cls.primary)] +
+                list(options.get("replicas", cls.replicas)))
+
+    def cancel(self):
+        super().cancel()
+        for layer in self._layers.values():
+            layer.cancel()
+
+    def layer(self, index):
+        """Returns the data layer of a replica, or of the primary for
+        index -1, created on first use."""
+        try:
+            return self._layers[index]
+        except KeyError:
+            pass
+
+        layer = self._layers[index] = self.nested_data_layer(
+            self.primary if index == _PRIMARY else self.replicas[index])
+        return layer
+
+    async def create_object(self, data, view_kwargs):
+        return await self._write("create_object", data, view_kwargs)
+
+    async def update_object(self, obj, data, view_kwargs):
+        return await self._write("update_object", obj, data, view_kwargs)
+
+    async def delete_object(self, obj, view_kwargs):
+        return await self._write("delete_object", obj, view_kwargs)
+
+    async def get_object(self, view_kwargs):
+        index = await self._read_index()
+        return await self._read(index, "get_object", view_kwargs)
+
+    async def get_collection(self, qs, view_kwargs):
+        index = await self._read_index()
+        return await self._read(index, "get_collection", qs, view_kwargs)
+
+    async def get_collection_batch(self, qs, cursor, size, view_kwargs):
+        # All the batches are read from the same data layer
+        if cursor is None:
+            index, layer_cursor = await self._read_index(), None
+        else:
+            index, layer_cursor = cursor
+
+        items, layer_cursor = await self._read(
+            index, "get_collection_batch", qs, layer_cursor, size, view_kwargs)
+        if layer_cursor is None:
+            return items, None
+
+        return items, (index, layer_cursor)
+
+    async def get_changes(self, qs, since, view_kwargs):
+        return await self._read(
+            _PRIMARY, "get_changes", qs, since, view_kwargs)
+
+    async def _write(self, operation, *args):
+        primary = self.layer(_PRIMARY)
+        result = await _resolve(getattr(primary, operation)(*args))
+
+        position = await _position(primary)
+        if position is not None:
+            self.consistency_token = str(position)
+
+        return result
+
+    async def _read(self, index, operation, *args):
+        self.replica_set.acquire(index)
+        try:
+            return await _resolve(getattr(self.layer(index), operation)(*args))
+        finally:
+            self.replica_set.release(index)
+
+    async def _read_index(self):
+        """Returns the index of the replica to read from, or -1 for the
+        primary."""
+        if not self.read_only or not self.replicas:
+            return _PRIMARY
+
+        replica_set = self.replica_set
+        order = replica_set.order(len(self.replicas))
+        if self.consistency_token is None:
+            return order[0]
+
+        try:
+            token = int(self.consistency_token)
+        except ValueError:
+            # Not one of ours: the primary is always consistent
+            return _PRIMARY
+
+        for index in order:
+            if replica_set.positions.get(index, token - 1) >= token:
+                return index
+
+            position = await _position(self.layer(index))
+            if (position is not None and
+                    replica_set.reached(index, position) >= token):
+                return index
+
+        return _PRIMARY
+
+
+async def _position(layer):
+    """Returns the replication position of a data layer, or None if it
+    does not report it."""
+    replication_position = getattr(layer, "replication_position", None)
+    if replication_position is None:
+        return None
+
+    return await _resolve(replication_position())
+
+
+async def _resolve(result):
+    if inspect.isawaitable(result):
+        result = await result
+    return result
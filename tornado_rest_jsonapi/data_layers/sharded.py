@@ -0,0 +1,277 @@
+import bisect
+import collections.abc
+import functools
+import heapq
+import inspect
+import itertools
+import zlib
+from copy import deepcopy
+
+from tornado import gen
+
+from .. import exceptions
+from ..pagination import DEFAULT_PAGE_SIZE
+from .base import BaseDataLayer
+
+
+def hash_partition(identifier, num_shards):
+    """Returns the shard of an identifier, by a hash that is stable
+    across processes and restarts."""
+    return zlib.crc32(str(identifier).encode("utf-8")) % num_shards
+
+
+class RangePartition:
+    """Assigns the identifiers to shards by ranges.
+
+    Example::
+
+        # Shard 0 for ids below 1000, 1 up to 2000, 2 from 2000
+        RangePartition([1000, 2000], key=int)
+    """
+
+    def __init__(self, bounds, key=None):
+        """Defines the partition.
+
+        Parameters
+        ----------
+        bounds: list
+            The sorted lower bounds of the shards after the first.
+        key: callable or None
+            Converts the identifiers, which come as strings from the
+            URLs, before the comparison with the bounds.
+        """
+        self.bounds = list(bounds)
+        self.key = key
+
+    def __call__(self, identifier, num_shards):
+        if self.key is not None:
+            identifier = self.key(identifier)
+        return min(bisect.bisect_right(self.bounds, identifier),
+                   num_shards - 1)
+
+
+class ShardedDataLayer(BaseDataLayer):
+    """Partitions the objects of a collection across several data
+    layers, the shards, according to their identifier.
+
+    Operations on an object are routed to its shard. Collections are
+    requested from all the shards concurrently, and the partial results
+    merged according to the sorting of the query. For the page at
+    offset O of size S, each shard is asked for its first O + S
+    objects, so deep pages are expensive: exporting the collection
+    walks the shards with cursors instead. The total count is the sum
+    of the counts of the shards.
+
+    It is configured in the data_layer dictionary of the resource::
+
+        data_layer = {
+            "class": ShardedDataLayer,
+            "shards": [
+                {"class": MyDataLayer, "url": "db://shard0"},
+                {"class": MyDataLayer, "url": "db://shard1"},
+            ],
+            "partition": hash_partition,
+        }
+
+    The identifier of new objects must be part of the payload, unless
+    a placement function is given, called with the data, the view
+    kwargs and the number of shards, that returns the shard.
+    """
+
+    #: The options of the shards, each with its class
+    shards = None
+
+    #: Returns the shard of an identifier, given the number of shards
+    partition = staticmethod(hash_partition)
+
+    #: Returns the shard of a new object, given its data, the view
+    #: kwargs and the number of shards. None to use the identifier.
+    placement = None
+
+    #: The name of the identifier, in the view kwargs and the data
+    url_field = "id"
+
+    def __init__(self, kwargs):
+        super().__init__(kwargs)
+        self.shard_layers = [self.nested_data_layer(options)
+                             for options in self.shards]
+
+    @classmethod
+    async def startup(cls, api, options):
+        for shard in options["shards"]:
+            await _resolve(shard["class"].startup(api, dict(shard)))
+
+    @classmethod
+    async def shutdown(cls, api, options):
+        for shard in reversed(options["shards"]):
+            await _resolve(shard["class"].shutdown(api, dict(shard)))
+
+    def cancel(self):
+        super().cancel()
+        for shard in self.shard_layers:
+            shard.cancel()
+
+    def shard_for(self, identifier):
+        """Returns the data layer of the shard of an identifier."""
+        return self.shard_layers[
+            self.partition(identifier, len(self.shard_layers))]
+
+    async def create_object(self, data, view_kwargs):
+        num_shards = len(self.shard_layers)
+        if self.placement is not None:
+            shard = self.shard_layers[
+                self.placement(data, view_kwargs, num_shards)]
+        elif data.get(self.url_field) is not None:
+            shard = self.shard_for(data[self.url_field])
+        else:
+            raise exceptions.BadRequest.from_message(
+                "Objects must be created with an identifier")
+
+        return await _resolve(shard.create_object(data, view_kwargs))
+
+    async def get_object(self, view_kwargs):
+        shard = self.shard_for(view_kwargs[self.url_field])
+        return await _resolve(shard.get_object(view_kwargs))
+
+    async def update_object(self, obj, data, view_kwargs):
+        shard = self.shard_for(view_kwargs[self.url_field])
+        return await _resolve(shard.update_object(obj, data, view_kwargs))
+
+    async def delete_object(self, obj, view_kwargs):
+        shard = self.shard_for(view_kwargs[self.url_field])
+        return await _resolve(shard.delete_object(obj, view_kwargs))
+
+    async def get_collection(self, qs, view_kwargs):
+        pagination = qs.pagination
+        size = pagination.get("size", DEFAULT_PAGE_SIZE)
+        offset = pagination.get("number", 0) * size
+
+        shard_qs = deepcopy(qs)
+        if size != 0:
+            shard_qs["page[number]"] = 0
+            shard_qs["page[size]"] = offset + size
+
+        results = await _gather([shard.get_collection(shard_qs, view_kwargs)
+                                 for shard in self.shard_layers])
+
+        total_num = sum(total for total, _ in results)
+        items = _merge([items for _, items in results], qs.sorting)
+        if size == 0:
+            return total_num, list(items)
+
+        return total_num, list(
+            itertools.islice(items, offset, offset + size))
+
+    async def get_collection_batch(self, qs, cursor, size, view_kwargs):
+        if cursor is None:
+            cursor = _ExportCursor(len(self.shard_layers))
+
+        # Refill the shards whose buffered objects have all been merged
+        refill = [index for index, buffer in enumerate(cursor.buffers)
+                  if not buffer and not cursor.exhausted[index]]
+        results = await _gather([
+            self.shard_layers[index].get_collection_batch(
+                qs, cursor.cursors[index], size, view_kwargs)
+            for index in refill])
+        for index, (items, shard_cursor) in zip(refill, results):
+            cursor.buffers[index] = collections.deque(items)
+            cursor.cursors[index] = shard_cursor
+            cursor.exhausted[index] = shard_cursor is None
+
+        # Merge until a shard that can still provide objects runs out,
+        # as its next objects may come before the others'.
+        key = _sort_key(qs.sorting)
+        batch = []
+        while len(batch) < size:
+            candidates = [index for index, buffer in enumerate(cursor.buffers)
+                          if buffer]
+            if not candidates:
+                break
+            if any(not cursor.buffers[index] and not cursor.exhausted[index]
+                   for index in range(len(cursor.buffers))):
+                break
+
+            if key is None:
+                index = candidates[0]
+            else:
+                index = min(candidates,
+                            key=lambda i: key(cursor.buffers[i][0]))
+            batch.append(cursor.buffers[index].popleft())
+
+        if all(cursor.exhausted) and not any(cursor.buffers):
+            return batch, None
+
+        return batch, cursor
+
+
+class _ExportCursor:
+    """The state of an export across the shards"""
+
+    def __init__(self, num_shards):
+        self.cursors = [None] * num_shards
+        self.buffers = [collections.deque() for _ in range(num_shards)]
+        self.exhausted = [False] * num_shards
+
+
+def _merge(lists, sorting):
+    """Merges the sorted lists of the shards. Without sorting, the
+    lists are interleaved, so that the first N objects of the result
+    only depend on the first N objects of each list."""
+    key = _sort_key(sorting)
+    if key is None:
+        return (item for _, _, item in heapq.merge(*[
+            ((position, shard, item) for position, item in enumerate(items))
+            for shard, items in enumerate(lists)]))
+
+    return heapq.merge(*lists, key=key)
+
+
+def _sort_key(sorting):
+    """Returns the key function sorting objects as requested, or None
+    if there is no sorting."""
+    if not sorting:
+        return None
+
+    def compare(a, b):
+        for item in sorting:
+            a_value = _field_value(a, item["field"])
+            b_value = _field_value(b, item["field"])
+            if a_value == b_value:
+                continue
+            # None comes first in ascending order
+            if a_value is None:
+                result = -1
+            elif b_value is None:
+                result = 1
+            else:
+                result = -1 if a_value < b_value else 1
+            return -result if item["order"] == "desc" else result
+        return 0
+
+    return functools.cmp_to_key(compare)
+
+
+def _field_value(obj, field):
+    if isinstance(obj, collections.abc.Mapping):
+        return obj.get(field)
+    return getattr(obj, field, None)
+
+
+async def _resolve(result):
+    if inspect.isawaitable(result):
+        result = await result
+    return result
+
+
+async def _gather(results):
+    """Returns the results of calls to the shards, waiting concurrently
+    for those returning awaitables."""
+    awaitables = {index: gen.convert_yielded(result)
+                  for index, result in enumerate(results)
+                  if inspect.isawaitable(result)}
+    if not awaitables:
+        return results
+
+    values = await gen.multi(awaitables)
+    return [values[index] if index in values else result
+            for index, result in enumerate(results)]
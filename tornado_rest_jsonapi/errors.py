@@ -3,6 +3,12 @@
 # https://github.com/miLibris/flask-rest-jsonapi
 import http
 
+from tornado import escape
+
+# The encoded documents of the exceptions with the default errors of
+# their class, by class.
+_default_error_documents = {}
+
 
 def jsonapi_errors(exception):
     """Construct api error according to jsonapi 1.0
@@ -21,11 +27,72 @@ def jsonapi_errors(exception):
             'jsonapi': {'version': '1.0'}}
 
 
+def encoded_jsonapi_errors(exception):
+    """Returns the jsonapi errors document of an exception, encoded.
+
+    The documents of the exceptions with the default errors of their
+    class are constant, and are encoded only once.
+
+    Parameters
+    ----------
+    exception: JsonApiException
+        A JsonApiException
+
+    Returns
+    -------
+    bytes
+        the UTF-8 encoded JSON document
+    """
+    if not exception.has_default_errors:
+        return escape.utf8(escape.json_encode(jsonapi_errors(exception)))
+
+    cls = type(exception)
+    try:
+        return _default_error_documents[cls]
+    except KeyError:
+        document = escape.utf8(escape.json_encode(jsonapi_errors(exception)))
+        _default_error_documents[cls] = document
+        return document
+
+
 def errors_from_jsonapi_errors(jsonapi_errors):
+    """Converts the errors of a document in jsonapi format, such as the
+    errors of marshmallow_jsonapi.
+
+    Parameters
+    ----------
+    jsonapi_errors: dict
+        The document, with the list of errors in its "errors" member.
+
+    Returns
+    -------
+    list
+        a list of Error
+    """
     return [Error.from_jsonapi(err) for err in jsonapi_errors["errors"]]
 
 
+def lazy_errors_from_jsonapi_errors(jsonapi_errors):
+    """Like errors_from_jsonapi_errors, but wraps the errors in
+    LazyError instead of converting them, which is cheaper when the
+    errors are only sent to the client.
+
+    Parameters
+    ----------
+    jsonapi_errors: dict
+        The document, with the list of errors in its "errors" member.
+
+    Returns
+    -------
+    list
+        a list of LazyError
+    """
+    return [LazyError(err) for err in jsonapi_errors["errors"]]
+
+
 class Source:
+    __slots__ = ("pointer", "parameter")
+
     def __init__(self, pointer=None, parameter=None):
         self.pointer = pointer
         self.parameter = parameter
@@ -46,6 +113,8 @@ class Source:
 
 
 class Error:
+    __slots__ = ("source", "detail", "title", "status")
+
     def __init__(self,
                  source=None,
                  detail=None,
@@ -98,3 +167,44 @@ class Error:
             d["status"] = http.HTTPStatus(int(d["status"]))
 
         return cls(**d)
+
+
+class LazyError:
+    """An error already in jsonapi format. It is sent as is, and
+    converted to an Error only if its attributes are accessed."""
+    __slots__ = ("_jsonapi", "_error")
+
+    def __init__(self, jsonapi):
+        """Initialize the error
+
+        Parameters
+        ----------
+        jsonapi: dict
+            the error object, in jsonapi format
+        """
+        self._jsonapi = jsonapi
+        self._error = None
+
+    @property
+    def source(self):
+        return self._get_error().source
+
+    @property
+    def detail(self):
+        return self._get_error().detail
+
+    @property
+    def title(self):
+        return self._get_error().title
+
+    @property
+    def status(self):
+        return self._get_error().status
+
+    def to_jsonapi(self):
+        return self._jsonapi
+
+    def _get_error(self):
+        if self._error is None:
+            self._error = Error.from_jsonapi(dict(self._jsonapi))
+        return self._error
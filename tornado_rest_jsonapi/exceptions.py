@@ -19,11 +19,33 @@ class JsonApiException(Exception):
             if None, a single error will be generated, using the class
             status and title
         """
-        if errors is None:
-            errors = [Error(title=self.title,
-                            status=self.status)]
+        self._errors = errors
 
-        self.errors = errors
+    @property
+    def errors(self):
+        """The list of errors. The default one is only created when
+        requested."""
+        if self._errors is None:
+            self._errors = self.default_errors()
+
+        return self._errors
+
+    @errors.setter
+    def errors(self, errors):
+        self._errors = errors
+
+    @property
+    def has_default_errors(self):
+        """True if the exception has the default errors of its class,
+        so that its jsonapi representation is the same as any other
+        instance of the class."""
+        return self._errors is None
+
+    @classmethod
+    def default_errors(cls):
+        """Returns the errors of an exception initialized without
+        errors."""
+        return [Error(title=cls.title, status=cls.status)]
 
     def to_jsonapi(self):
         return [
@@ -53,49 +75,62 @@ class ValidationError(JsonApiException):
 class InvalidFields(BadRequest):
     title = "Invalid fields querystring parameter"
 
-    def __init__(self, errors=None):
-        if errors is None:
-            errors = [Error(title=self.title,
-                            source=Source(parameter="fields"),
-                            status=self.status)]
-
-        super().__init__(errors)
+    @classmethod
+    def default_errors(cls):
+        return [Error(title=cls.title,
+                      source=Source(parameter="fields"),
+                      status=cls.status)]
 
 
 class InvalidInclude(BadRequest):
     title = "Invalid include querystring parameter"
 
-    def __init__(self, errors=None):
-        if errors is None:
-            errors = [Error(title=self.title,
-                            source=Source(parameter="include"),
-                            status=self.status)]
-
-        super().__init__(errors)
+    @classmethod
+    def default_errors(cls):
+        return [Error(title=cls.title,
+                      source=Source(parameter="include"),
+                      status=cls.status)]
 
 
 class InvalidFilters(BadRequest):
     title = "Invalid filters querystring parameter"
 
-    def __init__(self, errors=None):
-        if errors is None:
-            errors = [Error(title=self.title,
-                            source=Source(parameter="filters"),
-                            status=self.status)]
-
-        super().__init__(errors)
+    @classmethod
+    def default_errors(cls):
+        return [Error(title=cls.title,
+                      source=Source(parameter="filters"),
+                      status=cls.status)]
 
 
 class InvalidSort(BadRequest):
     title = "Invalid sort querystring parameter"
 
-    def __init__(self, errors=None):
-        if errors is None:
-            errors = [Error(title=self.title,
-                            source=Source(parameter="sort"),
-                            status=self.status)]
+    @classmethod
+    def default_errors(cls):
+        return [Error(title=cls.title,
+                      source=Source(parameter="sort"),
+                      status=cls.status)]
+
+
+class InvalidSince(BadRequest):
+    title = "Invalid since querystring parameter"
+
+    @classmethod
+    def default_errors(cls):
+        return [Error(title=cls.title,
+                      source=Source(parameter="since"),
+                      status=cls.status)]
 
-        super().__init__(errors)
+
+class SyncTokenExpired(JsonApiException):
+    status = http.client.GONE
+    title = "Sync token expired"
+
+    @classmethod
+    def default_errors(cls):
+        return [Error(title=cls.title,
+                      source=Source(parameter="since"),
+                      status=cls.status)]
 
 
 class ObjectNotFound(JsonApiException):
@@ -126,6 +161,53 @@ class InvalidIdentifier(JsonApiException):
     title = "Invalid identifier"
 
 
+class PayloadTooLarge(JsonApiException):
+    status = http.client.REQUEST_ENTITY_TOO_LARGE
+    title = "Payload too large"
+
+
+class UnsupportedContentEncoding(JsonApiException):
+    status = http.client.UNSUPPORTED_MEDIA_TYPE
+    title = "Unsupported content encoding"
+
+
+class RetryLater(JsonApiException):
+    """Base class for the errors after which the client can retry."""
+
+    def __init__(self, errors=None, retry_after=None):
+        """Initialize the exception
+
+        Parameters
+        ----------
+        errors: List or None
+            A list of Error objects.
+        retry_after: float or None
+            The seconds after which the client can retry, sent in the
+            Retry-After header.
+        """
+        super().__init__(errors)
+        self.retry_after = retry_after
+
+
+class TooManyRequests(RetryLater):
+    status = http.client.TOO_MANY_REQUESTS
+    title = "Too many requests"
+
+
+class ServiceUnavailable(RetryLater):
+    status = http.client.SERVICE_UNAVAILABLE
+    title = "Service unavailable"
+
+
+class PoolExhausted(ServiceUnavailable):
+    title = "Connection pool exhausted"
+
+
+class DataLayerTimeout(JsonApiException):
+    status = http.client.GATEWAY_TIMEOUT
+    title = "Data layer timeout"
+
+
 class Unable(JsonApiException):
     status = http.client.INTERNAL_SERVER_ERROR
     title = "Unable to perform operation"
@@ -0,0 +1,158 @@
+import errno
+import json
+import os
+import socket
+import tempfile
+
+from tornado.ioloop import IOLoop
+from tornado.log import app_log
+
+# Errors meaning that a peer is not reachable at the moment, because
+# it is not running, it is restarting, or its receive queue is full.
+_UNREACHABLE = (errno.ENOENT, errno.ECONNREFUSED, errno.EAGAIN,
+                errno.EWOULDBLOCK, errno.ENOBUFS)
+
+
+class InvalidationBus:
+    """Broadcasts small invalidation messages among the worker
+    processes serving an Api, so that per-process caches stay coherent.
+
+    Each worker binds a UNIX datagram socket in a shared directory and
+    sends its messages to the sockets of the other workers. Delivery is
+    best effort: messages to a worker that is not running or that is
+    not keeping up are dropped. A bus that is not attached to a worker
+    only notifies nobody, so the same code works in a single process.
+    """
+
+    def __init__(self, directory=None):
+        """Initializes the bus.
+
+        Parameters
+        ----------
+        directory: str or None
+            The directory holding the sockets. Must be the same for all
+            workers. If None, a temporary directory is created.
+        """
+        if directory is None:
+            directory = tempfile.mkdtemp(prefix="tornado-rest-jsonapi-")
+
+        self.directory = directory
+        self._subscribers = []
+        self._socket = None
+        self._path = None
+        self._peers = []
+        self._io_loop = None
+
+    @property
+    def attached(self):
+        """True if the bus is attached to a worker"""
+        return self._socket is not None
+
+    def attach(self, worker_id, num_workers, io_loop=None):
+        """Attaches the bus to a worker process, binding its socket.
+
+        Parameters
+        ----------
+        worker_id: int
+            The identifier of the worker, between 0 and num_workers - 1
+        num_workers: int
+            The total number of workers
+        io_loop: IOLoop or None
+            The IOLoop receiving the messages. Defaults to the current.
+        """
+        if self.attached:
+            raise RuntimeError("InvalidationBus is already attached")
+
+        path = self._socket_path(worker_id)
+        try:
+            os.unlink(path)
+        except FileNotFoundError:
+            pass
+
+        sock = socket.socket(socket.AF_UNIX, socket.SOCK_DGRAM)
+        sock.setblocking(False)
+        sock.bind(path)
+
+        self._socket = sock
+        self._path = path
+        self._peers = [self._socket_path(i)
+                       for i in range(num_workers) if i != worker_id]
+        self._io_loop = io_loop or IOLoop.current()
+        self._io_loop.add_handler(sock.fileno(),
+                                  self._handle_events,
+                                  IOLoop.READ)
+
+    def detach(self):
+        """Detaches the bus from the worker, closing its socket."""
+        if not self.attached:
+            return
+
+        self._io_loop.remove_handler(self._socket.fileno())
+        self._socket.close()
+        try:
+            os.unlink(self._path)
+        except FileNotFoundError:
+            pass
+
+        self._socket = None
+        self._path = None
+        self._peers = []
+        self._io_loop = None
+
+    def subscribe(self, callback):
+        """Registers a callback to be invoked with every message
+        received from the other workers.
+
+        Parameters
+        ----------
+        callback: callable
+            Invoked with the message as the only argument.
+        """
+        self._subscribers.append(callback)
+
+    def unsubscribe(self, callback):
+        """Removes a callback registered with subscribe."""
+        self._subscribers.remove(callback)
+
+    def publish(self, message):
+        """Sends a message to all the other workers.
+
+        Parameters
+        ----------
+        message:
+            A JSON serializable object, small enough to fit a datagram.
+        """
+        if not self.attached:
+            return
+
+        data = json.dumps(message).encode("utf-8")
+        for peer in self._peers:
+            try:
+                self._socket.sendto(data, peer)
+            except OSError as e:
+                if e.errno not in _UNREACHABLE:
+                    raise
+
+    def _handle_events(self, fd, events):
+        while True:
+            try:
+                data = self._socket.recv(65536)
+            except OSError as e:
+                if e.errno in (errno.EAGAIN, errno.EWOULDBLOCK):
+                    return
+                raise
+
+            try:
+                message = json.loads(data.decode("utf-8"))
+            except ValueError:
+                app_log.warning("Discarded invalid invalidation message")
+                continue
+
+            for callback in list(self._subscribers):
+                try:
+                    callback(message)
+                except Exception:
+                    app_log.exception("Invalidation subscriber failed")
+
+    def _socket_path(self, worker_id):
+        return os.path.join(self.directory, "worker-{}.sock".format(worker_id))
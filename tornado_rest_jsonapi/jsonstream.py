@@ -0,0 +1,237 @@
+import json
+import re
+
+from .exceptions import BadRequest
+
+# Characters of interest outside and inside JSON strings.
+_STRUCTURAL = re.compile(rb'["{}\[\],]')
+_STRING_END = re.compile(rb'["\\]')
+_NON_WHITESPACE = re.compile(rb'\S')
+
+_QUOTE, _BACKSLASH, _COLON, _COMMA = b'"', b'\\', b':', b','
+_OPEN_OBJECT, _CLOSE_OBJECT = b'{', b'}'
+_OPEN_ARRAY, _CLOSE_ARRAY = b'[', b']'
+
+
+class ResourceObjectStream:
+    """Incremental parser of a JSON:API request document.
+
+    The document is fed in chunks as they arrive, and the resource
+    objects contained in its top level "data" member, either a single
+    object or an array of objects, are returned as soon as each one is
+    complete. Only the resource object currently being received is kept
+    in memory. Members other than "data" are skipped.
+    """
+
+    def __init__(self):
+        self._buffer = bytearray()
+        self._pos = 0
+        self._depth = 0
+        self._in_string = False
+        self._expect_key = False
+        self._key_start = None
+        self._key = None
+        self._await_data = False
+        self._await_element = False
+        self._allow_empty = False
+        self._element_start = None
+        self._finished = False
+
+        #: True if "data" is an array, False if a single object,
+        #: None if not yet encountered.
+        self.many = None
+
+    def feed(self, chunk):
+        """Parses a chunk of the document.
+
+        Parameters
+        ----------
+        chunk: bytes
+            The next chunk of the UTF-8 encoded document.
+
+        Returns
+        -------
+        list: the resource objects completed by this chunk, as dicts.
+
+        Raises
+        ------
+        BadRequest:
+            if the document is not a valid JSON:API document.
+        """
+        self._buffer += chunk
+        elements = []
+
+        while self._pos < len(self._buffer):
+            if self._in_string:
+                if not self._scan_string():
+                    break
+            elif self._await_data or self._await_element:
+                self._scan_value_start()
+            else:
+                element = self._scan_structure()
+                if element is not None:
+                    elements.append(_decode(element))
+
+        self._compact()
+        return elements
+
+    def finish(self):
+        """Checks that the document was complete.
+
+        Raises
+        ------
+        BadRequest:
+            if the document is truncated or has no data member.
+        """
+        if not self._finished:
+            raise BadRequest.from_message("Truncated document")
+
+        if self.many is None:
+            raise BadRequest.from_message("Missing data member")
+
+    def _scan_string(self):
+        """Advances to the end of the current string.
+        Returns False if more data is needed to proceed."""
+        match = _STRING_END.search(self._buffer, self._pos)
+        if match is None:
+            self._pos = len(self._buffer)
+            return True
+
+        pos = match.start()
+        if match.group() == _BACKSLASH:
+            if pos + 1 >= len(self._buffer):
+                # The escaped character is in the next chunk.
+                self._pos = pos
+                return False
+            self._pos = pos + 2
+            return True
+
+        self._in_string = False
+        self._pos = pos + 1
+        if self._key_start is not None:
+            self._key = bytes(self._buffer[self._key_start:pos])
+            self._key_start = None
+            self._await_data = (self._key == b"data")
+
+        return True
+
+    def _scan_value_start(self):
+        """Checks the first character of the data member value, or of
+        one of its elements."""
+        match = _NON_WHITESPACE.search(self._buffer, self._pos)
+        if match is None:
+            self._pos = len(self._buffer)
+            return
+
+        pos = match.start()
+        char = match.group()
+        if self._await_data:
+            if char == _COLON:
+                self._pos = pos + 1
+                return
+            if char not in (_OPEN_OBJECT, _OPEN_ARRAY):
+                raise BadRequest.from_message(
+                    "data must be a resource object or an array of "
+                    "resource objects")
+            self._await_data = False
+            self.many = (char == _OPEN_ARRAY)
+        else:
+            if not (char == _OPEN_OBJECT or
+                    (char == _CLOSE_ARRAY and self._allow_empty)):
+                raise BadRequest.from_message(
+                    "data must only contain resource objects")
+            self._await_element = False
+
+        # The character itself is consumed by _scan_structure.
+        self._pos = pos
+
+    def _scan_structure(self):
+        """Advances to the next structural character and processes it.
+        Returns a resource object if it has been completed."""
+        match = _STRUCTURAL.search(self._buffer, self._pos)
+        if match is None:
+            self._pos = len(self._buffer)
+            return None
+
+        pos = match.start()
+        char = match.group()
+        self._pos = pos + 1
+
+        if self._finished:
+            raise BadRequest.from_message("Trailing data after document")
+
+        if char == _QUOTE:
+            self._in_string = True
+            if self._depth == 1 and self._expect_key:
+                self._expect_key = False
+                self._key_start = pos + 1
+        elif char in (_OPEN_OBJECT, _OPEN_ARRAY):
+            self._depth += 1
+            if self._depth == 1:
+                if char != _OPEN_OBJECT:
+                    raise BadRequest.from_message(
+                        "Document must be a JSON object")
+                self._expect_key = True
+            elif self._in_data_array():
+                self._await_element = True
+                self._allow_empty = True
+            elif self._at_element_depth():
+                self._element_start = pos
+        elif char in (_CLOSE_OBJECT, _CLOSE_ARRAY):
+            element = None
+            if (self._element_start is not None and
+                    self._at_element_depth()):
+                element = self._buffer[self._element_start:pos + 1]
+                self._element_start = None
+
+            self._depth -= 1
+            if self._depth == 0:
+                self._finished = True
+            return element
+        elif char == _COMMA:
+            if self._depth == 1:
+                self._expect_key = True
+                self._key = None
+            elif self._in_data_array():
+                self._await_element = True
+                self._allow_empty = False
+
+        return None
+
+    def _in_data_array(self):
+        """True if the parser is directly inside the data array."""
+        return self._key == b"data" and self.many and self._depth == 2
+
+    def _at_element_depth(self):
+        """True if the current depth is the one of resource objects."""
+        if self._key != b"data" or self.many is None:
+            return False
+
+        return self._depth == (3 if self.many else 2)
+
+    def _compact(self):
+        """Discards the already parsed part of the buffer."""
+        keep = self._pos
+        for start in (self._element_start, self._key_start):
+            if start is not None:
+                keep = min(keep, start)
+
+        if keep == 0:
+            return
+
+        del self._buffer[:keep]
+        self._pos -= keep
+        if self._element_start is not None:
+            self._element_start -= keep
+        if self._key_start is not None:
+            self._key_start -= keep
+
+
+def _decode(element):
+    """Decodes the bytes of a complete resource object."""
+    try:
+        resource_object = json.loads(bytes(element).decode("utf-8"))
+    except ValueError:
+        raise BadRequest.from_message("Invalid resource object")
+
+    return resource_object
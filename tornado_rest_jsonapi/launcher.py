@@ -0,0 +1,265 @@
+import os
+import random
+import shutil
+import signal
+import sys
+import time
+
+from tornado import gen, netutil, process
+from tornado.httpserver import HTTPServer
+from tornado.ioloop import IOLoop
+from tornado.log import app_log
+
+from .invalidation import InvalidationBus
+
+#: Default time, in seconds, given to in-flight requests on shutdown.
+DEFAULT_SHUTDOWN_TIMEOUT = 10.0
+
+# Number of restarts of failed workers after which the launcher gives up
+_MAX_RESTARTS = 100
+
+
+class Launcher:
+    """Serves an Api from multiple pre-forked worker processes sharing
+    the same listening socket.
+
+    The Api and its application are configured once in the parent
+    process and inherited by every worker. Each worker runs the Api
+    startup hooks before serving, and on SIGTERM or SIGINT stops
+    accepting connections, lets the in-flight requests complete within
+    the shutdown timeout, and runs the Api shutdown hooks.
+
+    The parent process supervises the workers, restarting those that
+    fail. On SIGTERM or SIGINT, it forwards the signal to the workers,
+    waits for them to stop, and exits.
+
+    Unless already set, an InvalidationBus is assigned to the Api, so
+    that per-worker caches can notify each other. Its directory is
+    removed when the parent process exits. The metrics of the Api, if
+    any, are labelled with the task id of each worker.
+
+    Example::
+
+        api = Api(application)
+        api.route(...)
+        Launcher(api, port=8000, num_processes=4).run()
+    """
+
+    def __init__(self,
+                 api,
+                 port,
+                 address=None,
+                 num_processes=None,
+                 shutdown_timeout=DEFAULT_SHUTDOWN_TIMEOUT,
+                 **server_kwargs):
+        """Defines the launcher.
+
+        Parameters
+        ----------
+        api: Api
+            The configured Api to serve.
+        port: int
+            The port to listen to
+        address: str or None
+            The address to listen to. If None, all interfaces.
+        num_processes: int or None
+            The number of worker processes. If None or 0, one per CPU.
+        shutdown_timeout: float
+            Seconds given to in-flight requests to complete on shutdown.
+        **server_kwargs:
+            Additional keyword arguments for the tornado HTTPServer.
+        """
+        self.api = api
+        self.port = port
+        self.address = address
+        self.num_processes = num_processes or process.cpu_count()
+        self.shutdown_timeout = shutdown_timeout
+        self.server_kwargs = server_kwargs
+
+        self.task_id = None
+        self._server = None
+        self._stopping = False
+
+        # The worker processes of the parent, by pid
+        self._parent_pid = None
+        self._children = {}
+        self._terminating = False
+
+    def run(self):
+        """Binds the socket, forks the workers and serves until
+        terminated. Does not return in the parent process.
+
+        Raises
+        ------
+        ValueError:
+            if the Api has change feeds and there are multiple workers,
+            as the feeds are local to each process.
+        """
+        if self.num_processes > 1 and self.api.change_feeds:
+            raise ValueError("Change feeds cannot be served from multiple "
+                             "processes")
+
+        sockets = netutil.bind_sockets(self.port, self.address)
+
+        bus_directory = None
+        if self.api.invalidation_bus is None:
+            self.api.invalidation_bus = InvalidationBus()
+            bus_directory = self.api.invalidation_bus.directory
+
+        self._parent_pid = os.getpid()
+        for signum in (signal.SIGTERM, signal.SIGINT):
+            signal.signal(signum, self._forward_signal)
+
+        try:
+            task_id = self._fork_workers()
+        except BaseException:
+            if not self._in_worker():
+                _remove_directory(bus_directory)
+            raise
+
+        if task_id is None:
+            _remove_directory(bus_directory)
+            sys.exit(0)
+
+        io_loop = IOLoop.current()
+        for signum in (signal.SIGTERM, signal.SIGINT):
+            signal.signal(
+                signum,
+                lambda signum, frame: io_loop.add_callback_from_signal(
+                    self._stop_and_exit))
+
+        io_loop.add_callback(self.start_worker, sockets, task_id)
+        io_loop.start()
+
+    async def start_worker(self, sockets, task_id):
+        """Starts serving the Api in the current process.
+
+        Parameters
+        ----------
+        sockets: list
+            The listening sockets
+        task_id: int
+            The identifier of the worker
+        """
+        self.task_id = task_id
+
+        metrics = self.api.metrics
+        if metrics is not None:
+            metrics.worker = str(task_id)
+
+        bus = self.api.invalidation_bus
+        if bus is not None:
+            bus.attach(task_id, self.num_processes)
+
+        await self.api.startup()
+
+        self._server = HTTPServer(self.api.application, **self.server_kwargs)
+        self._server.add_sockets(sockets)
+        app_log.info("Worker %s serving", task_id)
+
+    async def stop_worker(self):
+        """Gracefully stops serving the Api in the current process."""
+        if self._stopping:
+            return
+        self._stopping = True
+
+        if self._server is not None:
+            self._server.stop()
+
+        deadline = time.time() + self.shutdown_timeout
+        while self.api.in_flight > 0 and time.time() < deadline:
+            await gen.sleep(0.05)
+
+        if self.api.in_flight > 0:
+            app_log.warning("Worker %s stopping with %d requests in flight",
+                            self.task_id, self.api.in_flight)
+
+        try:
+            await self.api.shutdown()
+        finally:
+            bus = self.api.invalidation_bus
+            if bus is not None:
+                bus.detach()
+
+    def _fork_workers(self):
+        """Forks the workers and supervises them. Returns the task id
+        in the workers, and None in the parent once all of them have
+        exited."""
+        for task_id in range(self.num_processes):
+            if self._fork_worker(task_id):
+                return task_id
+
+        restarts = 0
+        while self._children:
+            try:
+                pid, status = os.wait()
+            except ChildProcessError:
+                break
+
+            task_id = self._children.pop(pid, None)
+            if task_id is None:
+                continue
+
+            if os.WIFEXITED(status) and os.WEXITSTATUS(status) == 0:
+                app_log.info("Worker %s (pid %d) exited", task_id, pid)
+                continue
+
+            app_log.warning("Worker %s (pid %d) failed with status %d",
+                            task_id, pid, status)
+            if self._terminating:
+                continue
+
+            restarts += 1
+            if restarts > _MAX_RESTARTS:
+                app_log.error("Too many worker failures, stopping")
+                self._forward_signal(signal.SIGTERM, None)
+                continue
+
+            if self._fork_worker(task_id):
+                return task_id
+
+        return None
+
+    def _fork_worker(self, task_id):
+        """Forks a worker. Returns True in the worker."""
+        pid = os.fork()
+        if pid == 0:
+            self._children = {}
+            # Do not share the random state of the parent
+            random.seed()
+            return True
+
+        self._children[pid] = task_id
+        return False
+
+    def _in_worker(self):
+        return os.getpid() != self._parent_pid
+
+    def _forward_signal(self, signum, frame):
+        """Handles a termination signal in the parent, forwarding it
+        to the workers."""
+        if self._in_worker():
+            # Received by a worker before it installs its own handlers,
+            # so before it serves anything.
+            os._exit(0)
+
+        self._terminating = True
+        for pid in list(self._children):
+            try:
+                os.kill(pid, signum)
+            except ProcessLookupError:
+                pass
+
+    async def _stop_and_exit(self):
+        if self._stopping:
+            return
+
+        try:
+            await self.stop_worker()
+        finally:
+            IOLoop.current().stop()
+
+
+def _remove_directory(directory):
+    if directory is not None:
+        shutil.rmtree(directory, ignore_errors=True)
@@ -0,0 +1,364 @@
+import bisect
+import collections
+import time
+
+from tornado import web
+
+from .data_layers.cache import ObjectCache
+from .profiling import NULL_PHASE
+
+#: Default upper bounds, in seconds, of the buckets of the histograms.
+DEFAULT_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25,
+                   0.5, 1.0, 2.5, 5.0, 10.0)
+
+_CONTENT_TYPE_PROMETHEUS = "text/plain; version=0.0.4; charset=utf-8"
+
+# The gauges and the counters of the stats of a pool
+_POOL_GAUGES = ("size", "max_size", "idle", "in_use", "waiting")
+_POOL_COUNTERS = ("created", "discarded", "acquired", "waited", "timeouts",
+                  "failed_checks", "evicted")
+
+
+class Counter:
+    """A monotonically increasing value, per combination of labels."""
+
+    type_ = "counter"
+
+    def __init__(self, name, documentation, labelnames=()):
+        """Defines the counter.
+
+        Parameters
+        ----------
+        name: str
+            The metric name
+        documentation: str
+            The HELP text
+        labelnames: tuple
+            The names of the labels
+        """
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._values = collections.defaultdict(float)
+
+    def inc(self, *labelvalues, amount=1):
+        """Increments the value of the given label values."""
+        self._values[labelvalues] += amount
+
+    def get(self, *labelvalues):
+        """Returns the value of the given label values."""
+        return self._values.get(labelvalues, 0)
+
+    def samples(self):
+        """Returns the (name, labels, value) samples of the metric."""
+        return [(self.name, dict(zip(self.labelnames, labelvalues)), value)
+                for labelvalues, value in self._values.items()]
+
+
+class Histogram:
+    """The distribution of observed values in cumulative buckets, per
+    combination of labels."""
+
+    type_ = "histogram"
+
+    def __init__(self, name, documentation, labelnames=(),
+                 buckets=DEFAULT_BUCKETS):
+        """Defines the histogram.
+
+        Parameters
+        ----------
+        name: str
+            The metric name
+        documentation: str
+            The HELP text
+        labelnames: tuple
+            The names of the labels
+        buckets: tuple
+            The sorted upper bounds of the buckets, without +Inf.
+        """
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self.buckets = tuple(buckets)
+        self._values = {}
+
+    def observe(self, value, *labelvalues):
+        """Records an observation for the given label values."""
+        try:
+            counts, total = self._values[labelvalues]
+        except KeyError:
+            counts, total = [0] * (len(self.buckets) + 1), 0.0
+
+        # Non cumulative counts, the last one for +Inf
+        counts[bisect.bisect_left(self.buckets, value)] += 1
+        self._values[labelvalues] = counts, total + value
+
+    def count(self, *labelvalues):
+        """Returns the number of observations of the given label
+        values."""
+        counts, _ = self._values.get(labelvalues, ((), 0.0))
+        return sum(counts)
+
+    def samples(self):
+        """Returns the (name, labels, value) samples of the metric."""
+        result = []
+        for labelvalues, (counts, total) in self._values.items():
+            labels = dict(zip(self.labelnames, labelvalues))
+            cumulative = 0
+            for bound, count in zip(self.buckets + (float("inf"), ), counts):
+                cumulative += count
+                result.append((self.name + "_bucket",
+                               dict(labels, le=_format_value(bound)),
+                               cumulative))
+            result.append((self.name + "_count", labels, cumulative))
+            result.append((self.name + "_sum", labels, total))
+        return result
+
+
+class _Timer:
+    """Context manager observing its duration in a histogram, and
+    entering an inner context manager."""
+
+    def __init__(self, histogram, labelvalues, inner):
+        self._histogram = histogram
+        self._labelvalues = labelvalues
+        self._inner = inner
+        self._start = None
+
+    def __enter__(self):
+        self._start = time.monotonic()
+        self._inner.__enter__()
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        try:
+            return self._inner.__exit__(exc_type, exc_value, traceback)
+        finally:
+            self._histogram.observe(time.monotonic() - self._start,
+                                    *self._labelvalues)
+
+
+class Metrics:
+    """Collects the metrics of the resources of an Api, and renders
+    them in the Prometheus text format.
+
+    It covers the requests by resource class, method and status, their
+    duration, the duration of their phases and of the data layer
+    operations, the requests in flight, the errors by exception class,
+    and the counters of the ObjectCaches used by the data layers and of
+    the pools of the Api.
+
+    The metrics are collected by each process. When the Api is served by
+    a Launcher, the samples carry a worker label with the task id of the
+    process, and each scrape returns the metrics of the worker that
+    handled it: aggregate the series over the worker label.
+    """
+
+    def __init__(self, api, namespace="jsonapi", buckets=DEFAULT_BUCKETS):
+        """Defines the metrics.
+
+        Parameters
+        ----------
+        api: Api
+            The Api whose resources are measured
+        namespace: str
+            The prefix of the metric names
+        buckets: tuple
+            The upper bounds, in seconds, of the buckets of the duration
+            histograms.
+        """
+        self.api = api
+        self.namespace = namespace
+
+        #: Additional ObjectCaches to report, besides the ones found in
+        #: the data_layer dictionaries of the resources.
+        self.caches = []
+
+        #: The value of the worker label of the samples, or None for no
+        #: worker label. Set by the Launcher in each worker.
+        self.worker = None
+
+        self.requests = Counter(
+            namespace + "_requests_total",
+            "Requests handled, by resource, method and status.",
+            ("resource", "method", "status"))
+        self.request_duration = Histogram(
+            namespace + "_request_duration_seconds",
+            "Duration of the requests, by resource and method.",
+            ("resource", "method"), buckets)
+        self.phase_duration = Histogram(
+            namespace + "_phase_duration_seconds",
+            "Duration of the phases of the requests, by resource and "
+            "phase.",
+            ("resource", "phase"), buckets)
+        self.data_layer_duration = Histogram(
+            namespace + "_data_layer_duration_seconds",
+            "Duration of the data layer operations, by resource and "
+            "operation.",
+            ("resource", "operation"), buckets)
+        self.errors = Counter(
+            namespace + "_errors_total",
+            "Errors raised while handling the requests, by resource and "
+            "exception class.",
+            ("resource", "exception"))
+
+    def request_finished(self, handler):
+        """Records a finished request. Called by the Api."""
+        resource = type(handler).__name__
+        method = handler.request.method
+        self.requests.inc(resource, method, str(int(handler.get_status())))
+        self.request_duration.observe(handler.request.request_time(),
+                                      resource, method)
+
+    def phase(self, handler, name, inner=NULL_PHASE):
+        """Returns a context manager measuring a phase of a request.
+
+        Parameters
+        ----------
+        handler: Resource
+            The handler of the request
+        name: str
+            The name of the phase
+        inner: context manager
+            A context manager to enter for the phase as well.
+        """
+        return _Timer(self.phase_duration,
+                      (type(handler).__name__, name),
+                      inner)
+
+    def data_layer_call(self, handler, operation):
+        """Returns a context manager measuring a data layer operation.
+
+        Parameters
+        ----------
+        handler: Resource
+            The handler of the request
+        operation: str
+            The name of the operation, such as get_object
+        """
+        return _Timer(self.data_layer_duration,
+                      (type(handler).__name__, operation),
+                      NULL_PHASE)
+
+    def error(self, handler, exc):
+        """Records an error raised while handling a request."""
+        self.errors.inc(type(handler).__name__, type(exc).__name__)
+
+    def render(self):
+        """Returns the metrics in the Prometheus text format."""
+        lines = []
+        for metric in (self.requests, self.request_duration,
+                       self.phase_duration, self.data_layer_duration,
+                       self.errors):
+            self._render(lines, metric.name, metric.type_,
+                         metric.documentation, metric.samples())
+
+        name = self.namespace + "_requests_in_flight"
+        self._render(lines, name, "gauge", "Requests being handled.",
+                     [(name, {}, self.api.in_flight)])
+
+        self._render_caches(lines)
+        self._render_pools(lines)
+        return "".join(lines)
+
+    def _render(self, lines, name, type_, documentation, samples):
+        if self.worker is not None:
+            samples = [(sample_name, dict(labels, worker=self.worker), value)
+                       for sample_name, labels, value in samples]
+        _render(lines, name, type_, documentation, samples)
+
+    def _render_caches(self, lines):
+        caches = _find_caches(
+            [options for _, options in self.api.data_layers()])
+        for cache in self.caches:
+            if all(cache is not found for found in caches):
+                caches.append(cache)
+
+        for counter in ("hits", "misses", "evictions"):
+            name = "{}_object_cache_{}_total".format(self.namespace, counter)
+            self._render(lines, name, "counter",
+                         "Object cache {}, by cache.".format(counter),
+                         [(name, {"cache": cache.name},
+                           getattr(cache, counter))
+                          for cache in caches])
+
+        name = self.namespace + "_object_cache_entries"
+        self._render(lines, name, "gauge", "Object cache entries, by cache.",
+                     [(name, {"cache": cache.name}, len(cache))
+                      for cache in caches])
+
+    def _render_pools(self, lines):
+        stats = self.api.pools.stats()
+        for stat in _POOL_GAUGES:
+            name = "{}_pool_{}".format(self.namespace, stat)
+            self._render(lines, name, "gauge",
+                         "Connection pool {}, by pool.".format(stat),
+                         [(name, {"pool": pool}, pool_stats[stat])
+                          for pool, pool_stats in stats.items()])
+
+        for stat in _POOL_COUNTERS:
+            name = "{}_pool_{}_total".format(self.namespace, stat)
+            self._render(lines, name, "counter",
+                         "Connection pool {}, by pool.".format(stat),
+                         [(name, {"pool": pool}, pool_stats[stat])
+                          for pool, pool_stats in stats.items()])
+
+
+class MetricsHandler(web.RequestHandler):
+    """Serves the metrics of an Api in the Prometheus text format.
+    The metrics are not authenticated: restrict the access to the route
+    if needed."""
+
+    def initialize(self, metrics):
+        """Initialization method for when the class is instantiated."""
+        self._metrics = metrics
+
+    def get(self, *args, **kwargs):
+        self.set_header("Content-Type", _CONTENT_TYPE_PROMETHEUS)
+        self.write(self._metrics.render())
+
+
+def _find_caches(value, found=None):
+    """Returns the ObjectCaches in nested data_layer dictionaries."""
+    if found is None:
+        found = []
+
+    if isinstance(value, ObjectCache):
+        if all(value is not cache for cache in found):
+            found.append(value)
+    elif isinstance(value, dict):
+        for item in value.values():
+            _find_caches(item, found)
+    elif isinstance(value, (list, tuple)):
+        for item in value:
+            _find_caches(item, found)
+
+    return found
+
+
+def _render(lines, name, type_, documentation, samples):
+    lines.append("# HELP {} {}\n".format(name, _escape_help(documentation)))
+    lines.append("# TYPE {} {}\n".format(name, type_))
+    for sample_name, labels, value in samples:
+        if labels:
+            sample_name += "{" + ",".join(
+                '{}="{}"'.format(label, _escape_label(labels[label]))
+                for label in sorted(labels)) + "}"
+        lines.append("{} {}\n".format(sample_name, _format_value(value)))
+
+
+def _format_value(value):
+    if value == float("inf"):
+        return "+Inf"
+    if float(value).is_integer():
+        return str(int(value))
+    return repr(float(value))
+
+
+def _escape_help(text):
+    return text.replace("\\", "\\\\").replace("\n", "\\n")
+
+
+def _escape_label(value):
+    return str(value).replace("\\", "\\\\").replace(
+        "\n", "\\n").replace('"', '\\"')
@@ -0,0 +1,89 @@
+from tornado.concurrent import Future, chain_future
+
+#: Default number of serialized items above which work is offloaded.
+DEFAULT_MIN_ITEMS = 100
+
+#: Default payload size, in bytes, above which work is offloaded.
+DEFAULT_MIN_BYTES = 64 * 1024
+
+
+class OffloadPolicy:
+    """Policy deciding when the CPU intensive work of a request,
+    such as schema serialization and validation, is moved off the
+    IOLoop thread to an executor.
+
+    Small requests are processed inline, as the overhead of the
+    executor would exceed the work. Large ones run on the executor,
+    so that they don't stall the other requests served by the IOLoop.
+    """
+
+    def __init__(self,
+                 executor,
+                 min_items=DEFAULT_MIN_ITEMS,
+                 min_bytes=DEFAULT_MIN_BYTES):
+        """Defines the policy.
+
+        Parameters
+        ----------
+        executor: concurrent.futures.Executor
+            The executor where the work is submitted. A
+            ProcessPoolExecutor requires picklable schemas and objects.
+        min_items: int or None
+            The number of items from which the work is offloaded.
+            None disables the criterion.
+        min_bytes: int or None
+            The payload size in bytes from which the work is offloaded.
+            None disables the criterion.
+        """
+        self.executor = executor
+        self.min_items = min_items
+        self.min_bytes = min_bytes
+
+    def should_offload(self, items=0, size=0):
+        """Returns True if the work for the given amount of items or
+        payload size must be offloaded to the executor."""
+        if self.min_items is not None and items >= self.min_items:
+            return True
+
+        if self.min_bytes is not None and size >= self.min_bytes:
+            return True
+
+        return False
+
+    async def run(self, fn, *args, items=0, size=0):
+        """Runs fn(*args), on the executor if the amount of items or
+        payload size requires so, otherwise inline.
+
+        Parameters
+        ----------
+        fn: callable
+            The function to execute
+        *args:
+            Its arguments
+        items: int
+            The number of items the function processes.
+        size: int
+            The size in bytes of the payload the function processes.
+
+        Returns
+        -------
+        The result of the function.
+        """
+        if not self.should_offload(items, size):
+            return fn(*args)
+
+        # The executor futures are not awaitable
+        future = Future()
+        chain_future(self.executor.submit(fn, *args), future)
+        return await future
+
+
+def dump(schema, obj):
+    """Serializes obj with the schema, returning the resulting data."""
+    return schema.dump(obj).data
+
+
+def load(schema, json_data):
+    """Deserializes json_data with the schema, returning the
+    (data, errors) pair."""
+    return schema.load(json_data)
@@ -0,0 +1,582 @@
+import collections
+import datetime
+import inspect
+import time
+
+from tornado import gen, locks
+from tornado.concurrent import Future
+from tornado.ioloop import IOLoop, PeriodicCallback
+from tornado.log import app_log
+
+from . import exceptions
+
+#: Default maximum number of connections of a pool.
+DEFAULT_MAX_SIZE = 10
+
+#: Default time, in seconds, to wait for a connection.
+DEFAULT_ACQUIRE_TIMEOUT = 5.0
+
+#: Default time, in seconds, after which idle connections are closed.
+DEFAULT_MAX_IDLE = 300.0
+
+#: Default idle time, in seconds, after which a connection is checked
+#: before being handed out.
+DEFAULT_CHECK_AFTER = 30.0
+
+#: Default interval, in seconds, of the eviction of idle connections.
+DEFAULT_EVICTION_INTERVAL = 30.0
+
+#: Default time, in seconds, to wait for the connections in use when
+#: closing the pools.
+DEFAULT_CLOSE_TIMEOUT = 10.0
+
+# Handed to a waiter instead of a connection when a slot frees up. The
+# slot is reserved for the waiter, which opens the connection.
+_SLOT = object()
+
+
+class Pool:
+    """A bounded pool of connections to a backend, shared by the data
+    layer instances of all the requests.
+
+    Connections are opened on demand, up to max_size. When all of them
+    are in use, acquire waits in a first come, first served queue, and
+    raises PoolExhausted, answered with 503, after the timeout. A
+    connection idle for longer than check_after is checked before being
+    handed out, and discarded if unhealthy. Connections idle for longer
+    than max_idle are closed, down to min_size.
+
+    The functions opening, closing and checking the connections can be
+    plain functions, native coroutines or tornado coroutines.
+
+    Example::
+
+        pool = Pool(lambda: connect("db://host"),
+                    disconnect=lambda connection: connection.close(),
+                    check=lambda connection: connection.ping())
+        api.pools.add("db", pool)
+
+        class MyDataLayer(BaseDataLayer):
+            async def get_object(self, view_kwargs):
+                async with self.pools["db"].connection() as connection:
+                    ...
+    """
+
+    def __init__(self,
+                 connect,
+                 disconnect=None,
+                 check=None,
+                 max_size=DEFAULT_MAX_SIZE,
+                 min_size=0,
+                 acquire_timeout=DEFAULT_ACQUIRE_TIMEOUT,
+                 max_idle=DEFAULT_MAX_IDLE,
+                 check_after=DEFAULT_CHECK_AFTER,
+                 eviction_interval=DEFAULT_EVICTION_INTERVAL):
+        """Defines the pool.
+
+        Parameters
+        ----------
+        connect: callable
+            Called without arguments to open a connection.
+        disconnect: callable or None
+            Called with a connection to close it.
+        check: callable or None
+            Called with a connection to check its health. Returning a
+            false value or raising discards the connection.
+        max_size: int
+            The maximum number of connections, in use or idle.
+        min_size: int
+            The number of connections opened when the pool starts, and
+            kept when idle.
+        acquire_timeout: float or None
+            The default time to wait for a connection, in seconds. None
+            to wait indefinitely.
+        max_idle: float or None
+            The idle time after which connections are closed. None to
+            keep them.
+        check_after: float
+            The idle time after which connections are checked before
+            being handed out. 0 to always check them.
+        eviction_interval: float or None
+            The interval of the eviction of the idle connections. None
+            to only evict them when evict_idle is called.
+        """
+        self.connect = connect
+        self.disconnect = disconnect
+        self.check = check
+        self.max_size = max_size
+        self.min_size = min_size
+        self.acquire_timeout = acquire_timeout
+        self.max_idle = max_idle
+        self.check_after = check_after
+        self.eviction_interval = eviction_interval
+
+        #: The name of the pool in its PoolRegistry
+        self.name = None
+
+        # The idle connections with the time of their release, the most
+        # recently released last.
+        self._idle = collections.deque()
+        self._waiters = collections.deque()
+        self._size = 0
+        self._in_use = 0
+        self._closed = False
+        self._drained = locks.Event()
+        self._eviction = None
+
+        #: Number of connections opened
+        self.created = 0
+
+        #: Number of connections closed
+        self.discarded = 0
+
+        #: Number of connections handed out
+        self.acquired = 0
+
+        #: Number of acquisitions that had to wait
+        self.waited = 0
+
+        #: Number of acquisitions that timed out
+        self.timeouts = 0
+
+        #: Number of connections found unhealthy
+        self.failed_checks = 0
+
+        #: Number of connections closed for being idle
+        self.evicted = 0
+
+    @property
+    def size(self):
+        """The number of connections, in use, idle or being opened"""
+        return self._size
+
+    @property
+    def idle(self):
+        """The number of idle connections"""
+        return len(self._idle)
+
+    @property
+    def in_use(self):
+        """The number of connections checked out"""
+        return self._in_use
+
+    @property
+    def waiting(self):
+        """The number of acquisitions waiting for a connection"""
+        return sum(1 for waiter in self._waiters if not waiter.done())
+
+    @property
+    def closed(self):
+        """True once the pool has been closed"""
+        return self._closed
+
+    def stats(self):
+        """Returns the gauges and counters of the pool, by name."""
+        return {
+            "size": self.size,
+            "max_size": self.max_size,
+            "idle": self.idle,
+            "in_use": self.in_use,
+            "waiting": self.waiting,
+            "created": self.created,
+            "discarded": self.discarded,
+            "acquired": self.acquired,
+            "waited": self.waited,
+            "timeouts": self.timeouts,
+            "failed_checks": self.failed_checks,
+            "evicted": self.evicted,
+        }
+
+    def start(self):
+        """Starts the eviction of the idle connections, and opens the
+        min_size connections in the background. Called by the
+        PoolRegistry."""
+        if self._closed or self._eviction is not None:
+            return
+
+        if self.eviction_interval is not None:
+            self._eviction = PeriodicCallback(
+                self.evict_idle, self.eviction_interval * 1000)
+            self._eviction.start()
+
+        if self.min_size:
+            IOLoop.current().spawn_callback(self._fill)
+
+    def connection(self, timeout=None):
+        """Returns an asynchronous context manager checking a connection
+        out for the duration of the block. The connection is discarded
+        if the block raises an exception other than a JsonApiException,
+        as its state is then unknown.
+
+        Parameters
+        ----------
+        timeout: float or None
+            The time to wait for a connection, in seconds. None for the
+            acquire_timeout of the pool.
+        """
+        return _Checkout(self, timeout)
+
+    async def acquire(self, timeout=None):
+        """Checks a connection out. It must be given back with release.
+
+        Parameters
+        ----------
+        timeout: float or None
+            The time to wait for a connection, in seconds. None for the
+            acquire_timeout of the pool.
+
+        Raises
+        ------
+        PoolExhausted:
+            if no connection was available in time
+        ServiceUnavailable:
+            if the pool is closed
+        """
+        if timeout is None:
+            timeout = self.acquire_timeout
+
+        while True:
+            self._check_open()
+
+            while self._idle:
+                connection, released = self._idle.pop()
+                if (self.check is not None and
+                        time.monotonic() - released >= self.check_after and
+                        not await self._healthy(connection)):
+                    continue
+
+                return self._checked_out(connection)
+
+            if self._size < self.max_size:
+                self._size += 1
+                return self._checked_out(await self._connect_slot())
+
+            waiter = Future()
+            self._waiters.append(waiter)
+            self.waited += 1
+            handed = False
+            try:
+                if timeout is None:
+                    result = await waiter
+                else:
+                    result = await gen.with_timeout(
+                        datetime.timedelta(seconds=timeout), waiter)
+                handed = True
+            except gen.TimeoutError:
+                self.timeouts += 1
+                raise exceptions.PoolExhausted(retry_after=timeout)
+            finally:
+                if not handed:
+                    # Timed out or cancelled
+                    self._abandon(waiter)
+
+            if result is _SLOT:
+                result = await self._connect_slot()
+
+            return self._checked_out(result)
+
+    def release(self, connection, discard=False):
+        """Gives a connection back to the pool.
+
+        Parameters
+        ----------
+        connection:
+            A connection returned by acquire
+        discard: bool
+            If True, the connection is closed instead of reused, for
+            example after an error leaving it in an unknown state.
+        """
+        self._in_use -= 1
+        if discard or self._closed:
+            self._discard(connection)
+        else:
+            self._put(connection)
+
+        if self._closed and self._in_use == 0:
+            self._drained.set()
+
+    def evict_idle(self):
+        """Closes the connections idle for longer than max_idle, the
+        oldest first, keeping min_size connections.
+
+        Returns
+        -------
+        Future: resolved once the evicted connections are closed. It
+        does not need to be waited for.
+        """
+        closing = []
+        if self.max_idle is not None:
+            deadline = time.monotonic() - self.max_idle
+            while (self._idle and self._size > self.min_size and
+                   self._idle[0][1] <= deadline):
+                connection, _ = self._idle.popleft()
+                self.evicted += 1
+                closing.append(self._discard(connection))
+
+        return gen.multi(closing)
+
+    async def close(self, timeout=None):
+        """Closes the pool: the waiting acquisitions fail, the idle
+        connections are closed, and the connections in use are closed
+        when released.
+
+        Parameters
+        ----------
+        timeout: float or None
+            The time to wait for the connections in use to be released,
+            in seconds. None to wait indefinitely.
+        """
+        if self._closed:
+            return
+
+        self._closed = True
+        if self._eviction is not None:
+            self._eviction.stop()
+            self._eviction = None
+
+        while self._waiters:
+            waiter = self._waiters.popleft()
+            if not waiter.done():
+                waiter.set_exception(self._closed_error())
+
+        while self._idle:
+            connection, _ = self._idle.popleft()
+            self._size -= 1
+            self.discarded += 1
+            await self._disconnect(connection)
+
+        if self._in_use == 0:
+            return
+
+        try:
+            if timeout is None:
+                await self._drained.wait()
+            else:
+                await self._drained.wait(datetime.timedelta(seconds=timeout))
+        except gen.TimeoutError:
+            app_log.warning("Pool %s closed with %d connections in use",
+                            self.name, self._in_use)
+
+    def _checked_out(self, connection):
+        self._in_use += 1
+        self.acquired += 1
+        return connection
+
+    async def _connect_slot(self):
+        """Opens a connection in a slot already counted in the size."""
+        try:
+            result = self.connect()
+            if inspect.isawaitable(result):
+                result = await result
+        except Exception:
+            self._size -= 1
+            self._free_slot()
+            raise
+
+        self.created += 1
+        return result
+
+    async def _fill(self):
+        while self._size < self.min_size and not self._closed:
+            self._size += 1
+            try:
+                connection = await self._connect_slot()
+            except Exception:
+                app_log.exception("Could not open a connection of pool %s",
+                                  self.name)
+                return
+
+            self._put(connection)
+
+    def _put(self, connection):
+        """Hands a connection to the first waiter, or makes it idle."""
+        waiter = self._next_waiter()
+        if waiter is not None:
+            waiter.set_result(connection)
+        else:
+            self._idle.append((connection, time.monotonic()))
+
+    async def _healthy(self, connection):
+        """Checks an idle connection, discarding it if unhealthy."""
+        try:
+            healthy = self.check(connection)
+            if inspect.isawaitable(healthy):
+                healthy = await healthy
+        except Exception:
+            healthy = False
+
+        if not healthy:
+            self.failed_checks += 1
+            self._discard(connection)
+
+        return healthy
+
+    def _discard(self, connection):
+        """Closes a connection in the background, freeing its slot.
+        Returns the future of the closing."""
+        self._size -= 1
+        self.discarded += 1
+        closing = gen.convert_yielded(self._disconnect(connection))
+        self._free_slot()
+        return closing
+
+    async def _disconnect(self, connection):
+        if self.disconnect is None:
+            return
+
+        try:
+            result = self.disconnect(connection)
+            if inspect.isawaitable(result):
+                await result
+        except Exception:
+            app_log.exception("Could not close a connection of pool %s",
+                              self.name)
+
+    def _free_slot(self):
+        """Hands a freed slot to the first waiter, if any."""
+        if self._closed:
+            return
+
+        waiter = self._next_waiter()
+        if waiter is not None:
+            self._size += 1
+            waiter.set_result(_SLOT)
+
+    def _next_waiter(self):
+        """Returns the first waiter still waiting, skipping the ones
+        cancelled."""
+        while self._waiters:
+            waiter = self._waiters.popleft()
+            if not waiter.done():
+                return waiter
+
+        return None
+
+    def _abandon(self, waiter):
+        """Removes the waiter of an acquisition giving up, and takes
+        back the connection or slot handed to it in the meantime."""
+        try:
+            self._waiters.remove(waiter)
+        except ValueError:
+            pass
+
+        if (not waiter.done() or waiter.cancelled() or
+                waiter.exception() is not None):
+            return
+
+        result = waiter.result()
+        if result is _SLOT:
+            self._size -= 1
+            self._free_slot()
+        elif self._closed:
+            self._discard(result)
+        else:
+            self._put(result)
+
+    def _check_open(self):
+        if self._closed:
+            raise self._closed_error()
+
+    def _closed_error(self):
+        return exceptions.ServiceUnavailable.from_message(
+            "The connection pool {} is closed".format(self.name))
+
+
+class _Checkout:
+    def __init__(self, pool, timeout):
+        self._pool = pool
+        self._timeout = timeout
+        self._connection = None
+
+    async def __aenter__(self):
+        self._connection = await self._pool.acquire(self._timeout)
+        return self._connection
+
+    async def __aexit__(self, exc_type, exc_value, traceback):
+        self._pool.release(
+            self._connection,
+            discard=(exc_type is not None and
+                     not issubclass(exc_type, exceptions.JsonApiException)))
+
+
+class PoolRegistry:
+    """The connection pools of an Api, by name.
+
+    The pools are started with the Api, or when added to a started
+    registry, so that data layers can add them in their startup. They
+    are closed when the Api shuts down, after the data layers.
+    """
+
+    def __init__(self, close_timeout=DEFAULT_CLOSE_TIMEOUT):
+        """Defines the registry.
+
+        Parameters
+        ----------
+        close_timeout: float or None
+            The time to wait for the connections in use when closing
+            each pool, in seconds. None to wait indefinitely.
+        """
+        self.close_timeout = close_timeout
+        self._pools = collections.OrderedDict()
+        self._started = False
+
+    def __getitem__(self, name):
+        return self._pools[name]
+
+    def __contains__(self, name):
+        return name in self._pools
+
+    def __iter__(self):
+        return iter(self._pools)
+
+    def __len__(self):
+        return len(self._pools)
+
+    def get(self, name, default=None):
+        """Returns the pool of a name, or default."""
+        return self._pools.get(name, default)
+
+    def add(self, name, pool):
+        """Adds a pool.
+
+        Parameters
+        ----------
+        name: str
+            The name of the pool
+        pool: Pool
+            The pool
+
+        Returns
+        -------
+        Pool: the pool
+
+        Raises
+        ------
+        ValueError:
+            if a pool already has the name
+        """
+        if name in self._pools:
+            raise ValueError("Pool {} is already registered".format(name))
+
+        pool.name = name
+        self._pools[name] = pool
+        if self._started:
+            pool.start()
+
+        return pool
+
+    def stats(self):
+        """Returns the stats of each pool, by name."""
+        return {name: pool.stats() for name, pool in self._pools.items()}
+
+    def start(self):
+        """Starts the pools."""
+        self._started = True
+        for pool in self._pools.values():
+            pool.start()
+
+    async def close(self):
+        """Closes the pools, in reverse order of addition."""
+        self._started = False
+        for pool in reversed(list(self._pools.values())):
+            await pool.close(self.close_timeout)
@@ -0,0 +1,186 @@
+import collections
+import random
+import tracemalloc
+
+#: Default fraction of the requests that are profiled.
+DEFAULT_SAMPLE_RATE = 0.01
+
+
+class MemoryProfiler:
+    """Measures the memory allocated by each phase of the requests
+    handled by the resources, using tracemalloc.
+
+    Only a fraction of the requests is sampled, and one at a time:
+    tracemalloc runs only while a sampled request is in progress, so
+    that the other requests do not pay its overhead. At the beginning
+    of each phase the traces are cleared, so that at its end the traced
+    memory gives the bytes allocated by the phase and still alive
+    (retained), and the traced peak gives the peak usage during the
+    phase. Allocations of other requests running concurrently during
+    asynchronous phases are attributed to the sampled one.
+
+    The profiler does not sample if tracemalloc has been started by
+    someone else.
+    """
+
+    def __init__(self, sample_rate=DEFAULT_SAMPLE_RATE, top=0, frames=1):
+        """Defines the profiler.
+
+        Parameters
+        ----------
+        sample_rate: float
+            The fraction of requests to profile, between 0 and 1.
+        top: int
+            If positive, a tracemalloc snapshot is taken at the end of
+            each phase, and the sizes of the top allocation sites are
+            accumulated in the report. Snapshots are expensive.
+        frames: int
+            The number of frames stored by tracemalloc per allocation.
+        """
+        self.sample_rate = sample_rate
+        self.top = top
+        self.frames = frames
+        self._active = None
+        self._stats = collections.OrderedDict()
+
+    def start_request(self, handler):
+        """Decides if a request is sampled, and starts tracing if so.
+
+        Parameters
+        ----------
+        handler: Resource
+            The handler of the request
+
+        Returns
+        -------
+        RequestProfile or None: the profile of the request, or None if
+        the request is not sampled.
+        """
+        if self._active is not None or random.random() >= self.sample_rate:
+            return None
+
+        if tracemalloc.is_tracing():
+            return None
+
+        tracemalloc.start(self.frames)
+        route = "{} {}".format(type(handler).__name__, handler.request.method)
+        self._active = RequestProfile(self, route)
+        return self._active
+
+    def finish_request(self, profile):
+        """Stops tracing at the end of a sampled request.
+
+        Parameters
+        ----------
+        profile: RequestProfile
+            The profile returned by start_request
+        """
+        if profile is not self._active:
+            return
+
+        self._active = None
+        tracemalloc.stop()
+
+    def report(self):
+        """Returns the statistics collected so far.
+
+        Returns
+        -------
+        dict: for each route, a dict of phases, each with the number of
+        samples, the maximum and total peak bytes, the total retained
+        bytes and, if enabled, the top allocation sites.
+        """
+        result = collections.OrderedDict()
+        for (route, phase), stats in self._stats.items():
+            entry = {
+                "samples": stats.samples,
+                "peak_max": stats.peak_max,
+                "peak_total": stats.peak_total,
+                "retained_total": stats.retained_total,
+            }
+            if self.top > 0:
+                entry["top"] = stats.sites.most_common(self.top)
+            result.setdefault(route, collections.OrderedDict())[phase] = \
+                entry
+
+        return result
+
+    def reset(self):
+        """Discards the statistics collected so far."""
+        self._stats.clear()
+
+    def _record(self, route, phase, peak, retained, sites):
+        key = (route, phase)
+        stats = self._stats.get(key)
+        if stats is None:
+            stats = self._stats[key] = _PhaseStats()
+
+        stats.samples += 1
+        stats.peak_max = max(stats.peak_max, peak)
+        stats.peak_total += peak
+        stats.retained_total += retained
+        if sites is not None:
+            stats.sites.update(sites)
+
+
+class RequestProfile:
+    """The profile of a sampled request"""
+
+    def __init__(self, profiler, route):
+        self.profiler = profiler
+        self.route = route
+
+    def phase(self, name):
+        """Returns a context manager measuring the given phase."""
+        return _Phase(self, name)
+
+
+class _Phase:
+    def __init__(self, profile, name):
+        self._profile = profile
+        self._name = name
+
+    def __enter__(self):
+        if tracemalloc.is_tracing():
+            tracemalloc.clear_traces()
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        if not tracemalloc.is_tracing():
+            return
+
+        retained, peak = tracemalloc.get_traced_memory()
+        profiler = self._profile.profiler
+        sites = None
+        if profiler.top > 0:
+            snapshot = tracemalloc.take_snapshot()
+            sites = {
+                str(stat.traceback): stat.size
+                for stat in snapshot.statistics("lineno")[:profiler.top]
+            }
+
+        profiler._record(self._profile.route, self._name, peak, retained,
+                         sites)
+
+
+class _NullPhase:
+    """Phase context manager for requests that are not profiled."""
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        pass
+
+
+class _PhaseStats:
+    def __init__(self):
+        self.samples = 0
+        self.peak_max = 0
+        self.peak_total = 0
+        self.retained_total = 0
+        self.sites = collections.Counter()
+
+
+#: The phase context manager used when a request is not profiled.
+NULL_PHASE = _NullPhase()
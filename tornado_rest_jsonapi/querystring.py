@@ -129,7 +129,7 @@ class QueryStringManager(object):
         list:
             filter information
         """
-        filters = self.qs.get('filter')
+        filters = self.query_args.get('filter')
         if filters is not None:
             try:
                 filters = json.loads(filters)
@@ -245,6 +245,27 @@ class QueryStringManager(object):
 
         return []
 
+    @property
+    def since(self):
+        """Return the token of a delta query
+
+        Returns
+        -------
+        str or None:
+            the token, empty for the initial synchronization, or None
+            if the query is not a delta query.
+        """
+        since = self.query_args.get('since')
+        if isinstance(since, list):
+            raise BadRequest([
+                Error(
+                    source=Source(parameter='since'),
+                    detail="Only one token can be specified"
+                )
+            ])
+
+        return since
+
     @property
     def include(self):
         """Return fields to include
@@ -0,0 +1,242 @@
+from collections import OrderedDict
+
+from tornado import escape
+
+from . import exceptions
+
+try:
+    import msgpack
+except ImportError:
+    msgpack = None
+
+#: Maximum number of distinct Accept headers whose negotiation is cached.
+_MAX_NEGOTIATED = 256
+
+# Media ranges of the Accept header standing for the default
+# representation, unless registered.
+_DEFAULT_MEDIA_RANGES = frozenset(("*/*", "application/*", "application/json"))
+
+# Stands for the media type preferred to the representations in the
+# negotiations of Representations.prefers
+_OTHER = object()
+
+
+class Representation:
+    """Base class of the encodings of the JSON:API documents.
+
+    A representation converts between the document model, made of
+    dicts, lists and scalars, and the bytes of a payload of its media
+    type.
+    """
+
+    #: The media type of the payloads
+    media_type = None
+
+    def encode(self, document):
+        """Encodes a document.
+
+        Parameters
+        ----------
+        document: dict
+            The JSON:API document
+
+        Returns
+        -------
+        bytes: the payload
+        """
+        raise NotImplementedError()
+
+    def decode(self, data):
+        """Decodes a payload.
+
+        Parameters
+        ----------
+        data: bytes
+            The payload
+
+        Returns
+        -------
+        dict: the JSON:API document
+
+        Raises
+        ------
+        BadRequest:
+            if the payload is malformed
+        """
+        raise NotImplementedError()
+
+
+class JsonApiRepresentation(Representation):
+    """The JSON encoding of the JSON:API specification"""
+
+    media_type = "application/vnd.api+json"
+
+    def encode(self, document):
+        return escape.utf8(escape.json_encode(document))
+
+    def decode(self, data):
+        # Malformed payloads raise JSONDecodeError, answered with 400
+        return escape.json_decode(data)
+
+
+class MessagePackRepresentation(Representation):
+    """The MessagePack encoding of the JSON:API documents, more compact
+    and cheaper to encode than JSON. Requires the msgpack package."""
+
+    def __init__(self, media_type="application/vnd.api+msgpack"):
+        """Defines the representation.
+
+        Parameters
+        ----------
+        media_type: str
+            The media type to negotiate.
+
+        Raises
+        ------
+        ImportError:
+            if msgpack is not installed
+        """
+        if msgpack is None:
+            raise ImportError("MessagePackRepresentation requires msgpack")
+
+        self.media_type = media_type
+
+    def encode(self, document):
+        return msgpack.packb(document, use_bin_type=True)
+
+    def decode(self, data):
+        try:
+            return msgpack.unpackb(data, raw=False)
+        except Exception:
+            raise exceptions.BadRequest.from_message("Malformed payload")
+
+
+#: The default representation
+JSONAPI = JsonApiRepresentation()
+
+
+class Representations:
+    """The registry of the representations supported by an Api.
+
+    The representation of a response is negotiated from the Accept
+    header of the request, and the one of a request payload is given
+    by its Content-Type. JSON:API is always supported, and is used when
+    nothing else matches.
+    """
+
+    def __init__(self):
+        self.default = JSONAPI
+        self._by_media_type = OrderedDict()
+        self._negotiated = {}
+        self.register(JSONAPI)
+
+    def __iter__(self):
+        return iter(self._by_media_type.values())
+
+    def register(self, representation):
+        """Adds a representation, replacing the one with the same media
+        type, if any.
+
+        Parameters
+        ----------
+        representation: Representation
+            The representation
+        """
+        self._by_media_type[representation.media_type.lower()] = \
+            representation
+        self._negotiated.clear()
+
+    def for_content_type(self, content_type):
+        """Returns the representation of a request payload.
+
+        Parameters
+        ----------
+        content_type: str or None
+            The Content-Type header of the request
+
+        Returns
+        -------
+        Representation: the registered representation of the media
+        type, or the default one.
+        """
+        if not content_type:
+            return self.default
+
+        media_type = content_type.split(";", 1)[0].strip().lower()
+        return self._by_media_type.get(media_type, self.default)
+
+    def negotiate(self, accept):
+        """Returns the representation of a response.
+
+        Parameters
+        ----------
+        accept: str or None
+            The Accept header of the request
+
+        Returns
+        -------
+        Representation: the acceptable representation with the highest
+        quality, the first listed in case of a tie, or the default one.
+        """
+        if not accept:
+            return self.default
+
+        return self._best(accept, None)
+
+    def prefers(self, accept, media_type):
+        """Returns True if the Accept header of a request prefers a
+        media type that is not a registered representation, such as
+        the one of an export, to the representations.
+
+        Parameters
+        ----------
+        accept: str or None
+            The Accept header of the request
+        media_type: str
+            The media type, which must be listed explicitly in the
+            header with a quality above 0. In case of a tie with a
+            representation, the first listed wins.
+        """
+        if not accept:
+            return False
+
+        return self._best(accept, media_type.lower()) is _OTHER
+
+    def _best(self, accept, other):
+        """Returns the representation of the Accept header with the
+        highest quality, or _OTHER for the other media type."""
+        key = (accept, other)
+        try:
+            return self._negotiated[key]
+        except KeyError:
+            pass
+
+        best, best_quality = self.default, 0.0
+        for item in accept.split(","):
+            media_type, *params = item.split(";")
+            media_type = media_type.strip().lower()
+            if other is not None and media_type == other:
+                representation = _OTHER
+            else:
+                representation = self._by_media_type.get(media_type)
+            if representation is None:
+                if media_type not in _DEFAULT_MEDIA_RANGES:
+                    continue
+                representation = self.default
+
+            quality = 1.0
+            for param in params:
+                name, _, value = param.partition("=")
+                if name.strip() == "q":
+                    try:
+                        quality = float(value)
+                    except ValueError:
+                        quality = 0.0
+
+            if quality > best_quality:
+                best, best_quality = representation, quality
+
+        if len(self._negotiated) >= _MAX_NEGOTIATED:
+            self._negotiated.clear()
+        self._negotiated[key] = best
+        return best
@@ -1,33 +1,123 @@
+import datetime
 import http.client
+import inspect
 import json
+import math
+from copy import deepcopy
+from urllib.parse import urlencode
 
 from marshmallow import ValidationError
 from marshmallow_jsonapi.exceptions import IncorrectTypeError
 from tornado import web, gen, escape
 from tornado.log import app_log
-from . import exceptions
-from .errors import jsonapi_errors, errors_from_jsonapi_errors
+from . import compiler, exceptions, offload
+from .compression import Decompressor, ResponseBody, decompress
+from .errors import (
+    Error, Source, encoded_jsonapi_errors, jsonapi_errors,
+    lazy_errors_from_jsonapi_errors)
+from .jsonstream import ResourceObjectStream
 from .pagination import pagination_links
+from .profiling import NULL_PHASE
+from .representations import JSONAPI
 from .schema import compute_schema
 from .querystring import QueryStringManager as QSManager
 
-_CONTENT_TYPE_JSONAPI = 'application/vnd.api+json'
+_CONTENT_TYPE_NDJSON = 'application/x-ndjson'
+_CONSISTENCY_TOKEN_HEADER = 'X-Consistency-Token'
+
+#: Default number of resources fetched per data layer call on export.
+DEFAULT_EXPORT_BATCH_SIZE = 500
+
+# The jsonapi member of every response document, and its encoding.
+_JSONAPI_OBJECT = {"version": "1.0"}
+_JSONAPI_MEMBER = b'"jsonapi":' + escape.utf8(escape.json_encode(
+    _JSONAPI_OBJECT))
+_OPEN_OBJECT, _CLOSE_OBJECT = ord("{"), ord("}")
+_WHITESPACE = frozenset(b" \t\r\n")
 
 
 class Resource(web.RequestHandler):
     data_layer = None
     schema = None
 
+    #: The OffloadPolicy for the serialization and validation work of
+    #: this resource. If None, the policy of the Api is used.
+    offload_policy = None
+
+    #: If True, serialize and validate with code compiled from the
+    #: schema. If None, the setting of the Api is used.
+    compile_schemas = None
+
+    #: The maximum number of requests handled at the same time by this
+    #: resource, when the Api has an AdmissionController. If None, the
+    #: limit of the controller is used.
+    max_in_flight = None
+
+    #: If False, the GET requests of this resource are never coalesced,
+    #: even if the Api has a SingleFlight.
+    coalesce = True
+
+    #: The timeouts, in seconds, of the data layer operations, by
+    #: operation name, such as {"get_collection": 2.0}. The "default"
+    #: entry applies to the operations not listed. The operations not
+    #: covered use the timeouts of the Api.
+    timeouts = None
+
     def initialize(self, registry, base_urlpath):
         """Initialization method for when the class is instantiated."""
         self._registry = registry
         self._base_urlpath = base_urlpath
+        self._profile = None
+        self._admission = None
+        self._representation = None
+        self._released = False
+        self._registry.request_started(self)
 
-    @gen.coroutine
-    def prepare(self):
+    async def prepare(self):
         """Runs before any specific handler. """
+        profiler = self.registry.memory_profiler
+        if profiler is not None:
+            self._profile = profiler.start_request(self)
+
         authenticator = self.registry.authenticator
-        self.current_user = yield authenticator.authenticate(self)
+        with self._phase("authenticate"):
+            current_user = authenticator.authenticate(self)
+            if inspect.isawaitable(current_user):
+                current_user = await current_user
+            self.current_user = current_user
+
+        admission = self.registry.admission
+        if admission is not None:
+            self._admission = admission.admit(self)
+
+    def on_finish(self):
+        """Runs after the response has been sent."""
+        self._release_request()
+
+    def on_connection_close(self):
+        """Runs when the client closes the connection, possibly before
+        the response has been sent, in which case on_finish is not
+        called."""
+        super().on_connection_close()
+        self._release_request()
+
+    def _release_request(self):
+        """Gives back the admission ticket and the memory profiling
+        session of the request, and reports its end to the Api. Only
+        the first call has an effect."""
+        if self._released:
+            return
+        self._released = True
+
+        if self._admission is not None:
+            self._admission.release()
+            self._admission = None
+
+        if self._profile is not None:
+            self._profile.profiler.finish_request(self._profile)
+            self._profile = None
+
+        self.registry.request_finished(self)
 
     @property
     def registry(self):
@@ -43,15 +133,187 @@ class Resource(web.RequestHandler):
     def log(self):
         return app_log
 
+    @property
+    def representation(self):
+        """The Representation of the response, negotiated among the
+        representations of the Api from the Accept header."""
+        if self._representation is None:
+            self._representation = self.registry.representations.negotiate(
+                self.request.headers.get("Accept"))
+        return self._representation
+
     def get_data_layer_instance(self):
         data_layer_cls = self.data_layer["class"]
         data_layer_kwargs = dict(self.data_layer)
         data_layer_kwargs.pop("class", None)
         data_layer_kwargs["application"] = self.application
         data_layer_kwargs["current_user"] = self.current_user
+        data_layer_kwargs["read_only"] = self.request.method in ("GET",
+                                                                 "HEAD")
+        data_layer_kwargs["consistency_token"] = self.request.headers.get(
+            _CONSISTENCY_TOKEN_HEADER)
+        data_layer_kwargs["pools"] = self.registry.pools
 
         return data_layer_cls(data_layer_kwargs)
 
+    def _phase(self, name):
+        """Returns a context manager delimiting a phase of the request
+        handling, for profiling and metrics purposes."""
+        phase = NULL_PHASE
+        if self._profile is not None:
+            phase = self._profile.phase(name)
+
+        metrics = self.registry.metrics
+        if metrics is not None:
+            phase = metrics.phase(self, name, phase)
+
+        return phase
+
+    def _data_layer_call(self, operation):
+        """Returns a context manager delimiting a data layer operation,
+        for metrics purposes."""
+        metrics = self.registry.metrics
+        if metrics is None:
+            return NULL_PHASE
+
+        return metrics.data_layer_call(self, operation)
+
+    async def _call_data_layer(self, data_layer, operation, *args):
+        """Invokes an operation of the data layer, such as
+        get_object, and returns its result.
+
+        The operation can be a native coroutine, a tornado coroutine,
+        or return its result directly, in which case no future is
+        involved. If the operation has a timeout and does not complete
+        in time, the data layer is cancelled and DataLayerTimeout is
+        raised."""
+        with self._phase("data_layer"), self._data_layer_call(operation):
+            result = getattr(data_layer, operation)(*args)
+            if not inspect.isawaitable(result):
+                return result
+
+            timeout = self._get_timeout(operation)
+            if timeout is None:
+                return await result
+
+            try:
+                result = await gen.with_timeout(
+                    datetime.timedelta(seconds=timeout),
+                    gen.convert_yielded(result),
+                    quiet_exceptions=(Exception, ))
+            except gen.TimeoutError:
+                self.log.warning("%s.%s timed out after %s seconds",
+                                 type(data_layer).__name__,
+                                 operation,
+                                 timeout)
+                data_layer.cancel()
+                raise exceptions.DataLayerTimeout()
+
+        return result
+
+    def _publish_change(self, name, resource_object):
+        """Publishes a change of a resource to the change feed of its
+        type, if any."""
+        feed = self.registry.change_feeds.get(resource_object["type"])
+        if feed is not None:
+            feed.publish(name, resource_object)
+
+    def _send_consistency_token(self, data_layer):
+        """Returns to the client the consistency token of the data layer
+        after a write, so that it can send it back with its next
+        requests."""
+        token = data_layer.consistency_token
+        if token is not None:
+            self.set_header(_CONSISTENCY_TOKEN_HEADER, token)
+
+    def _get_timeout(self, operation):
+        """Returns the timeout of a data layer operation, or None."""
+        for timeouts in (self.timeouts, self.registry.timeouts):
+            if timeouts:
+                timeout = timeouts.get(operation, timeouts.get("default"))
+                if timeout is not None:
+                    return timeout
+
+        return None
+
+    def _decode_body(self):
+        """Decodes the payload of the request according to its
+        Content-Type, decompressing it first according to its
+        Content-Encoding."""
+        with self._phase("decode"):
+            body = self.request.body
+            encoding = self.request.headers.get("Content-Encoding",
+                                                "identity")
+            if encoding.strip().lower() != "identity":
+                body = decompress(body,
+                                  encoding,
+                                  self.registry.max_decompressed_body_size)
+
+            representation = self.registry.representations.for_content_type(
+                self.request.headers.get("Content-Type"))
+            return representation.decode(body)
+
+    def _get_offload_policy(self):
+        """Returns the effective OffloadPolicy, or None."""
+        if self.offload_policy is not None:
+            return self.offload_policy
+
+        return self.registry.offload_policy
+
+    def _get_compile_schemas(self):
+        """Returns True if the schemas are compiled."""
+        if self.compile_schemas is not None:
+            return self.compile_schemas
+
+        return self.registry.compile_schemas
+
+    async def _dump(self, schema, obj, items=1):
+        """Serializes obj with the schema, on the executor of the
+        offload policy if the number of items requires so."""
+        dump = compiler.dump if self._get_compile_schemas() else offload.dump
+        policy = self._get_offload_policy()
+        with self._phase("dump"):
+            if policy is None or not policy.should_offload(items=items):
+                return dump(schema, obj)
+
+            return await policy.run(dump, schema, obj, items=items)
+
+    async def _load(self, schema, json_data, size=0):
+        """Validates and deserializes a JSON:API document with the
+        given schema, converting the validation errors into the
+        appropriate JsonApiException. The work is performed on the
+        executor of the offload policy if the payload size requires so.
+        """
+        load = compiler.load if self._get_compile_schemas() else offload.load
+        policy = self._get_offload_policy()
+        try:
+            with self._phase("load"):
+                if policy is None or not policy.should_offload(size=size):
+                    data, errors = load(schema, json_data)
+                else:
+                    data, errors = await policy.run(
+                        load, schema, json_data, size=size)
+        except IncorrectTypeError as e:
+            errors = e.messages
+            for error in errors['errors']:
+                error['status'] = '409'
+                error['title'] = "Incorrect type"
+            raise exceptions.InvalidType(
+                lazy_errors_from_jsonapi_errors(errors))
+        except ValidationError as e:
+            errors = e.messages
+            for message in errors['errors']:
+                message['status'] = '422'
+                message['title'] = "Validation error"
+            raise exceptions.ValidationError(
+                lazy_errors_from_jsonapi_errors(errors))
+
+        if errors:
+            raise exceptions.BadRequest(
+                lazy_errors_from_jsonapi_errors(errors))
+
+        return data
+
     def write_error(self, status_code, **kwargs):
         """Provides appropriate payload to the response in case of error.
         """
@@ -63,10 +325,23 @@ class Resource(web.RequestHandler):
 
         exc = exc_info[1]
 
+        metrics = self.registry.metrics
+        if metrics is not None:
+            metrics.error(self, exc)
+
         if isinstance(exc, exceptions.JsonApiException):
-            self.set_header('Content-Type', _CONTENT_TYPE_JSONAPI)
+            representation = self.representation
+            self.set_header('Content-Type', representation.media_type)
+            self.add_header('Vary', 'Accept')
             self.set_status(exc.status)
-            self.finish(escape.json_encode(jsonapi_errors(exc)))
+            if isinstance(exc, exceptions.RetryLater) and \
+                    exc.retry_after is not None:
+                self.set_header('Retry-After',
+                                str(int(math.ceil(exc.retry_after))))
+            if representation is JSONAPI:
+                self.finish(encoded_jsonapi_errors(exc))
+            else:
+                self.finish(representation.encode(jsonapi_errors(exc)))
         elif isinstance(exc, json.decoder.JSONDecodeError):
             self.clear_header('Content-Type')
             self.set_status(http.client.BAD_REQUEST)
@@ -79,29 +354,122 @@ class Resource(web.RequestHandler):
             self.clear_header('Content-Type')
             self.finish()
 
-    def _send_to_client(self, entity):
+    def _send_to_client(self, entity, status=http.client.OK):
         """Convenience method to send a given entity to a client.
         Serializes it and puts the right headers.
-        If entity is None, sets no content http response."""
+        If entity is None, sets no content http response.
+
+        Parameters
+        ----------
+        entity: dict, bytes or None
+            The document to send. A dict is serialized, and the jsonapi
+            member is added to it in place. Bytes are taken as an
+            already encoded JSON object, such as one from a cache, and
+            are sent with the jsonapi member appended.
+        status: int
+            The http status of the response
+        """
 
         if entity is None:
             self.clear_header('Content-Type')
             self.set_status(http.client.NO_CONTENT)
             return
 
-        self.set_header("Content-Type", _CONTENT_TYPE_JSONAPI)
-        response = entity
-        if isinstance(entity, dict):
-            response = {}
-            response.update(entity)
-            response["jsonapi"] = {
-                "version": "1.0"
-            }
-
-        self.set_status(http.client.OK)
-        self.write(escape.json_encode(response))
+        self._send_body(self._encode(entity), status)
+
+    def _encode(self, entity):
+        """Encodes a document into a ResponseBody.
+
+        Parameters
+        ----------
+        entity: dict or bytes
+            The document, as accepted by _send_to_client. It is
+            encoded with the negotiated representation.
+        """
+        representation = self.representation
+        with self._phase("encode"):
+            if isinstance(entity, (bytes, bytearray, memoryview)):
+                if representation is JSONAPI:
+                    return ResponseBody(_append_jsonapi_member(entity))
+                entity = escape.json_decode(bytes(entity))
+
+            if isinstance(entity, dict):
+                entity["jsonapi"] = _JSONAPI_OBJECT
+
+            return ResponseBody(representation.encode(entity))
+
+    def _send_body(self, body, status=http.client.OK):
+        """Sends an encoded ResponseBody to the client."""
+        self.set_header("Content-Type", self.representation.media_type)
+        self.add_header("Vary", "Accept")
+        self.set_status(int(status))
+        with self._phase("write"):
+            self._write_body(body)
         self.flush()
 
+    async def _coalesced(self, fn, *args):
+        """Runs the coroutine function fn(*args), returning its result.
+        If the Api has a SingleFlight and the resource allows it, the
+        result is shared with the identical requests in progress. The
+        requests whose coalescing key is not hashable are not
+        coalesced."""
+        single_flight = self.registry.single_flight
+        if single_flight is None or not self.coalesce:
+            return await fn(*args)
+
+        key = self.coalescing_key()
+        try:
+            hash(key)
+        except TypeError:
+            return await fn(*args)
+
+        return await single_flight.run(key, fn, *args)
+
+    def coalescing_key(self):
+        """Returns the key identifying the requests whose responses are
+        identical, so that they can be coalesced.
+
+        The key is made of the resource class, the host and path, which
+        include the view arguments, the sorted query arguments, the
+        media type of the response, the consistency token sent by the
+        client and the scope of the user, as returned by
+        coalescing_scope.
+        """
+        query = tuple(sorted(
+            (name, tuple(values))
+            for name, values in self.request.query_arguments.items()))
+        return (type(self),
+                self.request.host,
+                self.request.path,
+                query,
+                self.representation.media_type,
+                self.request.headers.get(_CONSISTENCY_TOKEN_HEADER),
+                self.coalescing_scope())
+
+    def coalescing_scope(self):
+        """Returns the part of the coalescing key depending on the
+        user. By default the current user, so that only the requests of
+        the same user are coalesced. Reimplement it to return a wider
+        scope, such as the tenant of the user, or None if the responses
+        do not depend on the user. The scope must be hashable, or the
+        requests are not coalesced."""
+        return self.current_user
+
+    def _write_body(self, body):
+        """Writes a ResponseBody, compressed according to the
+        Api compression policy and the Accept-Encoding of the request."""
+        compression = self.registry.compression
+        if compression is None:
+            self.write(body.data)
+            return
+
+        self.add_header("Vary", "Accept-Encoding")
+        encoding, data = compression.apply(
+            body, self.request.headers.get("Accept-Encoding", ""))
+        if encoding is not None:
+            self.set_header("Content-Encoding", encoding)
+        self.write(data)
+
     def _send_created_to_client(self, location):
         """Sends a created message to the client for a given resource
 
@@ -114,69 +482,253 @@ class Resource(web.RequestHandler):
 
 class ResourceList(Resource):
     """Handler for URLs without an identifier.
+
+    A GET request preferring application/x-ndjson to the
+    representations of the Api exports the whole collection as newline
+    delimited resource objects, written in batches of
+    export_batch_size. The batches are fetched with the
+    get_collection_batch method of the data layer: the export is
+    streamed from the backend only if the data layer reimplements it
+    with a cursor, as the default pages through get_collection.
     """
-    @gen.coroutine
-    def get(self, *args, **view_kwargs):
+
+    #: The number of resources fetched from the data layer at a time
+    #: when exporting the collection.
+    export_batch_size = DEFAULT_EXPORT_BATCH_SIZE
+
+    def is_export(self):
+        """True if the request is a GET exporting the whole
+        collection."""
+        return (self.request.method == "GET" and
+                self.registry.representations.prefers(
+                    self.request.headers.get("Accept"), _CONTENT_TYPE_NDJSON))
+
+    async def get(self, *args, **view_kwargs):
+        if self.is_export():
+            # Pages are sent instead for other Accept headers
+            self.add_header("Vary", "Accept")
+            await self._export(view_kwargs)
+            return
+
+        body = await self._coalesced(self._get_body, view_kwargs)
+        self._send_body(body)
+
+    async def _export(self, view_kwargs):
+        """Streams all the resources matching the filters, in the
+        requested order and with the requested fields, one resource
+        object per line. Each batch is written and flushed before the
+        next is fetched, so that memory stays constant and a slow
+        client slows down the export. Errors occurring after the first
+        batch has been sent can only abort the response."""
+        data_layer = self.get_data_layer_instance()
+        qs = QSManager(self.request.arguments, self.schema)
+        for key in ("page[number]", "page[size]"):
+            if key in qs.query_args:
+                del qs[key]
+
+        schema = compute_schema(self.schema,
+                                {"many": True},
+                                qs,
+                                [])
+
+        self.set_header("Content-Type", _CONTENT_TYPE_NDJSON)
+        cursor = None
+        while True:
+            items, cursor = await self._call_data_layer(
+                data_layer, "get_collection_batch",
+                qs, cursor, self.export_batch_size, view_kwargs)
+
+            if items:
+                result = await self._dump(schema, items, items=len(items))
+                with self._phase("encode"):
+                    self.write(b"".join(
+                        escape.utf8(escape.json_encode(resource_object)) +
+                        b"\n"
+                        for resource_object in result["data"]))
+                await self.flush()
+
+            if cursor is None:
+                break
+
+    async def _get_body(self, view_kwargs):
+        """Returns the encoded collection."""
         data_layer = self.get_data_layer_instance()
         qs = QSManager(self.request.arguments, self.schema)
+        if qs.since is not None:
+            return await self._get_changes_body(data_layer, qs, view_kwargs)
 
-        total_num, items = yield data_layer.get_collection(qs, view_kwargs)
+        total_num, items = await self._call_data_layer(
+            data_layer, "get_collection", qs, view_kwargs)
 
         schema = compute_schema(self.schema,
                                 {"many": True},
                                 qs,
                                 qs.include)
-        result = schema.dump(items).data
+        result = await self._dump(schema, items, items=len(items))
         result["links"] = pagination_links(total_num,
                                            qs,
                                            self.request.full_url())
-        self._send_to_client(result)
+        return self._encode(result)
+
+    async def _get_changes_body(self, data_layer, qs, view_kwargs):
+        """Returns the encoded changes of the collection after the
+        since token: the created or updated resources as data, and
+        the deleted ones as identifiers in the meta, with the token to
+        use for the next delta query. The changes are paged by the
+        page size, the next link carrying the token reached."""
+        if "number" in qs.pagination:
+            raise exceptions.BadRequest([
+                Error(source=Source(parameter="page[number]"),
+                      detail="Delta queries are paged with the since "
+                             "token")])
+
+        try:
+            items, deleted, token, more = await self._call_data_layer(
+                data_layer, "get_changes", qs, qs.since, view_kwargs)
+        except NotImplementedError:
+            raise exceptions.InvalidSince([
+                Error(source=Source(parameter="since"),
+                      detail="Delta queries are not supported")])
 
-    @gen.coroutine
-    def post(self, *args, **view_kwargs):
+        schema = compute_schema(self.schema,
+                                {"many": True},
+                                qs,
+                                qs.include)
+        result = await self._dump(schema, items, items=len(items))
+
+        type_ = self.schema.opts.type_
+        result.setdefault("meta", {}).update({
+            "since": token,
+            "deleted": [{"type": type_, "id": str(identifier)}
+                        for identifier in deleted],
+        })
+
+        base_url = "{}://{}{}".format(self.request.protocol,
+                                      self.request.host,
+                                      self.request.path)
+        result["links"] = {"self": self.request.full_url()}
+        if more:
+            next_query = deepcopy(qs)
+            next_query["since"] = token
+            result["links"]["next"] = "{}?{}".format(
+                base_url, urlencode(next_query.queryitems))
+
+        return self._encode(result)
+
+    async def post(self, *args, **view_kwargs):
         data_layer = self.get_data_layer_instance()
         qs = QSManager(self.request.arguments, self.schema)
 
-        json_data = escape.json_decode(self.request.body)
+        json_data = self._decode_body()
 
         schema = compute_schema(self.schema,
                                 {},
                                 qs,
                                 qs.include)
-        try:
-            data, errors = schema.load(json_data)
-        except IncorrectTypeError as e:
-            errors = e.messages
-            for error in errors['errors']:
-                error['status'] = '409'
-                error['title'] = "Incorrect type"
-            raise exceptions.InvalidType(
-                errors_from_jsonapi_errors(errors))
-        except ValidationError as e:
-            errors = e.messages
-            for message in errors['errors']:
-                message['status'] = '422'
-                message['title'] = "Validation error"
-
-            raise exceptions.ValidationError(
-                errors_from_jsonapi_errors(errors))
-
-        if errors:
-            raise exceptions.BadRequest(errors_from_jsonapi_errors(errors))
+        data = await self._load(schema,
+                                json_data,
+                                size=len(self.request.body))
 
-        obj = yield data_layer.create_object(data, view_kwargs)
-        result = schema.dump(obj).data
+        obj = await self._call_data_layer(
+            data_layer, "create_object", data, view_kwargs)
+        result = await self._dump(schema, obj)
+        self._publish_change("created", result["data"])
+        self._send_consistency_token(data_layer)
 
         location = result['data']['links']['self']
         self._send_created_to_client(location)
 
 
+@web.stream_request_body
+class StreamingResourceList(ResourceList):
+    """Handler for URLs without an identifier, processing the payload of
+    POST requests while it is being received.
+
+    Each resource object is validated and handed to the data layer as
+    soon as it is complete, so that memory stays bounded regardless of
+    the payload size. In addition to a single resource object, the
+    "data" member can contain an array of resource objects, which are
+    created in order. The first error stops the processing of the
+    remaining payload, and is reported once the upload is complete.
+    """
+    async def prepare(self):
+        await super().prepare()
+        if self.request.method != "POST":
+            return
+
+        self._stream = ResourceObjectStream()
+        self._stream_error = None
+        self._created = []
+        self._decompressor = None
+
+        encoding = self.request.headers.get("Content-Encoding", "identity")
+        try:
+            if encoding.strip().lower() != "identity":
+                self._decompressor = Decompressor(
+                    encoding, self.registry.max_decompressed_body_size)
+
+            self._stream_data_layer = self.get_data_layer_instance()
+            qs = QSManager(self.request.arguments, self.schema)
+            self._stream_schema = compute_schema(self.schema,
+                                                 {},
+                                                 qs,
+                                                 qs.include)
+        except Exception as e:
+            self._stream_error = e
+
+    async def data_received(self, chunk):
+        if self._stream_error is not None:
+            return
+
+        try:
+            if self._decompressor is not None:
+                chunk = self._decompressor.feed(chunk)
+
+            for resource_object in self._stream.feed(chunk):
+                data = await self._load(self._stream_schema,
+                                        {"data": resource_object})
+                obj = await self._call_data_layer(
+                    self._stream_data_layer, "create_object",
+                    data, self.path_kwargs)
+                result = await self._dump(self._stream_schema, obj)
+                self._publish_change("created", result["data"])
+                # Keep only the identification of the created resources
+                self._created.append({
+                    key: value
+                    for key, value in result["data"].items()
+                    if key in ("type", "id", "links")
+                })
+        except Exception as e:
+            self._stream_error = e
+
+    async def post(self, *args, **view_kwargs):
+        if self._stream_error is not None:
+            raise self._stream_error
+
+        if self._decompressor is not None:
+            self._decompressor.finish()
+        self._stream.finish()
+        self._send_consistency_token(self._stream_data_layer)
+
+        if not self._stream.many:
+            location = self._created[0]['links']['self']
+            self._send_created_to_client(location)
+            return
+
+        self._send_to_client({"data": self._created},
+                             status=http.client.CREATED)
+
+
 class ResourceDetails(Resource):
     """Handler for URLs addressing a resource.
     """
-    @gen.coroutine
-    def get(self, *args, **view_kwargs):
+    async def get(self, *args, **view_kwargs):
         """Retrieves the resource representation."""
+        body = await self._coalesced(self._get_body, view_kwargs)
+        self._send_body(body)
+
+    async def _get_body(self, view_kwargs):
+        """Returns the encoded resource representation."""
         data_layer = self.get_data_layer_instance()
         qs = QSManager(self.request.arguments, self.schema)
         schema = compute_schema(self.schema,
@@ -184,41 +736,34 @@ class ResourceDetails(Resource):
                                 qs,
                                 qs.include)
 
-        obj = yield data_layer.get_object(view_kwargs)
+        obj = await self._call_data_layer(
+            data_layer, "get_object", view_kwargs)
 
-        result = schema.dump(obj).data
+        result = await self._dump(schema, obj)
 
-        self._send_to_client(result)
+        return self._encode(result)
+
+    def _resource_identifier(self, view_kwargs):
+        """Returns the JSON:API identifier of the addressed resource."""
+        return {
+            "type": self.schema.opts.type_,
+            "id": str(view_kwargs[self.data_layer.get('url_field', 'id')]),
+        }
 
-    @gen.coroutine
-    def patch(self, *args, **view_kwargs):
+    async def patch(self, *args, **view_kwargs):
         data_layer = self.get_data_layer_instance()
         qs = QSManager(self.request.arguments, self.schema)
 
-        json_data = escape.json_decode(self.request.body)
+        json_data = self._decode_body()
 
         schema = compute_schema(self.schema,
                                 {"partial": True},
                                 qs,
                                 qs.include)
 
-        try:
-            data, errors = schema.load(json_data)
-        except IncorrectTypeError as e:
-            errors = e.messages
-            for error in errors['errors']:
-                error['status'] = '409'
-                error['title'] = "Incorrect type"
-            raise exceptions.InvalidType(errors_from_jsonapi_errors(errors))
-        except ValidationError as e:
-            errors = e.messages
-            for message in errors['errors']:
-                message['status'] = '422'
-                message['title'] = "Validation error"
-            raise exceptions.ValidationError(
-                errors_from_jsonapi_errors(errors))
-        if errors:
-            raise exceptions.BadRequest(errors_from_jsonapi_errors(errors))
+        data = await self._load(schema,
+                                json_data,
+                                size=len(self.request.body))
 
         if 'id' not in json_data['data']:
             raise exceptions.InvalidIdentifier()
@@ -227,35 +772,78 @@ class ResourceDetails(Resource):
                 view_kwargs[self.data_layer.get('url_field', 'id')]):
             raise exceptions.InvalidIdentifier()
 
-        obj = yield data_layer.get_object(view_kwargs)
-        updated_obj = yield data_layer.update_object(obj, data, view_kwargs)
+        obj = await self._call_data_layer(
+            data_layer, "get_object", view_kwargs)
+        updated_obj = await self._call_data_layer(
+            data_layer, "update_object", obj, data, view_kwargs)
 
-        result = schema.dump(updated_obj).data
+        result = await self._dump(schema, updated_obj)
+        self._publish_change(
+            "updated",
+            result["data"] or self._resource_identifier(view_kwargs))
+        self._send_consistency_token(data_layer)
 
         self._send_to_client(result)
 
-    @gen.coroutine
-    def post(self, *args, **view_kwargs):
+    async def post(self, *args, **view_kwargs):
         """This operation is not possible in REST, and results
         in either Conflict or NotFound, depending on the
         presence of a resource at the given URL"""
         data_layer = self.get_data_layer_instance()
 
         try:
-            yield data_layer.get_object(view_kwargs)
+            await self._call_data_layer(
+                data_layer, "get_object", view_kwargs)
         except exceptions.ObjectNotFound:
             raise
         else:
             raise exceptions.ObjectAlreadyPresent()
 
-    @gen.coroutine
-    def delete(self, *args, **view_kwargs):
+    async def delete(self, *args, **view_kwargs):
         """Deletes the resource."""
 
         data_layer = self.get_data_layer_instance()
 
-        obj = yield data_layer.get_object(view_kwargs)
-        yield data_layer.delete_object(obj, view_kwargs)
+        obj = await self._call_data_layer(
+            data_layer, "get_object", view_kwargs)
+        await self._call_data_layer(
+            data_layer, "delete_object", obj, view_kwargs)
+        self._publish_change("deleted", self._resource_identifier(view_kwargs))
+        self._send_consistency_token(data_layer)
 
         result = {'meta': {'message': 'Object successfully deleted'}}
         self._send_to_client(result)
+
+
+def _append_jsonapi_member(document):
+    """Appends the jsonapi member to an encoded JSON object.
+
+    The document is only sliced through a memoryview, so that the
+    join is the only copy of its bytes.
+
+    Parameters
+    ----------
+    document: bytes-like
+        The encoded JSON object, without a jsonapi member.
+
+    Returns
+    -------
+    bytes: the encoded object with the jsonapi member.
+    """
+    view = memoryview(document)
+    close = _skip_whitespace_backwards(view, len(view)) - 1
+    if close < 0 or view[close] != _CLOSE_OBJECT:
+        raise ValueError("document is not an encoded JSON object")
+
+    last = _skip_whitespace_backwards(view, close) - 1
+    separator = b"" if last >= 0 and view[last] == _OPEN_OBJECT else b","
+    return b"".join((view[:close], separator, _JSONAPI_MEMBER, b"}"))
+
+
+def _skip_whitespace_backwards(view, end):
+    """Returns the position following the last non whitespace byte
+    of view before end."""
+    while end > 0 and view[end - 1] in _WHITESPACE:
+        end -= 1
+
+    return end
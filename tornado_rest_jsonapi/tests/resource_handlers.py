@@ -1,21 +1,24 @@
+import itertools
+import json
 from collections import OrderedDict
 
 from marshmallow_jsonapi import Schema, fields
-from tornado import gen
 
 from tornado_rest_jsonapi import exceptions
 from tornado_rest_jsonapi.data_layers.base import BaseDataLayer
-from tornado_rest_jsonapi.resource import ResourceDetails, ResourceList
+from tornado_rest_jsonapi.representations import Representation
+from tornado_rest_jsonapi.resource import (
+    ResourceDetails, ResourceList, StreamingResourceList)
 
 
 class WorkingDataLayer(BaseDataLayer):
     """Base class for tests. Still missing the resource_class
-    that must be set in the derived class."""
+    that must be set in the derived class. Being in memory, its
+    operations return their results synchronously."""
 
     collection = OrderedDict()
     id = 0
 
-    @gen.coroutine
     def create_object(self, data, view_kwargs):
         id = str(type(self).id)
         data["id"] = id
@@ -23,7 +26,6 @@ class WorkingDataLayer(BaseDataLayer):
         type(self).id += 1
         return data
 
-    @gen.coroutine
     def get_object(self, kwargs):
         identifier = kwargs.get("id")
         if identifier not in self.collection:
@@ -31,12 +33,10 @@ class WorkingDataLayer(BaseDataLayer):
 
         return self.collection[identifier]
 
-    @gen.coroutine
     def update_object(self, obj, data, view_kwargs):
         obj.update(data)
         return True
 
-    @gen.coroutine
     def delete_object(self, obj, view_kwargs):
         identifier = view_kwargs.get("id")
 
@@ -45,7 +45,6 @@ class WorkingDataLayer(BaseDataLayer):
 
         del self.collection[identifier]
 
-    @gen.coroutine
     def get_collection(self, qs, view_kwargs):
         pagination = qs.pagination
 
@@ -62,6 +61,17 @@ class WorkingDataLayer(BaseDataLayer):
         values = [x for x in self.collection.values()][interval]
         return len(self.collection.values()), values
 
+    def get_collection_batch(self, qs, cursor, size, view_kwargs):
+        # The cursor iterates over a snapshot of the collection
+        if cursor is None:
+            cursor = iter(list(self.collection.values()))
+
+        items = list(itertools.islice(cursor, size))
+        if len(items) < size:
+            return items, None
+
+        return items, cursor
+
 
 class StudentSchema(Schema):
     class Meta:
@@ -89,6 +99,13 @@ class StudentList(ResourceList):
     }
 
 
+class StreamingStudentList(StreamingResourceList):
+    schema = StudentSchema
+    data_layer = {
+        "class": WorkingDataLayer,
+    }
+
+
 # class Teacher(Schema):
 #     name = fields.String()
 #     age = fields.Int(required=False)
@@ -298,3 +315,15 @@ class StudentList(ResourceList):
 # class FrobnicatorDetails(ResourceDetails):
 #     schema = Frobnicator
 #     model_connector = FrobnicatorModelConn
+
+
+class SortedJsonRepresentation(Representation):
+    """Encodes the documents in JSON with sorted keys, to test the
+    negotiation of the representations."""
+    media_type = "application/x-sorted+json"
+
+    def encode(self, document):
+        return json.dumps(document, sort_keys=True).encode("utf-8")
+
+    def decode(self, data):
+        return json.loads(data.decode("utf-8"))
@@ -0,0 +1,109 @@
+import math
+import unittest
+from unittest import mock
+
+from tornado_rest_jsonapi import exceptions
+from tornado_rest_jsonapi.admission import (
+    AdmissionController, TokenBucket, estimate_cost)
+from tornado_rest_jsonapi.representations import Representations
+from tornado_rest_jsonapi.tests import resource_handlers
+
+
+def _handler(cls=resource_handlers.StudentList, method="GET", user=None,
+             accept="*/*", **query):
+    handler = cls.__new__(cls)
+    handler.request = mock.Mock(method=method, remote_ip="127.0.0.1",
+                                headers={"Accept": accept})
+    handler.current_user = user
+    handler._registry = mock.Mock(representations=Representations())
+    handler.get_query_argument = \
+        lambda name, default=None: query.get(name, default)
+    return handler
+
+
+class TestTokenBucket(unittest.TestCase):
+    @mock.patch("time.monotonic")
+    def test_consume(self, monotonic):
+        monotonic.return_value = 100.0
+        bucket = TokenBucket(rate=2.0, burst=4.0)
+        self.assertEqual(bucket.consume(3), 0.0)
+        self.assertEqual(bucket.consume(3), 1.0)
+
+        monotonic.return_value = 101.0
+        self.assertEqual(bucket.consume(3), 0.0)
+
+        monotonic.return_value = 1000.0
+        self.assertEqual(bucket.tokens, 0.0)
+        self.assertEqual(bucket.consume(4), 0.0)
+
+
+class TestAdmissionController(unittest.TestCase):
+    def test_estimate_cost(self):
+        self.assertEqual(estimate_cost(_handler()), 1.0)
+        self.assertEqual(estimate_cost(_handler(method="POST")), 1.0)
+        self.assertEqual(estimate_cost(_handler(include="a.b,c")), 4.0)
+        self.assertEqual(estimate_cost(_handler(**{"page[size]": "100"})),
+                         5.0)
+        self.assertEqual(estimate_cost(_handler(**{"page[size]": "x"})),
+                         1.0)
+        self.assertEqual(estimate_cost(_handler(**{"page[size]": "0"})),
+                         math.inf)
+        self.assertEqual(
+            estimate_cost(_handler(accept="application/x-ndjson")),
+            math.inf)
+        self.assertEqual(
+            estimate_cost(_handler(resource_handlers.StudentDetails,
+                                   include="a", **{"page[size]": "100"})),
+            2.0)
+
+    def test_rate(self):
+        controller = AdmissionController(rate=0.001, burst=3)
+        controller.admit(_handler()).release()
+        controller.admit(_handler(user="jane", include="a,b"))
+
+        # The cost is limited to the burst, and then uses all of it
+        controller.admit(_handler(user="joe", include="a,b,c,d"))
+        with self.assertRaises(exceptions.TooManyRequests) as cm:
+            controller.admit(_handler(user="joe"))
+        self.assertGreater(cm.exception.retry_after, 900)
+
+        # As do whole collections
+        controller.admit(_handler(user="bob", **{"page[size]": "0"}))
+        with self.assertRaises(exceptions.TooManyRequests):
+            controller.admit(_handler(user="bob"))
+
+        controller.admit(_handler())
+        with self.assertRaises(exceptions.TooManyRequests):
+            controller.admit(_handler(user="jane"))
+
+    def test_invalid_rate(self):
+        for kwargs in ({"rate": 0}, {"rate": 0, "burst": 5},
+                       {"rate": 1, "burst": 0}, {"rate": -1}):
+            with self.assertRaises(ValueError):
+                AdmissionController(**kwargs)
+
+    def test_max_clients(self):
+        controller = AdmissionController(rate=0.001, burst=1, max_clients=2)
+        controller.admit(_handler(user=1))
+        controller.admit(_handler(user=2))
+        controller.admit(_handler(user=3))
+        controller.admit(_handler(user=1))
+        self.assertEqual(len(controller._buckets), 2)
+
+    def test_max_in_flight(self):
+        controller = AdmissionController(max_in_flight=2)
+        tickets = [controller.admit(_handler()) for i in range(2)]
+        with self.assertRaises(exceptions.ServiceUnavailable):
+            controller.admit(_handler())
+
+        controller.admit(_handler(resource_handlers.StudentDetails))
+
+        tickets[0].release()
+        tickets[0].release()
+        self.assertEqual(controller.in_flight(resource_handlers.StudentList),
+                         1)
+        controller.admit(_handler())
+
+        with mock.patch.object(resource_handlers.StudentList,
+                               "max_in_flight", 3):
+            controller.admit(_handler())
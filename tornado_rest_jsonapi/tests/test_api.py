@@ -2,7 +2,13 @@ import unittest
 
 from unittest.mock import Mock
 
+from tornado import gen
+from tornado.testing import AsyncTestCase, gen_test
+
 from tornado_rest_jsonapi.api import Api
+from tornado_rest_jsonapi.data_layers.base import BaseDataLayer
+from tornado_rest_jsonapi.pool import Pool
+from tornado_rest_jsonapi.resource import ResourceDetails, ResourceList
 from tornado_rest_jsonapi.tests.resource_handlers import StudentDetails
 
 
@@ -64,3 +70,82 @@ class TestApi(unittest.TestCase):
         app = Mock()
         Api(app)
         self.assertFalse(app.wildcard_router.add_routes.called)
+
+
+class TestApiLifecycle(AsyncTestCase):
+    @gen_test
+    def test_startup_shutdown(self):
+        events = []
+
+        class RecordingDataLayer(BaseDataLayer):
+            @classmethod
+            @gen.coroutine
+            def startup(cls, api, options):
+                events.append(("startup", options["name"]))
+
+            @classmethod
+            def shutdown(cls, api, options):
+                events.append(("shutdown", options["name"]))
+
+        class FooList(ResourceList):
+            data_layer = {"class": RecordingDataLayer, "name": "foo"}
+
+        class FooDetails(ResourceDetails):
+            data_layer = FooList.data_layer
+
+        class BarList(ResourceList):
+            data_layer = {"class": RecordingDataLayer, "name": "bar"}
+
+        @gen.coroutine
+        def async_hook(api):
+            events.append("async_hook")
+
+        async def native_hook(api):
+            events.append("native_hook")
+
+        api = Api(Mock())
+        api.route(FooList, "foos", "/foos/")
+        api.route(FooDetails, "foo", "/foos/(.*)/")
+        api.route(BarList, "bars", "/bars/")
+        api.add_startup_hook(lambda api: events.append("hook"))
+        api.add_startup_hook(async_hook)
+        api.add_shutdown_hook(lambda api: events.append("hook"))
+        api.add_shutdown_hook(native_hook)
+
+        yield api.startup()
+        self.assertEqual(events, [("startup", "foo"),
+                                  ("startup", "bar"),
+                                  "hook",
+                                  "async_hook"])
+
+        del events[:]
+        yield api.shutdown()
+        self.assertEqual(events, ["native_hook",
+                                  "hook",
+                                  ("shutdown", "bar"),
+                                  ("shutdown", "foo")])
+
+    @gen_test
+    def test_pools(self):
+        closed = []
+
+        class PooledDataLayer(BaseDataLayer):
+            @classmethod
+            def startup(cls, api, options):
+                api.pools.add("db", Pool(lambda: "connection",
+                                         disconnect=closed.append))
+
+        class FooList(ResourceList):
+            data_layer = {"class": PooledDataLayer}
+
+        api = Api(Mock())
+        api.route(FooList, "foos", "/foos/")
+        yield api.startup()
+
+        pool = api.pools["db"]
+        connection = yield pool.acquire()
+        pool.release(connection)
+
+        yield api.shutdown()
+        self.assertTrue(pool.closed)
+        self.assertEqual(closed, ["connection"])
@@ -0,0 +1,255 @@
+import unittest
+from unittest import mock
+
+from tornado import gen
+from tornado.concurrent import Future
+from tornado.testing import AsyncTestCase, gen_test
+
+from tornado_rest_jsonapi.data_layers.base import BaseDataLayer
+from tornado_rest_jsonapi.data_layers.cache import (
+    CachingDataLayer, ObjectCache, estimate_size, shared_scope)
+from tornado_rest_jsonapi.querystring import QueryStringManager
+
+
+class TestObjectCache(unittest.TestCase):
+    def test_lru(self):
+        cache = ObjectCache(max_entries=2)
+        cache.put("a", 1)
+        cache.put("b", 2)
+        self.assertEqual(cache.get("a"), 1)
+        cache.put("c", 3)
+
+        self.assertIsNone(cache.get("b"))
+        self.assertEqual(cache.get("a"), 1)
+        self.assertEqual(cache.get("c"), 3)
+        self.assertEqual(len(cache), 2)
+        self.assertEqual((cache.hits, cache.misses, cache.evictions),
+                         (3, 1, 1))
+
+    def test_ttl(self):
+        cache = ObjectCache(ttl=10)
+        with mock.patch("time.monotonic", return_value=100):
+            cache.put("a", 1)
+        with mock.patch("time.monotonic", return_value=109):
+            self.assertEqual(cache.get("a"), 1)
+        with mock.patch("time.monotonic", return_value=110):
+            self.assertEqual(cache.get("a", "missing"), "missing")
+        self.assertEqual(len(cache), 0)
+
+    def test_memory_budget(self):
+        cache = ObjectCache(max_bytes=100, sizeof=len)
+        cache.put("a", "x" * 60)
+        cache.put("b", "x" * 30)
+        self.assertEqual(cache.size, 90)
+
+        cache.put("c", "x" * 30)
+        self.assertIsNone(cache.get("a"))
+        self.assertEqual(cache.size, 60)
+
+        # Values larger than the budget are not cached
+        cache.put("d", "x" * 101)
+        self.assertIsNone(cache.get("d"))
+        self.assertEqual(cache.size, 60)
+
+    def test_groups(self):
+        cache = ObjectCache()
+        bus = mock.Mock()
+        cache.attach(bus)
+        cache.put("a", 1, [("students", "collection")])
+        cache.put("b", 2, [("students", "collection"), "b"])
+        cache.put("c", 3)
+
+        cache.invalidate_group(("students", "collection"))
+        self.assertEqual(len(cache), 1)
+        bus.publish.assert_called_once_with({
+            "object_cache": "default",
+            "group": ("students", "collection")})
+
+        # Messages from the other workers
+        cache.put("a", 1, [("students", "collection")])
+        on_message = bus.subscribe.call_args[0][0]
+        on_message({"object_cache": "other",
+                    "group": ["students", "collection"]})
+        self.assertEqual(cache.get("a"), 1)
+        on_message({"object_cache": "default",
+                    "group": ["students", "collection"]})
+        self.assertIsNone(cache.get("a"))
+
+        cache.detach()
+        bus.unsubscribe.assert_called_once_with(on_message)
+
+    def test_fill(self):
+        cache = ObjectCache()
+        fill = cache.start_fill([("students", "collection")])
+        other = cache.start_fill(["1"])
+        cache.invalidate_group(("students", "collection"))
+        self.assertFalse(cache.end_fill(fill))
+        self.assertTrue(cache.end_fill(other))
+        self.assertEqual(cache._fills, {})
+
+    def test_estimate_size(self):
+        small = estimate_size({"name": "x"})
+        large = estimate_size({"name": "x" * 1000})
+        self.assertGreater(large - small, 900)
+
+
+class CountingDataLayer(BaseDataLayer):
+    objects = {}
+    calls = []
+
+    def get_object(self, view_kwargs):
+        self.calls.append(("get_object", self.current_user))
+        return self.objects[view_kwargs["id"]]
+
+    async def get_collection(self, qs, view_kwargs):
+        self.calls.append(("get_collection", self.current_user))
+        return len(self.objects), list(self.objects.values())
+
+    def update_object(self, obj, data, view_kwargs):
+        self.objects[view_kwargs["id"]] = data
+        return True
+
+
+class TestCachingDataLayer(AsyncTestCase):
+    def setUp(self):
+        super().setUp()
+        CountingDataLayer.objects = {"1": "one", "2": "two"}
+        CountingDataLayer.calls = []
+        self.options = {
+            "class": CachingDataLayer,
+            "wrapped": {"class": CountingDataLayer},
+            "cache": ObjectCache(),
+        }
+
+    def _data_layer(self, current_user=None, read_only=True, **options):
+        options.update(self.options)
+        options.update(application=mock.Mock(), current_user=current_user,
+                       read_only=read_only)
+        return CachingDataLayer(options)
+
+    @gen_test
+    def test_get_object(self):
+        data_layer = self._data_layer()
+        obj = yield data_layer.get_object({"id": "1"})
+        self.assertEqual(obj, "one")
+
+        # Hits are returned directly
+        self.assertEqual(data_layer.get_object({"id": "1"}), "one")
+        self.assertEqual(len(CountingDataLayer.calls), 1)
+
+        yield data_layer.update_object("one", "uno", {"id": "1"})
+        obj = yield data_layer.get_object({"id": "1"})
+        self.assertEqual(obj, "uno")
+        self.assertEqual(len(CountingDataLayer.calls), 2)
+
+    @gen_test
+    def test_writes_bypass_cache(self):
+        yield self._data_layer().get_object({"id": "1"})
+
+        data_layer = self._data_layer(read_only=False)
+        obj = yield data_layer.get_object({"id": "1"})
+        self.assertEqual(obj, "one")
+        self.assertEqual(len(CountingDataLayer.calls), 2)
+        self.assertEqual(self.options["cache"].hits, 0)
+
+    @gen_test
+    def test_stale_fill(self):
+        gate = Future()
+
+        class SlowDataLayer(CountingDataLayer):
+            async def get_collection(self, qs, view_kwargs):
+                result = len(self.objects), list(self.objects.values())
+                await gate
+                return result
+
+        self.options["wrapped"] = {"class": SlowDataLayer}
+        qs = QueryStringManager({}, mock.Mock())
+        lookup = gen.convert_yielded(
+            self._data_layer().get_collection(qs, {}))
+        yield gen.sleep(0)
+
+        # The update completes while the lookup is in progress
+        yield self._data_layer(read_only=False).update_object(
+            "two", "dos", {"id": "2"})
+        gate.set_result(None)
+        result = yield lookup
+        self.assertEqual(result, (2, ["one", "two"]))
+
+        # The stale result was not cached
+        self.assertEqual(len(self.options["cache"]), 0)
+        self.assertEqual(self.options["cache"]._fills, {})
+
+    @gen_test
+    def test_get_collection(self):
+        qs = QueryStringManager({"page[size]": [b"2"]}, mock.Mock())
+        data_layer = self._data_layer()
+        result = yield data_layer.get_collection(qs, {})
+        self.assertEqual(result, (2, ["one", "two"]))
+        self.assertEqual(data_layer.get_collection(qs, {}), result)
+
+        other_qs = QueryStringManager({"page[size]": [b"1"]}, mock.Mock())
+        yield data_layer.get_collection(other_qs, {})
+        self.assertEqual(len(CountingDataLayer.calls), 2)
+
+        # Updating an object invalidates the collections
+        yield data_layer.update_object("two", "dos", {"id": "2"})
+        result = yield data_layer.get_collection(qs, {})
+        self.assertEqual(result, (2, ["one", "dos"]))
+
+    @gen_test
+    def test_scope(self):
+        yield self._data_layer("alice").get_object({"id": "1"})
+        yield self._data_layer("bob").get_object({"id": "1"})
+        self.assertEqual(CountingDataLayer.calls,
+                         [("get_object", "alice"), ("get_object", "bob")])
+
+        self.options["scope"] = shared_scope
+        yield self._data_layer("alice").get_object({"id": "2"})
+        self.assertEqual(self._data_layer("bob").get_object({"id": "2"}),
+                         "two")
+        self.assertEqual(len(CountingDataLayer.calls), 3)
+
+    @gen_test
+    def test_unhashable_scope(self):
+        for _ in range(2):
+            obj = yield self._data_layer({"name": "alice"}).get_object(
+                {"id": "1"})
+            self.assertEqual(obj, "one")
+        self.assertEqual(len(CountingDataLayer.calls), 2)
+        self.assertEqual(len(self.options["cache"]), 0)
+
+    @gen_test
+    def test_consistency_token(self):
+        class TokenDataLayer(CountingDataLayer):
+            def update_object(self, obj, data, view_kwargs):
+                self.consistency_token = "42"
+                return super().update_object(obj, data, view_kwargs)
+
+        self.options["wrapped"] = {"class": TokenDataLayer}
+        data_layer = self._data_layer(read_only=False)
+        yield data_layer.update_object("one", "uno", {"id": "1"})
+        self.assertEqual(data_layer.consistency_token, "42")
+
+    @gen_test
+    def test_lifecycle(self):
+        api = mock.Mock()
+        yield CachingDataLayer.startup(api, self.options)
+        api.invalidation_bus.subscribe.assert_called_once_with(
+            self.options["cache"]._on_message)
+
+        yield CachingDataLayer.shutdown(api, self.options)
+        api.invalidation_bus.unsubscribe.assert_called_once_with(
+            self.options["cache"]._on_message)
+
+    @gen_test
+    def test_lifecycle_class_options(self):
+        class StudentsCachingDataLayer(CachingDataLayer):
+            wrapped = {"class": CountingDataLayer}
+            cache = ObjectCache()
+
+        api = mock.Mock()
+        options = {"class": StudentsCachingDataLayer}
+        yield StudentsCachingDataLayer.startup(api, options)
+        yield StudentsCachingDataLayer.shutdown(api, options)
+        api.invalidation_bus.unsubscribe.assert_called_once_with(
+            StudentsCachingDataLayer.cache._on_message)
@@ -0,0 +1,116 @@
+from tornado.log import app_log
+from tornado.testing import AsyncTestCase, ExpectLog, gen_test
+
+from tornado_rest_jsonapi.changefeed import ChangeFeed
+
+
+def _student(id):
+    return {"type": "student", "id": id, "attributes": {"name": "Bob"}}
+
+
+class TestChangeFeed(AsyncTestCase):
+    @gen_test
+    def test_publish(self):
+        feed = ChangeFeed()
+        subscription = feed.subscribe()
+        self.assertEqual(feed.subscribers, 1)
+
+        event = feed.publish("created", _student("1"))
+        self.assertEqual(event.id, 1)
+        self.assertEqual(
+            event.encoded,
+            b'id: 1\nevent: created\ndata: {"type":"student","id":"1"}\n\n')
+
+        events = yield subscription.get()
+        self.assertEqual(events, [event])
+
+        events = yield subscription.get(timeout=0.01)
+        self.assertEqual(events, [])
+
+        subscription.close()
+        self.assertEqual(feed.subscribers, 0)
+        events = yield subscription.get()
+        self.assertIsNone(events)
+
+    def test_attributes(self):
+        with self.assertRaises(ValueError):
+            ChangeFeed(attributes=True)
+
+        feed = ChangeFeed(attributes=True, authorize=lambda user, event: True)
+        event = feed.publish("updated", _student("1"))
+        self.assertIn(b'"attributes":{"name":"Bob"}', event.encoded)
+
+    @gen_test
+    def test_authorize(self):
+        def authorize(user, event):
+            if user == "broken":
+                raise RuntimeError()
+            return event.data["id"] == user
+
+        feed = ChangeFeed(capacity=2, authorize=authorize)
+        feed.publish("created", _student("1"))
+        feed.publish("created", _student("2"))
+
+        subscription = feed.subscribe(last_event_id=0, user="2")
+        feed.publish("updated", _student("1"))
+        feed.publish("updated", _student("2"))
+        events = yield subscription.get()
+        self.assertEqual([event.id for event in events], [2, 4])
+
+        # Reset events are always delivered
+        events = yield feed.subscribe(last_event_id=0, user="1").get()
+        self.assertEqual([event.name for event in events], ["reset"])
+
+        broken = feed.subscribe(user="broken")
+        with ExpectLog(app_log, "Change feed authorization failed"):
+            feed.publish("updated", _student("1"))
+        events = yield broken.get(timeout=0.01)
+        self.assertEqual(events, [])
+
+    @gen_test
+    def test_resume(self):
+        feed = ChangeFeed(capacity=3)
+        for id in range(5):
+            feed.publish("created", _student(str(id)))
+        self.assertEqual(feed.last_id, 5)
+
+        self.assertEqual([event.id for event in feed.events_since(2)],
+                         [3, 4, 5])
+        self.assertEqual(feed.events_since(5), [])
+        self.assertIsNone(feed.events_since(1))
+        self.assertIsNone(feed.events_since(6))
+
+        events = yield feed.subscribe(3).get()
+        self.assertEqual([event.id for event in events], [4, 5])
+
+        events = yield feed.subscribe(1).get()
+        self.assertEqual([event.name for event in events], ["reset"])
+        self.assertEqual(events[0].id, 5)
+
+    @gen_test
+    def test_slow_subscriber_dropped(self):
+        feed = ChangeFeed(max_queue=2)
+        slow = feed.subscribe()
+        fast = feed.subscribe()
+
+        for id in range(3):
+            feed.publish("created", _student(str(id)))
+            events = yield fast.get()
+            self.assertEqual(len(events), 1)
+
+        self.assertTrue(slow.dropped)
+        self.assertFalse(fast.dropped)
+        self.assertEqual(feed.dropped, 1)
+        self.assertEqual(feed.subscribers, 1)
+        events = yield slow.get()
+        self.assertIsNone(events)
+
+    @gen_test
+    def test_close(self):
+        feed = ChangeFeed()
+        subscription = feed.subscribe()
+        future = subscription.get()
+        feed.close()
+        events = yield future
+        self.assertIsNone(events)
+        self.assertFalse(subscription.dropped)
@@ -0,0 +1,82 @@
+import unittest
+
+from tornado_rest_jsonapi import exceptions
+from tornado_rest_jsonapi.data_layers.changelog import ChangeLog
+
+
+class TestChangeLog(unittest.TestCase):
+    def test_changes(self):
+        log = ChangeLog()
+        log.record("1")
+        log.record("2")
+        token = log.token
+
+        self.assertEqual(log.changes(""), (["1", "2"], [], token, False))
+        self.assertEqual(log.changes(token), ([], [], token, False))
+
+        log.record("1")
+        log.record("2", deleted=True)
+        log.record("3")
+        log.record("3", deleted=True)
+        self.assertEqual(log.changes(token),
+                         (["1"], ["2", "3"], log.token, False))
+        self.assertEqual(log.changes(""), (["1"], [], log.token, False))
+
+    def test_limit(self):
+        log = ChangeLog()
+        for identifier in "abcde":
+            log.record(identifier)
+        log.record("b", deleted=True)
+
+        updated, deleted, token, more = log.changes("", limit=2)
+        self.assertEqual((updated, deleted, more), (["a", "c"], [], True))
+
+        # A change during the synchronization moves the object forward
+        log.record("a")
+        updated, deleted, token, more = log.changes(token, limit=2)
+        self.assertEqual((updated, deleted, more), (["d", "e"], [], True))
+
+        # The tombstone of b follows e, even if the client never saw b
+        updated, deleted, token, more = log.changes(token, limit=2)
+        self.assertEqual((updated, deleted, token, more),
+                         (["a"], ["b"], log.token, False))
+
+    def test_tokens(self):
+        log = ChangeLog(max_tombstones=1)
+        log.record("1")
+        token = log.token
+        log.record("1", deleted=True)
+        log.record("2")
+        log.record("2", deleted=True)
+
+        with self.assertRaises(exceptions.SyncTokenExpired):
+            log.changes(token)
+
+        self.assertEqual(log.changes(log.token), ([], [], log.token, False))
+
+        with self.assertRaises(exceptions.SyncTokenExpired):
+            ChangeLog().changes(log.token)
+
+        with self.assertRaises(exceptions.InvalidSince):
+            log.changes("foo")
+
+    def test_paging(self):
+        log = ChangeLog()
+        for identifier in range(100):
+            log.record(str(identifier))
+        for identifier in range(0, 100, 2):
+            log.record(str(identifier))
+
+        # Superseded changes are compacted away
+        self.assertLessEqual(len(log._seqs), 200)
+        for _ in range(500):
+            log.record("0")
+        self.assertLessEqual(len(log._seqs), 202)
+
+        token, more, updated = "", True, []
+        while more:
+            page, _, token, more = log.changes(token, limit=7)
+            updated.extend(page)
+        self.assertEqual(sorted(updated, key=int),
+                         [str(identifier) for identifier in range(100)])
+        self.assertEqual(updated[-1], "0")
@@ -0,0 +1,59 @@
+from tornado import gen
+from tornado.testing import AsyncTestCase, gen_test
+
+from tornado_rest_jsonapi.coalescing import SingleFlight
+
+
+class TestSingleFlight(AsyncTestCase):
+    @gen_test
+    def test_run(self):
+        single_flight = SingleFlight()
+        calls = []
+
+        @gen.coroutine
+        def compute(value):
+            calls.append(value)
+            yield gen.sleep(0.01)
+            return value
+
+        results = yield [single_flight.run("a", compute, 1),
+                         single_flight.run("a", compute, 2),
+                         single_flight.run("b", compute, 3)]
+        self.assertEqual(results, [1, 1, 3])
+        self.assertEqual(calls, [1, 3])
+        self.assertEqual(single_flight.started, 2)
+        self.assertEqual(single_flight.shared, 1)
+        self.assertEqual(single_flight.in_progress, 0)
+
+        # Completed computations are not reused
+        result = yield single_flight.run("a", compute, 4)
+        self.assertEqual(result, 4)
+
+    @gen_test
+    def test_exception(self):
+        single_flight = SingleFlight()
+
+        @gen.coroutine
+        def fail():
+            yield gen.sleep(0.01)
+            raise ValueError("failed")
+
+        futures = [single_flight.run("a", fail) for i in range(2)]
+        for future in futures:
+            with self.assertRaises(ValueError):
+                yield future
+
+        self.assertEqual(single_flight.started, 1)
+        self.assertEqual(single_flight.in_progress, 0)
+
+    @gen_test
+    def test_synchronous(self):
+        single_flight = SingleFlight()
+
+        @gen.coroutine
+        def compute():
+            return 1
+
+        result = yield single_flight.run("a", compute)
+        self.assertEqual(result, 1)
+        self.assertEqual(single_flight.in_progress, 0)
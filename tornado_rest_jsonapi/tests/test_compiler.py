@@ -0,0 +1,217 @@
+import copy
+import unittest
+from unittest import mock
+
+from marshmallow import ValidationError, pre_dump, validates
+from marshmallow_jsonapi import Schema, fields
+from marshmallow_jsonapi.exceptions import IncorrectTypeError
+
+from tornado_rest_jsonapi import compiler, exceptions
+from tornado_rest_jsonapi.errors import errors_from_jsonapi_errors
+from tornado_rest_jsonapi.schema import compute_schema
+
+
+class TeacherSchema(Schema):
+    class Meta:
+        type_ = "teacher"
+        self_url = '/teachers/{id}/'
+        self_url_kwargs = {'id': '<id>'}
+
+    id = fields.Str()
+    name = fields.String()
+
+
+class StudentSchema(Schema):
+    class Meta:
+        type_ = "student"
+        inflect = staticmethod(lambda name: name.replace("_", "-"))
+        self_url = '/students/{id}/'
+        self_url_kwargs = {'id': '<id>'}
+        self_url_many = '/students/'
+
+    id = fields.Int()
+    name = fields.String(required=True)
+    age = fields.Int()
+    score = fields.Float()
+    active = fields.Boolean()
+    extra = fields.Raw()
+    full_name = fields.String(attribute="name")
+    secret = fields.String(load_only=True)
+    nickname = fields.String(dump_to="nick")
+    joined = fields.DateTime()
+    tutor = fields.Relationship(
+        related_url='/teachers/{teacher_id}/',
+        related_url_kwargs={'teacher_id': '<tutor.id>'},
+        include_resource_linkage=True,
+        type_='teacher',
+        schema='TeacherSchema')
+
+
+class DecoratedSchema(Schema):
+    class Meta:
+        type_ = "decorated"
+
+    id = fields.Int()
+
+    @pre_dump
+    def decorate(self, obj):
+        return {"id": obj["id"] + 1}
+
+
+class StrictStudentSchema(StudentSchema):
+    class Meta(StudentSchema.Meta):
+        strict = True
+
+
+class ValidatedSchema(Schema):
+    class Meta:
+        type_ = "validated"
+
+    id = fields.Int()
+
+    @validates("id")
+    def validate_id(self, value):
+        if value < 0:
+            raise ValidationError("Negative")
+
+
+class Student:
+    def __init__(self, **kwargs):
+        self.__dict__.update(kwargs)
+
+
+def _student(id, **kwargs):
+    values = dict(id=id, name="john {}".format(id), age="12", score=3.5,
+                  active=True, extra=[1, 2], secret="s", nickname="jo",
+                  tutor={"id": "7", "name": "jane"})
+    values.update(kwargs)
+    return values
+
+
+class TestCompiler(unittest.TestCase):
+    def setUp(self):
+        self.qs = mock.Mock(fields={})
+
+    def assertSameDump(self, schema_cls, kwargs, obj, include=None):
+        schema = compute_schema(schema_cls, dict(kwargs), self.qs, include)
+        expected = schema.dump(obj).data
+        schema = compute_schema(schema_cls, dict(kwargs), self.qs, include)
+        dumper = compiler.compile_dumper(schema)
+        self.assertIsNotNone(dumper)
+        self.assertEqual(dumper(schema, obj), expected)
+
+    def test_same_as_marshmallow(self):
+        items = [_student(1), _student(2, age=None, name=5), {"id": 3}]
+        self.assertSameDump(StudentSchema, {"many": True}, items)
+        self.assertSameDump(StudentSchema, {"many": True}, [])
+        self.assertSameDump(StudentSchema, {}, items[0])
+        self.assertSameDump(StudentSchema, {}, {})
+        self.assertSameDump(StudentSchema, {}, Student(**items[0]))
+        self.assertSameDump(StudentSchema, {"only": ("name", )}, items[0])
+        self.assertSameDump(StudentSchema, {}, items[0], include=["tutor"])
+
+    def test_compile_cache(self):
+        schema = compute_schema(StudentSchema, {}, self.qs, None)
+        dumper = compiler.compile_dumper(schema)
+        self.assertIsNotNone(dumper)
+
+        other = compute_schema(StudentSchema, {"many": True}, self.qs, None)
+        self.assertIs(compiler.compile_dumper(other), dumper)
+
+        other = compute_schema(StudentSchema, {}, self.qs, ["tutor"])
+        self.assertIsNot(compiler.compile_dumper(other), dumper)
+
+    def test_fallback(self):
+        schema = DecoratedSchema()
+        self.assertIsNone(compiler.compile_dumper(schema))
+        self.assertEqual(compiler.dump(schema, {"id": 1}),
+                         schema.dump({"id": 1}).data)
+
+        # Invalid values are reported by marshmallow
+        schema = StudentSchema()
+        with self.assertLogs("tornado.application", "WARNING"):
+            self.assertEqual(compiler.dump(schema, _student(1, age="x")),
+                             schema.dump(_student(1, age="x")).data)
+
+        # As are the objects missing an attribute of their self link
+        schema = TeacherSchema()
+        with self.assertLogs("tornado.application", "WARNING"), \
+                self.assertRaises(AttributeError):
+            compiler.dump(schema, {"name": "Bob"})
+
+    def test_errors(self):
+        schema = StudentSchema()
+        with mock.patch.object(
+                schema.fields["joined"], "serialize",
+                side_effect=ZeroDivisionError()), \
+                self.assertRaises(ZeroDivisionError):
+            compiler.dump(schema, _student(1))
+
+
+def _document(type_="student", **attributes):
+    return {"data": {"type": type_, "attributes": attributes}}
+
+
+class TestLoadCompiler(unittest.TestCase):
+    def resource_load(self, load, schema, json_data):
+        """Loads with the given function, handling the errors as the
+        resources do."""
+        try:
+            data, errors = load(schema, json_data)
+        except IncorrectTypeError as e:
+            raise exceptions.InvalidType(
+                errors_from_jsonapi_errors(e.messages))
+        except ValidationError as e:
+            for message in e.messages["errors"]:
+                message["status"] = "422"
+                message["title"] = "Validation error"
+            raise exceptions.ValidationError(
+                errors_from_jsonapi_errors(e.messages))
+
+        if errors:
+            raise exceptions.BadRequest(errors_from_jsonapi_errors(errors))
+
+        return data
+
+    def assertSameLoad(self, schema_cls, json_data, **kwargs):
+        def load(schema, json_data):
+            return schema.load(json_data)
+
+        try:
+            expected = self.resource_load(
+                load, schema_cls(**kwargs), copy.deepcopy(json_data))
+        except exceptions.JsonApiException as e:
+            with self.assertRaises(type(e)) as cm:
+                self.resource_load(
+                    compiler.load, schema_cls(**kwargs), json_data)
+            self.assertEqual(cm.exception.to_jsonapi(), e.to_jsonapi())
+        else:
+            self.assertEqual(
+                self.resource_load(
+                    compiler.load, schema_cls(**kwargs), json_data),
+                expected)
+
+    def test_same_as_marshmallow(self):
+        self.assertIsNotNone(compiler.compile_loader(StudentSchema()))
+
+        for schema_cls in (StudentSchema, StrictStudentSchema):
+            for json_data in [
+                    _document(name="john", age=12, score=1.5, active=False,
+                              extra={"a": 1}, nickname="jo"),
+                    _document(name="john", age="12", score=1, active="yes"),
+                    _document(name=None, age="twelve", score="x"),
+                    _document(age=12),
+                    _document(),
+                    {"data": {"type": "student", "id": "3",
+                              "attributes": {"name": "john"}}}]:
+                self.assertSameLoad(schema_cls, json_data)
+                self.assertSameLoad(schema_cls, json_data, partial=True)
+
+    def test_fallback(self):
+        self.assertIsNone(compiler.compile_loader(ValidatedSchema()))
+        self.assertSameLoad(ValidatedSchema,
+                            {"data": {"type": "validated", "id": -1}})
+
+        # Errors in the document structure are reported by marshmallow
+        for json_data in [{}, {"data": {}}, _document(type_="teacher")]:
+            self.assertSameLoad(StudentSchema, json_data)
@@ -0,0 +1,100 @@
+import gzip
+import unittest
+import zlib
+
+from tornado_rest_jsonapi import exceptions
+from tornado_rest_jsonapi.compression import (
+    Decompressor, ResponseBody, ResponseCompression, compress, decompress,
+    parse_accept_encoding)
+
+
+class TestCompress(unittest.TestCase):
+    def test_roundtrip(self):
+        data = b'{"data": []}' * 100
+        self.assertEqual(gzip.decompress(compress(data, "gzip")), data)
+        self.assertEqual(zlib.decompress(compress(data, "deflate")), data)
+
+    def test_parse_accept_encoding(self):
+        self.assertEqual(
+            parse_accept_encoding("gzip, deflate;q=0.5, br;q=bad"),
+            {"gzip": 1.0, "deflate": 0.5, "br": 0.0})
+        self.assertEqual(parse_accept_encoding(""), {})
+
+
+class TestDecompress(unittest.TestCase):
+    def test_roundtrip(self):
+        data = b'{"data": []}' * 100
+        self.assertEqual(decompress(gzip.compress(data), "gzip"), data)
+        self.assertEqual(decompress(zlib.compress(data), " Deflate"), data)
+
+    def test_size_limit(self):
+        data = b"x" * 10000
+        self.assertEqual(decompress(gzip.compress(data), "gzip", 10000),
+                         data)
+        with self.assertRaises(exceptions.PayloadTooLarge):
+            decompress(gzip.compress(data), "gzip", 9999)
+
+    def test_invalid_payloads(self):
+        with self.assertRaises(exceptions.UnsupportedContentEncoding):
+            decompress(b"hello", "br")
+
+        with self.assertRaises(exceptions.BadRequest):
+            decompress(b"hello", "gzip")
+
+        with self.assertRaises(exceptions.BadRequest):
+            decompress(gzip.compress(b"hello")[:-4], "gzip")
+
+    def test_incremental(self):
+        data = b"hello world" * 1000
+        compressed = gzip.compress(data)
+        decompressor = Decompressor("gzip", len(data))
+        result = b"".join(decompressor.feed(compressed[i:i+100])
+                          for i in range(0, len(compressed), 100))
+        decompressor.finish()
+        self.assertEqual(result, data)
+        self.assertEqual(decompressor.size, len(data))
+
+
+class TestResponseBody(unittest.TestCase):
+    def test_variant_is_cached(self):
+        body = ResponseBody(b"x" * 2000)
+        self.assertEqual(len(body), 2000)
+
+        first = body.variant("gzip")
+        self.assertIs(body.variant("gzip"), first)
+        self.assertIsNot(body.variant("gzip", 1), first)
+        self.assertEqual(gzip.decompress(first), body.data)
+
+
+class TestResponseCompression(unittest.TestCase):
+    def test_negotiate(self):
+        compression = ResponseCompression()
+        self.assertEqual(compression.negotiate("gzip"), "gzip")
+        self.assertEqual(compression.negotiate("deflate, gzip"), "gzip")
+        self.assertEqual(compression.negotiate("gzip;q=0.1, deflate"),
+                         "deflate")
+        self.assertEqual(compression.negotiate("*"), "gzip")
+        self.assertEqual(compression.negotiate("*;q=0"), None)
+        self.assertEqual(compression.negotiate("br"), None)
+        self.assertEqual(compression.negotiate(""), None)
+
+    def test_apply(self):
+        compression = ResponseCompression(min_size=100)
+
+        small = ResponseBody(b"x" * 10)
+        self.assertEqual(compression.apply(small, "gzip"),
+                         (None, small.data))
+
+        large = ResponseBody(b"x" * 1000)
+        encoding, data = compression.apply(large, "gzip")
+        self.assertEqual(encoding, "gzip")
+        self.assertEqual(gzip.decompress(data), large.data)
+        self.assertEqual(compression.apply(large, "identity"),
+                         (None, large.data))
+
+    def test_invalid_arguments(self):
+        with self.assertRaises(ValueError):
+            ResponseCompression(encodings=("br", ))
+
+        with self.assertRaises(ValueError):
+            ResponseCompression(level=10)
@@ -3,6 +3,7 @@ from unittest.mock import Mock
 from tornado.testing import AsyncTestCase, gen_test
 
 from tornado_rest_jsonapi.data_layers.base import BaseDataLayer
+from tornado_rest_jsonapi.querystring import QueryStringManager
 
 
 class TestBaseDataLayer(AsyncTestCase):
@@ -24,3 +25,40 @@ class TestBaseDataLayer(AsyncTestCase):
 
         with self.assertRaises(NotImplementedError):
             yield handler.get_collection(Mock(), dict())
+
+    @gen_test
+    def test_lifecycle(self):
+        yield BaseDataLayer.startup(Mock(), dict())
+        yield BaseDataLayer.shutdown(Mock(), dict())
+
+    @gen_test
+    def test_cancel(self):
+        data_layer = BaseDataLayer(dict(application=Mock()))
+        self.assertFalse(data_layer.cancelled)
+
+        data_layer.cancel()
+        self.assertTrue(data_layer.cancelled)
+        yield data_layer.cancellation.wait()
+
+    @gen_test
+    def test_get_collection_batch(self):
+        class ListDataLayer(BaseDataLayer):
+            def get_collection(self, qs, view_kwargs):
+                page = qs.pagination
+                start = page["number"] * page["size"]
+                return 5, list(range(5))[start:start + page["size"]]
+
+        data_layer = ListDataLayer(dict(application=Mock()))
+        qs = QueryStringManager({}, Mock())
+
+        batches = []
+        cursor = None
+        while True:
+            items, cursor = yield data_layer.get_collection_batch(
+                qs, cursor, 2, {})
+            batches.append(items)
+            if cursor is None:
+                break
+
+        self.assertEqual(batches, [[0, 1], [2, 3], [4]])
+        self.assertEqual(len(qs), 0)
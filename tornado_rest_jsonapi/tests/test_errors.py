@@ -1,6 +1,10 @@
+import http
+import json
 import unittest
 
-from tornado_rest_jsonapi.errors import jsonapi_errors
+from tornado_rest_jsonapi.errors import (
+    Error, encoded_jsonapi_errors, errors_from_jsonapi_errors,
+    jsonapi_errors, lazy_errors_from_jsonapi_errors)
 from tornado_rest_jsonapi.exceptions import ObjectNotFound
 
 
@@ -14,3 +18,39 @@ class TestErrors(unittest.TestCase):
                          "jsonapi": {
                              "version": "1.0"
                          }})
+
+    def test_encoded_jsonapi_errors(self):
+        document = encoded_jsonapi_errors(ObjectNotFound())
+        self.assertEqual(json.loads(document.decode("utf-8")),
+                         jsonapi_errors(ObjectNotFound()))
+        self.assertIs(encoded_jsonapi_errors(ObjectNotFound()), document)
+
+        exc = ObjectNotFound.from_message("Not here")
+        self.assertFalse(exc.has_default_errors)
+        document = encoded_jsonapi_errors(exc)
+        self.assertEqual(json.loads(document.decode("utf-8")),
+                         jsonapi_errors(exc))
+
+    def test_lazy_error(self):
+        jsonapi = {
+            "detail": "Missing data for required field.",
+            "source": {"pointer": "/data/attributes/name"},
+            "status": "422",
+        }
+        errors = lazy_errors_from_jsonapi_errors({"errors": [jsonapi]})
+        self.assertIs(errors[0].to_jsonapi(), jsonapi)
+        self.assertEqual(errors[0].status, http.HTTPStatus(422))
+        self.assertEqual(errors[0].source.pointer, "/data/attributes/name")
+        self.assertEqual(errors[0].detail, "Missing data for required field.")
+        self.assertIsNone(errors[0].title)
+        self.assertEqual(jsonapi["status"], "422")
+
+    def test_errors_from_jsonapi_errors(self):
+        errors = errors_from_jsonapi_errors({"errors": [{
+            "detail": "Missing data for required field.",
+            "source": {"pointer": "/data/attributes/name"},
+            "status": "422",
+        }]})
+        self.assertIsInstance(errors[0], Error)
+        self.assertEqual(errors[0].status, http.HTTPStatus(422))
+        self.assertEqual(errors[0].source.pointer, "/data/attributes/name")
@@ -0,0 +1,51 @@
+import os
+import shutil
+import tempfile
+
+from tornado import gen
+from tornado.testing import AsyncTestCase, gen_test
+
+from tornado_rest_jsonapi.invalidation import InvalidationBus
+
+
+class TestInvalidationBus(AsyncTestCase):
+    def setUp(self):
+        super().setUp()
+        self.directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.directory)
+
+    @gen_test
+    def test_publish(self):
+        buses = [InvalidationBus(self.directory) for _ in range(3)]
+        received = [[] for _ in range(3)]
+        for worker_id, bus in enumerate(buses):
+            bus.attach(worker_id, 3, self.io_loop)
+            bus.subscribe(received[worker_id].append)
+
+        buses[0].publish({"type": "student", "id": "1"})
+        yield gen.sleep(0.05)
+        for bus in buses:
+            bus.detach()
+
+        self.assertEqual(received[0], [])
+        self.assertEqual(received[1], [{"type": "student", "id": "1"}])
+        self.assertEqual(received[2], [{"type": "student", "id": "1"}])
+
+    @gen_test
+    def test_missing_peer(self):
+        bus = InvalidationBus(self.directory)
+        bus.attach(0, 2, self.io_loop)
+        self.assertTrue(bus.attached)
+
+        # Worker 1 is not running. The message is dropped.
+        bus.publish("hello")
+
+        bus.detach()
+        self.assertFalse(bus.attached)
+        self.assertEqual(os.listdir(self.directory), [])
+
+    def test_detached(self):
+        bus = InvalidationBus(self.directory)
+        bus.subscribe(self.fail)
+        bus.publish("hello")
+        bus.detach()
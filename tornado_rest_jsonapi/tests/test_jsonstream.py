@@ -0,0 +1,63 @@
+import json
+import unittest
+
+from tornado_rest_jsonapi.exceptions import BadRequest
+from tornado_rest_jsonapi.jsonstream import ResourceObjectStream
+
+
+class TestResourceObjectStream(unittest.TestCase):
+    def _parse(self, document, chunk_size):
+        stream = ResourceObjectStream()
+        result = []
+        for i in range(0, len(document), chunk_size):
+            result.extend(stream.feed(document[i:i+chunk_size]))
+        stream.finish()
+        return stream, result
+
+    def test_array(self):
+        resource_objects = [
+            {"type": "student",
+             "attributes": {"name": 'jo\\"h]n}', "tags": [1, {"x": 2}]}},
+            {"type": "student", "attributes": {"name": "wick"}},
+        ]
+        document = json.dumps({
+            "meta": {"data": [1, 2]},
+            "data": resource_objects,
+            "jsonapi": {"version": "1.0"}
+        }).encode("utf-8")
+
+        for chunk_size in (1, 2, 5, len(document)):
+            stream, result = self._parse(document, chunk_size)
+            self.assertTrue(stream.many)
+            self.assertEqual(result, resource_objects)
+
+    def test_single_object(self):
+        stream, result = self._parse(
+            b'{"data": {"type": "student", "id": "1"}}', 3)
+        self.assertFalse(stream.many)
+        self.assertEqual(result, [{"type": "student", "id": "1"}])
+
+    def test_empty_array(self):
+        stream, result = self._parse(b'{"data" : [ ] }', 1)
+        self.assertTrue(stream.many)
+        self.assertEqual(result, [])
+
+    def test_invalid_documents(self):
+        for document in [b'[{}]',
+                         b'{"data": 5}',
+                         b'{"data": [1]}',
+                         b'{"data": [{},]}',
+                         b'{"data": [{"type": }]}',
+                         b'{"data": [{}]} {}',
+                         b'{"data": [{}',
+                         b'{"meta": {}}',
+                         b'hello']:
+            with self.assertRaises(BadRequest):
+                self._parse(document, 4)
+
+    def test_bounded_buffer(self):
+        stream = ResourceObjectStream()
+        stream.feed(b'{"data": [')
+        for i in range(100):
+            stream.feed(b'{"type": "student", "id": "%d"},' % i)
+            self.assertLess(len(stream._buffer), 10)
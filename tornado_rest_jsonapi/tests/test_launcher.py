@@ -0,0 +1,156 @@
+import os
+import signal
+import subprocess
+import sys
+import textwrap
+import time
+import unittest
+import urllib.request
+from unittest import mock
+
+from tornado import gen, web
+from tornado.httpclient import AsyncHTTPClient
+from tornado.testing import AsyncTestCase, gen_test
+
+from tornado_rest_jsonapi.api import Api
+from tornado_rest_jsonapi.launcher import Launcher
+from tornado_rest_jsonapi.tests import resource_handlers
+from tornado_rest_jsonapi.tests.utils import bind_unused_port
+
+
+class TestLauncher(AsyncTestCase):
+    def setUp(self):
+        super().setUp()
+        app = web.Application()
+        self.api = Api(app, base_urlpath='/api/v1/')
+        self.api.route(resource_handlers.StudentList, "students",
+                       "/students/")
+        self.events = []
+        self.api.add_startup_hook(lambda api: self.events.append("startup"))
+        self.api.add_shutdown_hook(
+            lambda api: self.events.append("shutdown"))
+
+        sock, self.port = bind_unused_port()
+        self.sockets = [sock]
+        self.launcher = Launcher(self.api, self.port, num_processes=1,
+                                 shutdown_timeout=1.0)
+
+    @gen_test
+    def test_start_stop(self):
+        yield self.launcher.start_worker(self.sockets, 0)
+        self.assertEqual(self.events, ["startup"])
+        self.assertEqual(self.launcher.task_id, 0)
+
+        res = yield AsyncHTTPClient().fetch(
+            "http://127.0.0.1:{}/api/v1/students/".format(self.port))
+        self.assertEqual(res.code, 200)
+        self.assertEqual(self.api.in_flight, 0)
+
+        yield self.launcher.stop_worker()
+        self.assertEqual(self.events, ["startup", "shutdown"])
+
+        # Stopping twice has no effect.
+        yield self.launcher.stop_worker()
+        self.assertEqual(self.events, ["startup", "shutdown"])
+
+    @gen_test
+    def test_waits_for_in_flight(self):
+        yield self.launcher.start_worker(self.sockets, 0)
+
+        self.api.request_started(mock.Mock())
+        self.io_loop.call_later(
+            0.2, lambda: self.api.request_finished(mock.Mock()))
+
+        start = self.io_loop.time()
+        yield self.launcher.stop_worker()
+        self.assertGreaterEqual(self.io_loop.time() - start, 0.15)
+        self.assertEqual(self.events, ["startup", "shutdown"])
+
+    @gen_test
+    def test_shutdown_timeout(self):
+        self.launcher.shutdown_timeout = 0.1
+        yield self.launcher.start_worker(self.sockets, 0)
+        self.api.request_started(mock.Mock())
+
+        yield self.launcher.stop_worker()
+        self.assertEqual(self.events, ["startup", "shutdown"])
+
+    def test_change_feeds_single_process(self):
+        self.api.route_change_feed(resource_handlers.StudentList,
+                                   "students_feed", "/students/changes/")
+        launcher = Launcher(self.api, self.port, num_processes=2)
+        with self.assertRaises(ValueError):
+            launcher.run()
+
+    @gen_test
+    def test_metrics_worker(self):
+        metrics = self.api.route_metrics("metrics", "/metrics/")
+        yield self.launcher.start_worker(self.sockets, 0)
+        self.assertEqual(metrics.worker, "0")
+        yield self.launcher.stop_worker()
+
+    @gen_test
+    def test_invalidation_bus(self):
+        bus = mock.Mock()
+        self.api.invalidation_bus = bus
+        yield self.launcher.start_worker(self.sockets, 0)
+        bus.attach.assert_called_with(0, 1)
+        yield gen.moment
+        yield self.launcher.stop_worker()
+        self.assertTrue(bus.detach.called)
+
+
+_LAUNCH_SCRIPT = textwrap.dedent("""
+    import sys
+    from tornado import web
+    from tornado_rest_jsonapi.api import Api
+    from tornado_rest_jsonapi.launcher import Launcher
+    from tornado_rest_jsonapi.tests import resource_handlers
+
+    api = Api(web.Application(), base_urlpath='/api/v1/')
+    api.route(resource_handlers.StudentList, "students", "/students/")
+    api.add_startup_hook(
+        lambda api: print(api.invalidation_bus.directory, flush=True))
+    api.add_shutdown_hook(lambda api: print("shutdown", flush=True))
+    Launcher(api, int(sys.argv[1]), "127.0.0.1", num_processes=2).run()
+""")
+
+
+@unittest.skipUnless(hasattr(os, "fork"), "requires fork")
+class TestLauncherProcesses(unittest.TestCase):
+    def test_terminate_parent(self):
+        sock, port = bind_unused_port()
+        sock.close()
+
+        root = os.path.dirname(os.path.dirname(os.path.dirname(
+            os.path.abspath(__file__))))
+        proc = subprocess.Popen(
+            [sys.executable, "-c", _LAUNCH_SCRIPT, str(port)],
+            cwd=root, stdout=subprocess.PIPE, universal_newlines=True)
+        self.addCleanup(proc.stdout.close)
+        directory = proc.stdout.readline().strip()
+
+        url = "http://127.0.0.1:{}/api/v1/students/".format(port)
+        deadline = time.time() + 10
+        while True:
+            try:
+                with urllib.request.urlopen(url) as res:
+                    self.assertEqual(res.status, 200)
+                break
+            except OSError:
+                if time.time() > deadline:
+                    proc.kill()
+                    raise
+                time.sleep(0.05)
+
+        proc.send_signal(signal.SIGTERM)
+        try:
+            output, _ = proc.communicate(timeout=10)
+        except subprocess.TimeoutExpired:
+            proc.kill()
+            raise
+
+        self.assertEqual(proc.returncode, 0)
+        # Both workers ran their shutdown hooks
+        self.assertEqual(output.split().count("shutdown"), 2)
+        self.assertFalse(os.path.exists(directory))
@@ -0,0 +1,79 @@
+import unittest
+from unittest import mock
+
+from tornado_rest_jsonapi.api import Api
+from tornado_rest_jsonapi.data_layers.cache import (
+    CachingDataLayer, ObjectCache)
+from tornado_rest_jsonapi.metrics import Counter, Histogram, Metrics
+from tornado_rest_jsonapi.pool import Pool
+from tornado_rest_jsonapi.tests import resource_handlers
+
+
+class TestCounter(unittest.TestCase):
+    def test_inc(self):
+        counter = Counter("requests_total", "Requests.", ("method", ))
+        counter.inc("GET")
+        counter.inc("GET", amount=2)
+        self.assertEqual(counter.get("GET"), 3)
+        self.assertEqual(counter.get("POST"), 0)
+        self.assertEqual(counter.samples(),
+                         [("requests_total", {"method": "GET"}, 3)])
+
+
+class TestHistogram(unittest.TestCase):
+    def test_observe(self):
+        histogram = Histogram("duration_seconds", "Duration.", ("phase", ),
+                              buckets=(0.1, 1.0))
+        for value in (0.05, 0.1, 0.5, 2.0):
+            histogram.observe(value, "load")
+
+        self.assertEqual(histogram.count("load"), 4)
+        self.assertEqual(histogram.samples(), [
+            ("duration_seconds_bucket", {"phase": "load", "le": "0.1"}, 2),
+            ("duration_seconds_bucket", {"phase": "load", "le": "1"}, 3),
+            ("duration_seconds_bucket", {"phase": "load", "le": "+Inf"}, 4),
+            ("duration_seconds_count", {"phase": "load"}, 4),
+            ("duration_seconds_sum", {"phase": "load"}, 2.65),
+        ])
+
+
+class TestMetrics(unittest.TestCase):
+    def test_render(self):
+        api = Api(mock.Mock())
+        cache = ObjectCache(name="students")
+        cache.get("missing")
+
+        class CachedStudentList(resource_handlers.StudentList):
+            data_layer = {
+                "class": CachingDataLayer,
+                "wrapped": {"class": resource_handlers.WorkingDataLayer},
+                "cache": cache,
+            }
+
+        api.route(CachedStudentList, "students", "/students/")
+        api.pools.add("db", Pool(lambda: None))
+        metrics = Metrics(api)
+        metrics.errors.inc("StudentList", 'Bad"Name')
+
+        text = metrics.render()
+        self.assertIn("# TYPE jsonapi_requests_total counter\n", text)
+        self.assertIn("jsonapi_requests_in_flight 0\n", text)
+        self.assertIn(
+            'jsonapi_errors_total{exception="Bad\\"Name",'
+            'resource="StudentList"} 1\n', text)
+        self.assertIn(
+            'jsonapi_object_cache_misses_total{cache="students"} 1\n', text)
+        self.assertIn('jsonapi_pool_max_size{pool="db"} 10\n', text)
+        self.assertIn('jsonapi_pool_created_total{pool="db"} 0\n', text)
+
+    def test_worker(self):
+        api = Api(mock.Mock())
+        metrics = Metrics(api)
+        metrics.requests.inc("StudentList", "GET", "200")
+        metrics.worker = "3"
+
+        text = metrics.render()
+        self.assertIn(
+            'jsonapi_requests_total{method="GET",resource="StudentList",'
+            'status="200",worker="3"} 1\n', text)
+        self.assertIn('jsonapi_requests_in_flight{worker="3"} 0\n', text)
@@ -0,0 +1,48 @@
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from tornado.testing import AsyncTestCase, gen_test
+
+from tornado_rest_jsonapi.offload import OffloadPolicy
+
+
+class TestOffloadPolicy(AsyncTestCase):
+    def setUp(self):
+        super().setUp()
+        self.executor = ThreadPoolExecutor(1)
+        self.addCleanup(self.executor.shutdown)
+
+    def test_should_offload(self):
+        policy = OffloadPolicy(self.executor, min_items=10, min_bytes=100)
+        self.assertFalse(policy.should_offload())
+        self.assertFalse(policy.should_offload(items=9, size=99))
+        self.assertTrue(policy.should_offload(items=10))
+        self.assertTrue(policy.should_offload(size=100))
+
+        policy = OffloadPolicy(self.executor, min_items=None, min_bytes=None)
+        self.assertFalse(policy.should_offload(items=10**6, size=10**9))
+
+    @gen_test
+    def test_run(self):
+        policy = OffloadPolicy(self.executor, min_items=10)
+
+        def thread_name(value):
+            return threading.current_thread().name, value
+
+        name, value = yield policy.run(thread_name, 3, items=1)
+        self.assertEqual(name, threading.current_thread().name)
+        self.assertEqual(value, 3)
+
+        name, value = yield policy.run(thread_name, 4, items=10)
+        self.assertNotEqual(name, threading.current_thread().name)
+        self.assertEqual(value, 4)
+
+    @gen_test
+    def test_run_exception(self):
+        policy = OffloadPolicy(self.executor, min_items=0)
+
+        def boom():
+            raise ValueError("boom")
+
+        with self.assertRaises(ValueError):
+            yield policy.run(boom)
@@ -0,0 +1,206 @@
+from tornado import gen
+from tornado.testing import AsyncTestCase, gen_test
+
+from tornado_rest_jsonapi import exceptions
+from tornado_rest_jsonapi.pool import Pool, PoolRegistry
+
+
+class Backend:
+    """Opens numbered connections, recording the closed ones."""
+
+    def __init__(self):
+        self.opened = 0
+        self.closed = []
+        self.unhealthy = set()
+
+    async def connect(self):
+        self.opened += 1
+        return self.opened
+
+    def disconnect(self, connection):
+        self.closed.append(connection)
+
+    def check(self, connection):
+        return connection not in self.unhealthy
+
+
+async def use_connection(pool, error):
+    async with pool.connection():
+        raise error
+
+
+class TestPool(AsyncTestCase):
+    def setUp(self):
+        super().setUp()
+        self.backend = Backend()
+
+    def _pool(self, **kwargs):
+        kwargs.setdefault("eviction_interval", None)
+        return Pool(self.backend.connect,
+                    disconnect=self.backend.disconnect,
+                    check=self.backend.check,
+                    **kwargs)
+
+    @gen_test
+    def test_reuse(self):
+        pool = self._pool()
+        connection = yield pool.acquire()
+        self.assertEqual(pool.in_use, 1)
+        pool.release(connection)
+
+        connection = yield pool.acquire()
+        self.assertEqual(connection, 1)
+        pool.release(connection)
+        self.assertEqual((pool.size, pool.idle, pool.in_use), (1, 1, 0))
+        self.assertEqual(pool.stats()["acquired"], 2)
+
+    @gen_test
+    def test_wait(self):
+        pool = self._pool(max_size=1)
+        connection = yield pool.acquire()
+        waiting = gen.convert_yielded(pool.acquire())
+        yield gen.moment
+        self.assertEqual(pool.waiting, 1)
+
+        pool.release(connection)
+        connection = yield waiting
+        self.assertEqual(connection, 1)
+        self.assertEqual(pool.waited, 1)
+
+        with self.assertRaises(exceptions.PoolExhausted):
+            yield pool.acquire(timeout=0.01)
+        self.assertEqual(pool.timeouts, 1)
+        self.assertEqual(pool.waiting, 0)
+
+    @gen_test
+    def test_cancelled_waiter(self):
+        pool = self._pool(max_size=1)
+        connection = yield pool.acquire()
+        waiting = gen.convert_yielded(pool.acquire())
+        yield gen.moment
+        if not waiting.cancel():
+            self.skipTest("Coroutines cannot be cancelled")
+
+        yield gen.sleep(0)
+        self.assertEqual(len(pool._waiters), 0)
+
+        # Handed the connection, but cancelled before resuming
+        waiting = gen.convert_yielded(pool.acquire())
+        yield gen.moment
+        pool.release(connection)
+        waiting.cancel()
+        yield gen.sleep(0)
+        self.assertEqual((pool.idle, pool.in_use), (1, 0))
+
+        connection = yield pool.acquire()
+        self.assertEqual(connection, 1)
+
+    @gen_test
+    def test_discard_frees_slot(self):
+        pool = self._pool(max_size=1)
+        connection = yield pool.acquire()
+        waiting = gen.convert_yielded(pool.acquire())
+        yield gen.moment
+
+        pool.release(connection, discard=True)
+        connection = yield waiting
+        self.assertEqual(connection, 2)
+        self.assertEqual(pool.size, 1)
+        yield gen.moment
+        self.assertEqual(self.backend.closed, [1])
+
+    @gen_test
+    def test_connection(self):
+        pool = self._pool()
+        with self.assertRaises(exceptions.ObjectNotFound):
+            yield use_connection(pool, exceptions.ObjectNotFound())
+        self.assertEqual(pool.idle, 1)
+
+        # Other errors leave the connection in an unknown state
+        with self.assertRaises(RuntimeError):
+            yield use_connection(pool, RuntimeError())
+        self.assertEqual(pool.idle, 0)
+        self.assertEqual(pool.discarded, 1)
+
+    @gen_test
+    def test_health_check(self):
+        pool = self._pool(check_after=0)
+        connection = yield pool.acquire()
+        pool.release(connection)
+        self.backend.unhealthy.add(connection)
+
+        connection = yield pool.acquire()
+        self.assertEqual(connection, 2)
+        self.assertEqual(pool.failed_checks, 1)
+        self.assertEqual(pool.size, 1)
+
+    @gen_test
+    def test_evict_idle(self):
+        pool = self._pool(max_idle=0, min_size=1)
+        connections = yield [pool.acquire() for _ in range(3)]
+        for connection in connections:
+            pool.release(connection)
+
+        closing = pool.evict_idle()
+        self.assertEqual(pool.size, 1)
+        self.assertEqual(pool.evicted, 2)
+        yield closing
+        self.assertEqual(self.backend.closed, [1, 2])
+
+    @gen_test
+    def test_min_size(self):
+        pool = self._pool(min_size=2)
+        pool.start()
+        while pool.idle < 2:
+            yield gen.moment
+        self.assertEqual(self.backend.opened, 2)
+
+    @gen_test
+    def test_close(self):
+        pool = self._pool(max_size=1)
+        idle = yield pool.acquire()
+        pool.release(idle)
+        connection = yield pool.acquire()
+        waiting = gen.convert_yielded(pool.acquire())
+        yield gen.moment
+
+        closing = gen.convert_yielded(pool.close(timeout=1))
+        yield gen.moment
+        with self.assertRaises(exceptions.ServiceUnavailable):
+            yield waiting
+
+        pool.release(connection)
+        yield closing
+        self.assertTrue(pool.closed)
+        yield gen.moment
+        self.assertEqual(self.backend.closed, [1])
+
+        with self.assertRaises(exceptions.ServiceUnavailable):
+            yield pool.acquire()
+
+
+class TestPoolRegistry(AsyncTestCase):
+    @gen_test
+    def test_lifecycle(self):
+        backend = Backend()
+        registry = PoolRegistry()
+        pool = registry.add("db", Pool(backend.connect,
+                                       disconnect=backend.disconnect))
+        self.assertIs(registry["db"], pool)
+        self.assertEqual(pool.name, "db")
+        with self.assertRaises(ValueError):
+            registry.add("db", Pool(backend.connect))
+
+        registry.start()
+        late = registry.add("cache", Pool(backend.connect, min_size=1))
+        while late.idle < 1:
+            yield gen.moment
+
+        connection = yield pool.acquire()
+        pool.release(connection)
+        self.assertEqual(registry.stats()["db"]["created"], 1)
+
+        yield registry.close()
+        self.assertTrue(pool.closed)
+        self.assertTrue(late.closed)
+        self.assertEqual(list(registry), ["db", "cache"])
@@ -0,0 +1,58 @@
+import tracemalloc
+import unittest
+from unittest import mock
+
+from tornado_rest_jsonapi.profiling import MemoryProfiler
+
+
+def _handler():
+    handler = mock.Mock()
+    handler.request.method = "GET"
+    return handler
+
+
+class TestMemoryProfiler(unittest.TestCase):
+    def tearDown(self):
+        if tracemalloc.is_tracing():
+            tracemalloc.stop()
+
+    def test_sampled_request(self):
+        profiler = MemoryProfiler(sample_rate=1.0, top=3)
+
+        profile = profiler.start_request(_handler())
+        self.assertIsNotNone(profile)
+        self.assertTrue(tracemalloc.is_tracing())
+
+        # Only one request at a time is sampled.
+        self.assertIsNone(profiler.start_request(_handler()))
+
+        with profile.phase("dump"):
+            retained = [bytearray(1000) for _ in range(100)]
+            transient = bytearray(1000000)
+            del transient
+
+        profiler.finish_request(profile)
+        self.assertFalse(tracemalloc.is_tracing())
+
+        report = profiler.report()
+        stats = report["Mock GET"]["dump"]
+        self.assertEqual(stats["samples"], 1)
+        self.assertGreaterEqual(stats["peak_max"], 1000000)
+        self.assertGreaterEqual(stats["retained_total"], 100000)
+        self.assertLess(stats["retained_total"], 1000000)
+        self.assertLessEqual(len(stats["top"]), 3)
+        del retained
+
+        profiler.reset()
+        self.assertEqual(profiler.report(), {})
+
+    def test_not_sampled(self):
+        profiler = MemoryProfiler(sample_rate=0.0)
+        self.assertIsNone(profiler.start_request(_handler()))
+        self.assertFalse(tracemalloc.is_tracing())
+
+    def test_foreign_tracing(self):
+        tracemalloc.start()
+        profiler = MemoryProfiler(sample_rate=1.0)
+        self.assertIsNone(profiler.start_request(_handler()))
+        self.assertTrue(tracemalloc.is_tracing())
@@ -1,7 +1,8 @@
 import unittest
 
 from marshmallow_jsonapi import Schema
-from tornado_rest_jsonapi.exceptions import BadRequest, InvalidSort
+from tornado_rest_jsonapi.exceptions import (
+    BadRequest, InvalidFilters, InvalidSort)
 from tornado_rest_jsonapi.tests.resource_handlers import StudentSchema
 from tornado_rest_jsonapi.querystring import QueryStringManager as QSManager
 
@@ -44,6 +45,19 @@ class TestQueryStringManager(unittest.TestCase):
         self.assertIn(("foo", 'bar'), items)
         self.assertIn(("foo", 'baz'), items)
 
+    def test_filters(self):
+        qs = QSManager(
+            {'filter': [b'[{"name": "age", "op": "gt", "val": 3}]']},
+            Schema)
+        self.assertEqual(qs.filters,
+                         [{"name": "age", "op": "gt", "val": 3}])
+
+        self.assertIsNone(QSManager({}, Schema).filters)
+
+        qs = QSManager({'filter': [b'[{']}, Schema)
+        with self.assertRaises(InvalidFilters):
+            qs.filters
+
     def test_incorrect_init(self):
         with self.assertRaises(ValueError):
             QSManager("hello", Schema)
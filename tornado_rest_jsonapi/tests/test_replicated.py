@@ -0,0 +1,193 @@
+import unittest
+from unittest import mock
+
+from tornado.testing import AsyncTestCase, gen_test
+
+from tornado_rest_jsonapi.data_layers.base import BaseDataLayer
+from tornado_rest_jsonapi.data_layers.replicated import (
+    LEAST_OUTSTANDING, ReplicaSet, ReplicatedDataLayer)
+from tornado_rest_jsonapi.querystring import QueryStringManager
+
+
+class Store:
+    """A local stand-in for a replicated backend: the primary appends
+    the writes to a log, which each replica applies up to its
+    position."""
+
+    def __init__(self, num_replicas):
+        self.log = []
+        self.positions = [0] * num_replicas
+
+    def catch_up(self, replica):
+        self.positions[replica] = len(self.log)
+
+    def objects(self, position):
+        objects = {}
+        for identifier, value in self.log[:position]:
+            if value is None:
+                objects.pop(identifier, None)
+            else:
+                objects[identifier] = value
+        return objects
+
+
+class PrimaryDataLayer(BaseDataLayer):
+    def create_object(self, data, view_kwargs):
+        self.store.log.append((data["id"], data))
+        return data
+
+    def get_object(self, view_kwargs):
+        return ("primary", self.store.objects(len(self.store.log)).get(
+            view_kwargs["id"]))
+
+    def replication_position(self):
+        return len(self.store.log)
+
+
+class ReplicaDataLayer(BaseDataLayer):
+    async def get_object(self, view_kwargs):
+        position = self.store.positions[self.replica]
+        return (self.replica, self.store.objects(position).get(
+            view_kwargs["id"]))
+
+    async def get_collection(self, qs, view_kwargs):
+        objects = self.store.objects(self.store.positions[self.replica])
+        size = qs.pagination["size"]
+        start = qs.pagination["number"] * size
+        return len(objects), list(objects.values())[start:start + size]
+
+    async def replication_position(self):
+        return self.store.positions[self.replica]
+
+
+class TestReplicaSet(unittest.TestCase):
+    def test_round_robin(self):
+        replica_set = ReplicaSet()
+        self.assertEqual([replica_set.order(3)[0] for _ in range(4)],
+                         [0, 1, 2, 0])
+
+    def test_least_outstanding(self):
+        replica_set = ReplicaSet(LEAST_OUTSTANDING)
+        replica_set.acquire(0)
+        replica_set.acquire(0)
+        replica_set.acquire(2)
+        self.assertEqual(replica_set.order(3), [1, 2, 0])
+
+        replica_set.release(0)
+        replica_set.release(0)
+        self.assertEqual(replica_set.order(3)[0], 0)
+
+    def test_positions(self):
+        replica_set = ReplicaSet()
+        self.assertEqual(replica_set.reached(0, 5), 5)
+        self.assertEqual(replica_set.reached(0, 3), 5)
+
+    def test_unknown_balancing(self):
+        with self.assertRaises(ValueError):
+            ReplicaSet("random")
+
+
+class TestReplicatedDataLayer(AsyncTestCase):
+    def setUp(self):
+        super().setUp()
+        self.store = Store(2)
+        self.replica_set = ReplicaSet()
+        self.options = {
+            "primary": {"class": PrimaryDataLayer, "store": self.store},
+            "replicas": [{"class": ReplicaDataLayer,
+                          "store": self.store,
+                          "replica": replica}
+                         for replica in range(2)],
+            "replica_set": self.replica_set,
+        }
+
+    def _data_layer(self, read_only=True, consistency_token=None):
+        options = dict(self.options)
+        options.update(application=mock.Mock(),
+                       current_user=None,
+                       read_only=read_only,
+                       consistency_token=consistency_token)
+        return ReplicatedDataLayer(options)
+
+    @gen_test
+    def test_default_replica_set(self):
+        del self.options["replica_set"]
+        with self.assertRaisesRegex(ValueError, "replica_set"):
+            self._data_layer()
+
+        yield ReplicatedDataLayer.startup(mock.Mock(), self.options)
+        replica_set = self.options["replica_set"]
+        self.assertIsInstance(replica_set, ReplicaSet)
+
+        yield self._data_layer().get_object({"id": "1"})
+        self.assertEqual(replica_set.replica_reads, 1)
+
+        # A set defined by the class is kept
+        class StudentsDataLayer(ReplicatedDataLayer):
+            replica_set = self.replica_set
+
+        options = {"primary": self.options["primary"]}
+        yield StudentsDataLayer.startup(mock.Mock(), options)
+        yield StudentsDataLayer.shutdown(mock.Mock(), options)
+        self.assertNotIn("replica_set", options)
+
+    @gen_test
+    def test_read_write_split(self):
+        data_layer = self._data_layer(read_only=False)
+        yield data_layer.create_object({"id": "1"}, {})
+        self.assertEqual(data_layer.consistency_token, "1")
+
+        # Writing requests read from the primary
+        result = yield data_layer.get_object({"id": "1"})
+        self.assertEqual(result, ("primary", {"id": "1"}))
+
+        results = []
+        for _ in range(2):
+            result = yield self._data_layer().get_object({"id": "1"})
+            results.append(result)
+        self.assertEqual(results, [(0, None), (1, None)])
+        self.assertEqual(self.replica_set.replica_reads, 2)
+        self.assertEqual(self.replica_set.outstanding, {0: 0, 1: 0})
+
+    @gen_test
+    def test_read_your_writes(self):
+        data_layer = self._data_layer(read_only=False)
+        yield data_layer.create_object({"id": "1"}, {})
+        token = data_layer.consistency_token
+
+        # No replica has caught up
+        result = yield self._data_layer(
+            consistency_token=token).get_object({"id": "1"})
+        self.assertEqual(result, ("primary", {"id": "1"}))
+
+        self.store.catch_up(1)
+        for _ in range(2):
+            result = yield self._data_layer(
+                consistency_token=token).get_object({"id": "1"})
+            self.assertEqual(result, (1, {"id": "1"}))
+        self.assertEqual(self.replica_set.positions, {0: 0, 1: 1})
+
+        # Unknown tokens are served by the primary
+        result = yield self._data_layer(
+            consistency_token="foo").get_object({"id": "1"})
+        self.assertEqual(result[0], "primary")
+
+    @gen_test
+    def test_get_collection_batch(self):
+        self.store.log.extend([(str(i), {"id": str(i)}) for i in range(5)])
+        self.store.catch_up(0)
+        self.store.catch_up(1)
+
+        qs = QueryStringManager({}, mock.Mock())
+        data_layer = self._data_layer()
+        items, cursor = yield data_layer.get_collection_batch(
+            qs, None, 2, {})
+        self.assertEqual(cursor, (0, 1))
+        self.assertEqual(len(items), 2)
+
+        # The following batches stay on the same replica
+        self.store.positions[0] = 3
+        items, cursor = yield data_layer.get_collection_batch(
+            qs, cursor, 2, {})
+        self.assertIsNone(cursor)
+        self.assertEqual(items, [{"id": "2"}])
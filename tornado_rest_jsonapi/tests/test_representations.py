@@ -0,0 +1,69 @@
+import unittest
+
+from tornado_rest_jsonapi import exceptions
+from tornado_rest_jsonapi.representations import (
+    JSONAPI, MessagePackRepresentation, Representations, msgpack)
+from tornado_rest_jsonapi.tests.resource_handlers import (
+    SortedJsonRepresentation)
+
+
+class TestRepresentations(unittest.TestCase):
+    def setUp(self):
+        self.representations = Representations()
+        self.sorted_json = SortedJsonRepresentation()
+        self.representations.register(self.sorted_json)
+
+    def test_negotiate(self):
+        negotiate = self.representations.negotiate
+        self.assertIs(negotiate(None), JSONAPI)
+        self.assertIs(negotiate("text/html"), JSONAPI)
+        self.assertIs(negotiate("application/vnd.api+json"), JSONAPI)
+        self.assertIs(negotiate("application/x-sorted+json"),
+                      self.sorted_json)
+        self.assertIs(negotiate("text/html, Application/X-Sorted+JSON"),
+                      self.sorted_json)
+        self.assertIs(
+            negotiate("application/x-sorted+json;q=0.5, */*;q=0.8"),
+            JSONAPI)
+        self.assertIs(
+            negotiate("application/json, application/x-sorted+json"),
+            JSONAPI)
+        self.assertIs(
+            negotiate("application/x-sorted+json;q=0, */*;q=0"),
+            JSONAPI)
+
+    def test_prefers(self):
+        prefers = self.representations.prefers
+        ndjson = "application/x-ndjson"
+        self.assertFalse(prefers(None, ndjson))
+        self.assertFalse(prefers("*/*", ndjson))
+        self.assertTrue(prefers("application/x-ndjson", ndjson))
+        self.assertTrue(prefers("application/x-ndjson, */*", ndjson))
+        self.assertFalse(prefers("application/x-ndjson;q=0", ndjson))
+        self.assertFalse(prefers("*/*, application/x-ndjson", ndjson))
+        self.assertTrue(
+            prefers("application/x-sorted+json;q=0.5, application/x-ndjson",
+                    ndjson))
+
+    def test_for_content_type(self):
+        for_content_type = self.representations.for_content_type
+        self.assertIs(for_content_type(None), JSONAPI)
+        self.assertIs(for_content_type("application/json"), JSONAPI)
+        self.assertIs(
+            for_content_type("application/x-sorted+json; charset=utf-8"),
+            self.sorted_json)
+
+    def test_registered(self):
+        self.assertEqual(list(self.representations),
+                         [JSONAPI, self.sorted_json])
+
+    @unittest.skipIf(msgpack is None, "msgpack is not installed")
+    def test_msgpack(self):
+        representation = MessagePackRepresentation()
+        document = {"data": {"type": "student", "id": "1"}}
+        self.assertEqual(
+            representation.decode(representation.encode(document)),
+            document)
+
+        with self.assertRaises(exceptions.BadRequest):
+            representation.decode(b"\xc1")
@@ -0,0 +1,144 @@
+import unittest
+from unittest import mock
+
+from tornado.testing import AsyncTestCase, gen_test
+
+from tornado_rest_jsonapi import exceptions
+from tornado_rest_jsonapi.data_layers.base import BaseDataLayer
+from tornado_rest_jsonapi.data_layers.sharded import (
+    RangePartition, ShardedDataLayer, hash_partition)
+from tornado_rest_jsonapi.querystring import QueryStringManager
+from tornado_rest_jsonapi.tests.resource_handlers import StudentSchema
+
+
+class ShardDataLayer(BaseDataLayer):
+    """Stores its objects in the collection given in the options"""
+
+    def create_object(self, data, view_kwargs):
+        self.collection[data["id"]] = data
+        return data
+
+    def get_object(self, view_kwargs):
+        return self.collection.get(view_kwargs["id"])
+
+    def delete_object(self, obj, view_kwargs):
+        del self.collection[view_kwargs["id"]]
+        return True
+
+    async def get_collection(self, qs, view_kwargs):
+        items = list(self.collection.values())
+        for item in reversed(qs.sorting):
+            items.sort(key=lambda obj: obj[item["field"]],
+                       reverse=item["order"] == "desc")
+        self.requested_sizes.append(qs.pagination.get("size"))
+
+        size = qs.pagination.get("size", 10)
+        number = qs.pagination.get("number", 0)
+        if size:
+            items = items[number * size:(number + 1) * size]
+        return len(self.collection), items
+
+
+class TestPartitions(unittest.TestCase):
+    def test_hash_partition(self):
+        shards = [hash_partition(str(identifier), 3)
+                  for identifier in range(100)]
+        self.assertEqual(set(shards), {0, 1, 2})
+        self.assertEqual(hash_partition("42", 3), hash_partition(42, 3))
+
+    def test_range_partition(self):
+        partition = RangePartition([10, 20], key=int)
+        self.assertEqual(partition("3", 3), 0)
+        self.assertEqual(partition("10", 3), 1)
+        self.assertEqual(partition("25", 3), 2)
+        # Extra bounds map to the last shard
+        self.assertEqual(partition("25", 2), 1)
+
+
+class TestShardedDataLayer(AsyncTestCase):
+    def setUp(self):
+        super().setUp()
+        self.collections = [{}, {}, {}]
+        self.requested_sizes = []
+        self.options = {
+            "class": ShardedDataLayer,
+            "shards": [{"class": ShardDataLayer,
+                        "collection": collection,
+                        "requested_sizes": self.requested_sizes}
+                       for collection in self.collections],
+            "partition": RangePartition([10, 20], key=int),
+        }
+
+    def _data_layer(self):
+        options = dict(self.options)
+        options.update(application=mock.Mock(), current_user=None)
+        return ShardedDataLayer(options)
+
+    def _qs(self, **params):
+        return QueryStringManager(
+            {key: [value.encode("utf-8")] for key, value in params.items()},
+            StudentSchema)
+
+    @gen_test
+    def test_routing(self):
+        data_layer = self._data_layer()
+        for identifier in ("5", "15", "25", "27"):
+            yield data_layer.create_object(
+                {"id": identifier, "name": identifier}, {})
+        self.assertEqual([sorted(c) for c in self.collections],
+                         [["5"], ["15"], ["25", "27"]])
+
+        obj = yield data_layer.get_object({"id": "25"})
+        self.assertEqual(obj["name"], "25")
+
+        yield data_layer.delete_object(obj, {"id": "25"})
+        self.assertEqual(sorted(self.collections[2]), ["27"])
+
+        with self.assertRaises(exceptions.BadRequest):
+            yield data_layer.create_object({"name": "anonymous"}, {})
+
+    @gen_test
+    def test_get_collection(self):
+        data_layer = self._data_layer()
+        ages = {"1": 30, "2": 10, "11": 50, "12": 20, "21": 40, "22": 60}
+        for identifier, age in ages.items():
+            yield data_layer.create_object({"id": identifier, "age": age}, {})
+
+        qs = self._qs(**{"sort": "-age", "page[number]": "1",
+                         "page[size]": "2"})
+        total, items = yield data_layer.get_collection(qs, {})
+        self.assertEqual(total, 6)
+        self.assertEqual([item["age"] for item in items], [40, 30])
+        # Each shard is asked for the objects up to the end of the page
+        self.assertEqual(self.requested_sizes, [4, 4, 4])
+
+        qs = self._qs(**{"sort": "age", "page[size]": "0"})
+        total, items = yield data_layer.get_collection(qs, {})
+        self.assertEqual([item["age"] for item in items],
+                         [10, 20, 30, 40, 50, 60])
+
+    @gen_test
+    def test_get_collection_batch(self):
+        data_layer = self._data_layer()
+        for identifier in range(30):
+            yield data_layer.create_object(
+                {"id": str(identifier), "age": (identifier * 7) % 30}, {})
+
+        qs = self._qs(sort="age")
+        ages = []
+        cursor = None
+        while True:
+            items, cursor = yield data_layer.get_collection_batch(
+                qs, cursor, 4, {})
+            self.assertLessEqual(len(items), 4)
+            ages.extend(item["age"] for item in items)
+            if cursor is None:
+                break
+
+        self.assertEqual(ages, list(range(30)))
+
+    def test_cancel(self):
+        data_layer = self._data_layer()
+        data_layer.cancel()
+        self.assertTrue(all(shard.cancelled
+                            for shard in data_layer.shard_layers))
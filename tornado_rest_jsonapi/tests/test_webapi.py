@@ -1,11 +1,27 @@
+import gzip
+import json
 import urllib.parse
+from concurrent.futures import ThreadPoolExecutor
 from collections import OrderedDict
 from unittest import mock
 import http.client
-from tornado import web, escape
-from tornado.testing import LogTrapTestCase
+from tornado import web, escape, gen
+from tornado.tcpclient import TCPClient
+from tornado.testing import LogTrapTestCase, gen_test
 
+from tornado_rest_jsonapi.admission import AdmissionController
 from tornado_rest_jsonapi.api import Api
+from tornado_rest_jsonapi.authenticator import Authenticator
+from tornado_rest_jsonapi.coalescing import SingleFlight
+from tornado_rest_jsonapi.compression import ResponseCompression
+from tornado_rest_jsonapi.data_layers.cache import (
+    CachingDataLayer, ObjectCache)
+from tornado_rest_jsonapi.data_layers.changelog import ChangeLog
+from tornado_rest_jsonapi.data_layers.replicated import (
+    ReplicaSet, ReplicatedDataLayer)
+from tornado_rest_jsonapi.offload import OffloadPolicy
+from tornado_rest_jsonapi.pagination import DEFAULT_PAGE_SIZE
+from tornado_rest_jsonapi.profiling import MemoryProfiler
 from tornado_rest_jsonapi.tests import resource_handlers
 from tornado_rest_jsonapi.tests.utils import AsyncHTTPTestCase
 
@@ -60,8 +76,7 @@ class TestCRUDAPI(TestBase):
                               'version': '1.0'
                           }})
 
-        resource = resource_handlers.StudentDetails
-        data_layer_cls = resource.data_layer["class"]
+        data_layer_cls = resource_handlers.WorkingDataLayer
 
         data_layer_cls.collection[1] = dict(
             id="1",
@@ -308,6 +323,40 @@ class TestCRUDAPI(TestBase):
                          body=escape.json_encode({}))
         self.assertEqual(res.code, http.client.METHOD_NOT_ALLOWED)
 
+    def test_create_compressed(self):
+        body = escape.json_encode({
+            "data": {
+                "type": "student",
+                "attributes": {
+                    "name": "john wick",
+                    "age": 19,
+                }
+            }
+        })
+        res = self.fetch(
+            "/api/v1/students/",
+            method="POST",
+            headers={"Content-Encoding": "gzip"},
+            body=gzip.compress(escape.utf8(body))
+        )
+        self.assertEqual(res.code, http.client.CREATED)
+
+        res = self.fetch(
+            "/api/v1/students/",
+            method="POST",
+            headers={"Content-Encoding": "br"},
+            body=body
+        )
+        self.assertEqual(res.code, http.client.UNSUPPORTED_MEDIA_TYPE)
+
+        res = self.fetch(
+            "/api/v1/students/",
+            method="POST",
+            headers={"Content-Encoding": "gzip"},
+            body=gzip.compress(b" " * (11 * 1024 * 1024))
+        )
+        self.assertEqual(res.code, http.client.REQUEST_ENTITY_TOO_LARGE)
+
     def test_post_non_json(self):
         res = self.fetch(
             "/api/v1/students/",
@@ -392,3 +441,906 @@ class TestErrors(TestBase):
                 'source': {'pointer': '/data/attributes/age'}}
                 ],
             'jsonapi': {'version': '1.0'}})
+
+
+class TestCompression(TestBase):
+    def get_app(self):
+        app = super().get_app()
+        api = Api(app, base_urlpath='/api/v2/')
+        api.compression = ResponseCompression(min_size=200)
+        api.route(resource_handlers.StudentList, "students_v2", "/students/")
+        return app
+
+    def test_compressed_collection(self):
+        for i in range(10):
+            self._create_one_student("john wick {}".format(i), age=10+i)
+
+        res = self.fetch("/api/v2/students/",
+                         headers={"Accept-Encoding": "gzip"},
+                         decompress_response=False)
+        self.assertEqual(res.code, http.client.OK)
+        self.assertEqual(res.headers["Content-Encoding"], "gzip")
+        self.assertEqual(res.headers.get_list("Vary"),
+                         ["Accept", "Accept-Encoding"])
+        payload = escape.json_decode(gzip.decompress(res.body))
+        self.assertEqual(len(payload["data"]), 10)
+
+        res = self.fetch("/api/v2/students/",
+                         headers={"Accept-Encoding": "identity"},
+                         decompress_response=False)
+        self.assertNotIn("Content-Encoding", res.headers)
+        payload = escape.json_decode(res.body)
+        self.assertEqual(len(payload["data"]), 10)
+
+    def test_small_payload_not_compressed(self):
+        res = self.fetch("/api/v2/students/",
+                         headers={"Accept-Encoding": "gzip"},
+                         decompress_response=False)
+        self.assertEqual(res.code, http.client.OK)
+        self.assertNotIn("Content-Encoding", res.headers)
+
+
+class TestStreaming(TestBase):
+    def get_app(self):
+        app = super().get_app()
+        self.api = api = Api(app, base_urlpath='/api/v2/')
+        self.admission = api.admission = AdmissionController(rate=100)
+        api.route(resource_handlers.StreamingStudentList,
+                  "students_v2", "/students/")
+        return app
+
+    def test_create_one(self):
+        res = self.fetch(
+            "/api/v2/students/",
+            method="POST",
+            body=escape.json_encode({
+                "data": {
+                    "type": "student",
+                    "attributes": {
+                        "name": "john wick",
+                        "age": 19,
+                    }
+                }
+            })
+        )
+        self.assertEqual(res.code, http.client.CREATED)
+        self.assertIn("/api/v1/students/0/", res.headers["Location"])
+
+    def test_create_many(self):
+        body = escape.json_encode({
+            "data": [{
+                "type": "student",
+                "attributes": {
+                    "name": "john wick {}".format(i),
+                    "age": 19,
+                }
+            } for i in range(20)]
+        })
+        res = self.fetch(
+            "/api/v2/students/",
+            method="POST",
+            headers={"Content-Encoding": "gzip"},
+            body=gzip.compress(escape.utf8(body))
+        )
+        self.assertEqual(res.code, http.client.CREATED)
+        payload = escape.json_decode(res.body)
+        self.assertEqual(len(payload["data"]), 20)
+        self.assertEqual(payload["data"][3], {
+            "type": "student",
+            "id": 3,
+            "links": {"self": "/api/v1/students/3/"}
+        })
+
+        res = self.fetch("/api/v1/students/?page%5Bsize%5D=50")
+        payload = escape.json_decode(res.body)
+        self.assertEqual(len(payload["data"]), 20)
+
+    def test_errors(self):
+        res = self.fetch(
+            "/api/v2/students/",
+            method="POST",
+            body=escape.json_encode({
+                "data": [{
+                    "type": "student",
+                    "attributes": {"name": "john wick", "age": 19}
+                }, {
+                    "type": "gnaka",
+                    "attributes": {"name": "john wick", "age": 19}
+                }]
+            })
+        )
+        self.assertEqual(res.code, http.client.CONFLICT)
+        self.assertEqual(
+            len(resource_handlers.WorkingDataLayer.collection), 1)
+
+        res = self.fetch("/api/v2/students/", method="POST",
+                         body='{"data": [')
+        self.assertEqual(res.code, http.client.BAD_REQUEST)
+
+    @gen_test
+    def test_disconnect(self):
+        stream = yield TCPClient().connect("127.0.0.1", self.get_http_port())
+        yield stream.write(
+            b"POST /api/v2/students/ HTTP/1.1\r\n"
+            b"Host: localhost\r\n"
+            b"Content-Length: 1000\r\n\r\n"
+            b'{"data": [')
+        while self.api.in_flight == 0:
+            yield gen.sleep(0.01)
+
+        stream.close()
+        for _ in range(100):
+            if self.api.in_flight == 0:
+                break
+            yield gen.sleep(0.01)
+
+        self.assertEqual(self.api.in_flight, 0)
+        self.assertEqual(self.admission.in_flight(
+            resource_handlers.StreamingStudentList), 0)
+
+
+class TestOffload(TestBase):
+    def get_app(self):
+        app = super().get_app()
+        self.executor = ThreadPoolExecutor(1)
+        self.addCleanup(self.executor.shutdown)
+        self.executor.submit = mock.Mock(wraps=self.executor.submit)
+
+        api = Api(app, base_urlpath='/api/v2/')
+        api.offload_policy = OffloadPolicy(self.executor,
+                                           min_items=5,
+                                           min_bytes=None)
+        api.route(resource_handlers.StudentList, "students_v2", "/students/")
+        return app
+
+    def test_offloaded_collection(self):
+        for i in range(5):
+            self._create_one_student("john wick {}".format(i), age=10+i)
+
+        res = self.fetch("/api/v2/students/?page%5Bsize%5D=4")
+        self.assertEqual(res.code, http.client.OK)
+        self.assertEqual(len(escape.json_decode(res.body)["data"]), 4)
+        self.assertFalse(self.executor.submit.called)
+
+        res = self.fetch("/api/v2/students/")
+        self.assertEqual(res.code, http.client.OK)
+        self.assertEqual(len(escape.json_decode(res.body)["data"]), 5)
+        self.assertTrue(self.executor.submit.called)
+
+
+class TestMemoryProfiling(TestBase):
+    def get_app(self):
+        app = super().get_app()
+        api = Api(app, base_urlpath='/api/v2/')
+        self.profiler = MemoryProfiler(sample_rate=1.0)
+        api.memory_profiler = self.profiler
+        api.route(resource_handlers.StudentList, "students_v2", "/students/")
+        return app
+
+    def test_profiled_phases(self):
+        for i in range(5):
+            self._create_one_student("john wick {}".format(i), age=10+i)
+
+        res = self.fetch("/api/v2/students/")
+        self.assertEqual(res.code, http.client.OK)
+
+        report = self.profiler.report()
+        self.assertEqual(
+            set(report["StudentList GET"].keys()),
+            {"authenticate", "data_layer", "dump", "encode",
+             "write"})
+        self.assertGreater(report["StudentList GET"]["dump"]["peak_max"], 0)
+
+
+class PreEncodedStudentList(resource_handlers.StudentList):
+    documents = {
+        "object": b'{"data": []}',
+        "empty": bytearray(b' {\n} \n'),
+        "invalid": b'[]',
+    }
+
+    def get(self, *args, **view_kwargs):
+        document = self.documents[self.get_query_argument("document")]
+        self._send_to_client(memoryview(document))
+
+
+class TestPreEncoded(TestBase):
+    def get_app(self):
+        app = super().get_app()
+        api = Api(app, base_urlpath='/api/v2/')
+        api.route(PreEncodedStudentList, "students_v2", "/students/")
+        return app
+
+    def test_pre_encoded(self):
+        for document, expected in [
+                ("object", {"data": [], "jsonapi": {"version": "1.0"}}),
+                ("empty", {"jsonapi": {"version": "1.0"}})]:
+            res = self.fetch("/api/v2/students/?document=" + document)
+            self.assertEqual(res.code, http.client.OK)
+            self.assertEqual(res.headers["Content-Type"],
+                             "application/vnd.api+json")
+            self.assertEqual(escape.json_decode(res.body), expected)
+
+        res = self.fetch("/api/v2/students/?document=invalid")
+        self.assertEqual(res.code, http.client.INTERNAL_SERVER_ERROR)
+
+
+class TestCompiledSchemas(TestCRUDAPI):
+    """Runs the CRUD tests with the compiled serializers."""
+
+    def setUp(self):
+        super().setUp()
+        patcher = mock.patch.object(resource_handlers.StudentList,
+                                    "compile_schemas", True)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        patcher = mock.patch.object(resource_handlers.StudentDetails,
+                                    "compile_schemas", True)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+
+class TestCachingDataLayer(TestCRUDAPI):
+    """Runs the CRUD tests through a CachingDataLayer."""
+
+    def setUp(self):
+        super().setUp()
+        self.cache = ObjectCache()
+        data_layer = {
+            "class": CachingDataLayer,
+            "wrapped": {"class": resource_handlers.WorkingDataLayer},
+            "cache": self.cache,
+        }
+        for resource in (resource_handlers.StudentList,
+                         resource_handlers.StudentDetails):
+            patcher = mock.patch.object(resource, "data_layer", data_layer)
+            patcher.start()
+            self.addCleanup(patcher.stop)
+
+    def test_cache_hits(self):
+        location = self._create_one_student("john wick", 39)
+        for _ in range(3):
+            res = self.fetch(location)
+            self.assertEqual(res.code, http.client.OK)
+
+        self.assertEqual(self.cache.hits, 2)
+
+
+class CoroutineDataLayer(resource_handlers.WorkingDataLayer):
+    """The in-memory data layer, with native coroutine operations that
+    yield to the IOLoop first."""
+
+    async def create_object(self, data, view_kwargs):
+        await gen.sleep(0)
+        return super().create_object(data, view_kwargs)
+
+    async def get_object(self, view_kwargs):
+        await gen.sleep(0)
+        return super().get_object(view_kwargs)
+
+    async def update_object(self, obj, data, view_kwargs):
+        await gen.sleep(0)
+        return super().update_object(obj, data, view_kwargs)
+
+    async def delete_object(self, obj, view_kwargs):
+        await gen.sleep(0)
+        return super().delete_object(obj, view_kwargs)
+
+    async def get_collection(self, qs, view_kwargs):
+        await gen.sleep(0)
+        return super().get_collection(qs, view_kwargs)
+
+
+class TestCoroutineDataLayer(TestCRUDAPI):
+    """Runs the CRUD tests with a native coroutine data layer."""
+
+    def setUp(self):
+        super().setUp()
+        CoroutineDataLayer.id = 0
+        data_layer = {"class": CoroutineDataLayer}
+        for resource in (resource_handlers.StudentList,
+                         resource_handlers.StudentDetails):
+            patcher = mock.patch.object(resource, "data_layer", data_layer)
+            patcher.start()
+            self.addCleanup(patcher.stop)
+
+
+class PrimaryDataLayer(resource_handlers.WorkingDataLayer):
+    """Its replication position is the number of objects created."""
+
+    def replication_position(self):
+        return type(self).id
+
+
+class ReplicaDataLayer(resource_handlers.WorkingDataLayer):
+    """Shares the objects of the primary, with a settable position."""
+    position = 0
+
+    async def replication_position(self):
+        return type(self).position
+
+
+class TestReplicatedDataLayer(TestCRUDAPI):
+    """Runs the CRUD tests through a ReplicatedDataLayer."""
+
+    def setUp(self):
+        super().setUp()
+        PrimaryDataLayer.id = 0
+        ReplicaDataLayer.position = 0
+        self.replica_set = ReplicaSet()
+        data_layer = {
+            "class": ReplicatedDataLayer,
+            "primary": {"class": PrimaryDataLayer},
+            "replicas": [{"class": ReplicaDataLayer}],
+            "replica_set": self.replica_set,
+        }
+        for resource in (resource_handlers.StudentList,
+                         resource_handlers.StudentDetails):
+            patcher = mock.patch.object(resource, "data_layer", data_layer)
+            patcher.start()
+            self.addCleanup(patcher.stop)
+
+    def test_consistency_token(self):
+        res = self.fetch("/api/v1/students/",
+                         method="POST",
+                         body=escape.json_encode({
+                             "data": {
+                                 "type": "student",
+                                 "attributes": {
+                                     "name": "john wick",
+                                     "age": 39,
+                                 }
+                             }
+                         }))
+        self.assertEqual(res.code, http.client.CREATED)
+        token = res.headers["X-Consistency-Token"]
+        self.assertEqual(token, "1")
+
+        res = self.fetch("/api/v1/students/0/")
+        self.assertEqual(res.code, http.client.OK)
+        self.assertEqual(self.replica_set.replica_reads, 1)
+
+        # The replica has not caught up with the token
+        headers = {"X-Consistency-Token": token}
+        res = self.fetch("/api/v1/students/0/", headers=headers)
+        self.assertEqual(res.code, http.client.OK)
+        self.assertEqual(self.replica_set.primary_reads, 1)
+
+        ReplicaDataLayer.position = 1
+        res = self.fetch("/api/v1/students/", headers=headers)
+        self.assertEqual(res.code, http.client.OK)
+        self.assertEqual(self.replica_set.replica_reads, 2)
+
+
+class TestAdmission(TestBase):
+    def get_app(self):
+        app = super().get_app()
+        api = Api(app, base_urlpath='/api/v2/')
+        self.admission = AdmissionController(rate=0.01, burst=2)
+        api.admission = self.admission
+        api.route(resource_handlers.StudentList, "students_v2", "/students/")
+        return app
+
+    def test_rate_limit(self):
+        for i in range(2):
+            res = self.fetch("/api/v2/students/")
+            self.assertEqual(res.code, http.client.OK)
+
+        res = self.fetch("/api/v2/students/")
+        self.assertEqual(res.code, http.client.TOO_MANY_REQUESTS)
+        self.assertGreaterEqual(int(res.headers["Retry-After"]), 99)
+        self.assertEqual(escape.json_decode(res.body)["errors"], [{
+            "status": "429",
+            "title": "Too many requests",
+        }])
+        self.assertEqual(
+            self.admission.in_flight(resource_handlers.StudentList), 0)
+
+        # The other Api is not limited
+        res = self.fetch("/api/v1/students/")
+        self.assertEqual(res.code, http.client.OK)
+
+
+class SlowDataLayer(resource_handlers.WorkingDataLayer):
+    calls = 0
+
+    async def get_collection(self, qs, view_kwargs):
+        type(self).calls += 1
+        await gen.sleep(0.05)
+        return super().get_collection(qs, view_kwargs)
+
+
+class SlowStudentList(resource_handlers.StudentList):
+    data_layer = {
+        "class": SlowDataLayer,
+    }
+
+
+class UnhashableUserAuthenticator(Authenticator):
+    @classmethod
+    def authenticate(cls, handler):
+        return {"name": "jane"}
+
+
+class TestCoalescing(TestBase):
+    def get_app(self):
+        app = super().get_app()
+        api = Api(app, base_urlpath='/api/v2/')
+        self.single_flight = SingleFlight()
+        api.single_flight = self.single_flight
+        api.route(SlowStudentList, "students_v2", "/students/")
+
+        api = Api(app, base_urlpath='/api/v3/')
+        api.single_flight = self.single_flight
+        api.authenticator = UnhashableUserAuthenticator
+        api.route(SlowStudentList, "students_v3", "/students/")
+        return app
+
+    @gen_test
+    def test_coalesced_get(self):
+        SlowDataLayer.calls = 0
+        urls = ["/api/v2/students/?page[size]=2&include=",
+                "/api/v2/students/?include=&page[size]=2",
+                "/api/v2/students/?page[size]=2&include=",
+                "/api/v2/students/"]
+
+        responses = yield [self.http_client.fetch(self.get_url(url))
+                           for url in urls]
+
+        self.assertEqual([res.code for res in responses],
+                         [http.client.OK] * 4)
+        self.assertEqual(responses[0].body, responses[1].body)
+        self.assertEqual(responses[0].body, responses[2].body)
+        self.assertEqual(SlowDataLayer.calls, 2)
+        self.assertEqual(self.single_flight.shared, 2)
+
+    @gen_test
+    def test_unhashable_scope(self):
+        SlowDataLayer.calls = 0
+        responses = yield [
+            self.http_client.fetch(self.get_url("/api/v3/students/"))
+            for _ in range(2)]
+
+        self.assertEqual([res.code for res in responses],
+                         [http.client.OK] * 2)
+        self.assertEqual(SlowDataLayer.calls, 2)
+        self.assertEqual(self.single_flight.shared, 0)
+
+
+class HangingDataLayer(resource_handlers.WorkingDataLayer):
+    cancelled_layers = []
+
+    @gen.coroutine
+    def get_collection(self, qs, view_kwargs):
+        yield self.cancellation.wait()
+        type(self).cancelled_layers.append(self)
+        raise gen.Return(([], 0))
+
+
+class HangingStudentList(resource_handlers.StudentList):
+    data_layer = {
+        "class": HangingDataLayer,
+    }
+    timeouts = {"get_collection": 0.05}
+
+
+class TestTimeouts(TestBase):
+    def get_app(self):
+        app = super().get_app()
+        api = Api(app, base_urlpath='/api/v2/')
+        api.timeouts = {"default": 0.01}
+        api.route(HangingStudentList, "students_v2", "/students/")
+        return app
+
+    def test_timeout(self):
+        HangingDataLayer.cancelled_layers = []
+        res = self.fetch("/api/v2/students/")
+
+        self.assertEqual(res.code, http.client.GATEWAY_TIMEOUT)
+        error = escape.json_decode(res.body)["errors"][0]
+        self.assertEqual(error["title"], "Data layer timeout")
+        self.assertEqual(len(HangingDataLayer.cancelled_layers), 1)
+
+    def test_get_timeout(self):
+        handler = HangingStudentList.__new__(HangingStudentList)
+        handler._registry = mock.Mock(timeouts={"default": 0.01,
+                                                "delete_object": 1})
+        self.assertEqual(handler._get_timeout("get_collection"), 0.05)
+        self.assertEqual(handler._get_timeout("delete_object"), 1)
+        self.assertEqual(handler._get_timeout("get_object"), 0.01)
+
+        handler._registry = mock.Mock(timeouts={})
+        self.assertIsNone(handler._get_timeout("get_object"))
+
+
+class UserDataLayer(resource_handlers.WorkingDataLayer):
+    users = []
+
+    def get_collection(self, qs, view_kwargs):
+        type(self).users.append(self.current_user)
+        return super().get_collection(qs, view_kwargs)
+
+
+class UserStudentList(resource_handlers.StudentList):
+    data_layer = {
+        "class": UserDataLayer,
+    }
+
+
+class SyncAuthenticator(Authenticator):
+    @classmethod
+    def authenticate(cls, handler):
+        return handler.request.headers.get("X-User")
+
+
+class NativeAuthenticator(Authenticator):
+    @classmethod
+    async def authenticate(cls, handler):
+        await gen.sleep(0)
+        return handler.request.headers.get("X-User")
+
+
+class TestAuthenticators(TestBase):
+    def get_app(self):
+        app = super().get_app()
+        self.api = Api(app, base_urlpath='/api/v2/')
+        self.api.route(UserStudentList, "students_v2", "/students/")
+        return app
+
+    def test_authenticators(self):
+        for authenticator in (SyncAuthenticator, NativeAuthenticator):
+            UserDataLayer.users = []
+            self.api.authenticator = authenticator
+            res = self.fetch("/api/v2/students/", headers={"X-User": "bob"})
+
+            self.assertEqual(res.code, http.client.OK)
+            self.assertEqual(UserDataLayer.users, ["bob"])
+
+
+class TestChangeFeed(TestBase):
+    def get_app(self):
+        app = super().get_app()
+        self.api = Api(app, base_urlpath='/api/v2/')
+        self.api.route(resource_handlers.StudentList, "students_v2",
+                       "/students/")
+        self.api.route(resource_handlers.StudentDetails, "student_v2",
+                       "/students/(?P<id>[0-9]+)/")
+        self.feed = self.api.route_change_feed(
+            resource_handlers.StudentList, "students_feed",
+            "/students/changes/")
+        return app
+
+    @gen_test
+    def test_change_feed(self):
+        chunks = []
+        response = self.http_client.fetch(
+            self.get_url("/api/v2/students/changes/"),
+            streaming_callback=chunks.append)
+        while self.feed.subscribers == 0:
+            yield gen.sleep(0.01)
+
+        res = yield self.http_client.fetch(
+            self.get_url("/api/v2/students/"),
+            method="POST",
+            body=escape.json_encode({
+                "data": {
+                    "type": "student",
+                    "attributes": {"name": "john wick", "age": 39},
+                }
+            }))
+        self.assertEqual(res.code, http.client.CREATED)
+
+        res = yield self.http_client.fetch(
+            self.get_url("/api/v2/students/0/"), method="DELETE")
+        self.assertEqual(res.code, http.client.OK)
+
+        while self.feed.last_id < 2:
+            yield gen.sleep(0.01)
+        yield gen.sleep(0.05)
+        self.feed.close()
+
+        res = yield response
+        self.assertEqual(res.headers["Content-Type"], "text/event-stream")
+        self.assertEqual(
+            b"".join(chunks),
+            b':\n\n'
+            b'id: 1\nevent: created\ndata: {"type":"student","id":"0"}\n\n'
+            b'id: 2\nevent: deleted\ndata: {"type":"student","id":"0"}\n\n')
+
+    @gen_test
+    def test_resume(self):
+        self.feed.publish("created", {"type": "student", "id": "0"})
+        self.feed.publish("deleted", {"type": "student", "id": "0"})
+
+        chunks = []
+        response = self.http_client.fetch(
+            self.get_url("/api/v2/students/changes/"),
+            headers={"Last-Event-ID": "1"},
+            streaming_callback=chunks.append)
+        while self.feed.subscribers == 0:
+            yield gen.sleep(0.01)
+        yield gen.sleep(0.05)
+        self.feed.close()
+
+        yield response
+        self.assertEqual(
+            b"".join(chunks),
+            b':\n\n'
+            b'id: 2\nevent: deleted\ndata: {"type":"student","id":"0"}\n\n')
+
+    @gen_test
+    def test_authorize(self):
+        self.api.authenticator = SyncAuthenticator
+        self.feed.authorize = lambda user, event: user == "bob"
+
+        chunks = {"bob": [], "alice": []}
+        responses = [
+            self.http_client.fetch(
+                self.get_url("/api/v2/students/changes/"),
+                headers={"X-User": user},
+                streaming_callback=chunks[user].append)
+            for user in chunks]
+        while self.feed.subscribers < 2:
+            yield gen.sleep(0.01)
+
+        self.feed.publish("created", {"type": "student", "id": "0"})
+        yield gen.sleep(0.05)
+        self.feed.close()
+
+        yield responses
+        self.assertEqual(
+            b"".join(chunks["bob"]),
+            b':\n\n'
+            b'id: 1\nevent: created\ndata: {"type":"student","id":"0"}\n\n')
+        self.assertEqual(b"".join(chunks["alice"]), b':\n\n')
+
+
+class TrackingDataLayer(resource_handlers.WorkingDataLayer):
+    changelog = ChangeLog()
+
+    def create_object(self, data, view_kwargs):
+        obj = super().create_object(data, view_kwargs)
+        self.changelog.record(obj["id"])
+        return obj
+
+    def update_object(self, obj, data, view_kwargs):
+        result = super().update_object(obj, data, view_kwargs)
+        self.changelog.record(view_kwargs["id"])
+        return result
+
+    def delete_object(self, obj, view_kwargs):
+        super().delete_object(obj, view_kwargs)
+        self.changelog.record(view_kwargs["id"], deleted=True)
+
+    def get_changes(self, qs, since, view_kwargs):
+        ids, deleted, token, more = self.changelog.changes(
+            since, qs.pagination.get("size", DEFAULT_PAGE_SIZE))
+        return [self.collection[id] for id in ids], deleted, token, more
+
+
+class TrackingStudentList(resource_handlers.StudentList):
+    data_layer = {
+        "class": TrackingDataLayer,
+    }
+
+
+class TrackingStudentDetails(resource_handlers.StudentDetails):
+    data_layer = TrackingStudentList.data_layer
+
+
+class TestDeltaQueries(TestBase):
+    def setUp(self):
+        super().setUp()
+        TrackingDataLayer.changelog = ChangeLog()
+
+    def get_app(self):
+        app = web.Application(debug=True)
+        api = Api(app, base_urlpath='/api/v1/')
+        api.route(TrackingStudentList, "students", "/students/")
+        api.route(TrackingStudentDetails, "student",
+                  "/students/(?P<id>[0-9]+)/")
+        api.route(resource_handlers.StudentList, "untracked_students",
+                  "/untracked_students/")
+        return app
+
+    def _get(self, url):
+        res = self.fetch(url)
+        return res.code, escape.json_decode(res.body)
+
+    def test_delta(self):
+        for name in ("john", "paul", "ringo"):
+            self._create_one_student(name, 20)
+
+        code, doc = self._get("/api/v1/students/?since=&page[size]=2")
+        self.assertEqual(code, http.client.OK)
+        self.assertEqual([item["id"] for item in doc["data"]], [0, 1])
+        self.assertEqual(doc["meta"]["deleted"], [])
+        self.assertIn("since=" + urllib.parse.quote(doc["meta"]["since"]),
+                      doc["links"]["next"])
+
+        next_url = urllib.parse.urlsplit(doc["links"]["next"])
+        code, doc = self._get(next_url.path + "?" + next_url.query)
+        self.assertEqual([item["id"] for item in doc["data"]], [2])
+        self.assertNotIn("next", doc["links"])
+        token = doc["meta"]["since"]
+
+        self.fetch("/api/v1/students/1/", method="DELETE")
+        self.fetch("/api/v1/students/2/",
+                   method="PATCH",
+                   body=escape.json_encode({
+                       "data": {
+                           "type": "student",
+                           "id": "2",
+                           "attributes": {"name": "george"},
+                       }
+                   }))
+
+        code, doc = self._get(
+            "/api/v1/students/?" + urllib.parse.urlencode({"since": token}))
+        self.assertEqual(code, http.client.OK)
+        self.assertEqual([(item["id"], item["attributes"]["name"])
+                          for item in doc["data"]], [(2, "george")])
+        self.assertEqual(doc["meta"]["deleted"],
+                         [{"type": "student", "id": "1"}])
+
+        code, doc = self._get(
+            "/api/v1/students/?" +
+            urllib.parse.urlencode({"since": doc["meta"]["since"]}))
+        self.assertEqual(doc["data"], [])
+
+    def test_errors(self):
+        code, doc = self._get("/api/v1/students/?since=foo.bar")
+        self.assertEqual(code, http.client.BAD_REQUEST)
+        self.assertEqual(doc["errors"][0]["source"],
+                         {"parameter": "since"})
+
+        code, doc = self._get("/api/v1/students/?since=foo.0")
+        self.assertEqual(code, http.client.GONE)
+
+        code, doc = self._get("/api/v1/students/?since=&page[number]=1")
+        self.assertEqual(code, http.client.BAD_REQUEST)
+
+    def test_unsupported(self):
+        code, doc = self._get("/api/v1/untracked_students/?since=")
+        self.assertEqual(code, http.client.BAD_REQUEST)
+        self.assertEqual(doc["errors"][0]["detail"],
+                         "Delta queries are not supported")
+
+
+class TestExport(TestBase):
+    def test_export(self):
+        for age in range(5):
+            self._create_one_student("student {}".format(age), age)
+
+        with mock.patch.object(resource_handlers.StudentList,
+                               "export_batch_size", 2):
+            res = self.fetch(
+                "/api/v1/students/?fields[student]=name&page[size]=1",
+                headers={"Accept": "application/x-ndjson"})
+
+        self.assertEqual(res.code, http.client.OK)
+        self.assertEqual(res.headers["Content-Type"], "application/x-ndjson")
+        self.assertEqual(res.headers.get_list("Vary"), ["Accept"])
+        lines = res.body.decode("utf-8").splitlines()
+        objects = [escape.json_decode(line) for line in lines]
+        self.assertEqual([obj["id"] for obj in objects], [0, 1, 2, 3, 4])
+        self.assertEqual(objects[3]["attributes"], {"name": "student 3"})
+        self.assertEqual(objects[3]["type"], "student")
+
+    def test_export_negotiation(self):
+        self._create_one_student("john wick", 39)
+
+        for accept in ("application/x-ndjson;q=0",
+                       "application/vnd.api+json, application/x-ndjson",
+                       "*/*"):
+            res = self.fetch("/api/v1/students/", headers={"Accept": accept})
+            self.assertEqual(res.code, http.client.OK)
+            self.assertEqual(res.headers["Content-Type"],
+                             "application/vnd.api+json")
+            self.assertEqual(res.headers.get_list("Vary"), ["Accept"])
+
+        res = self.fetch(
+            "/api/v1/students/",
+            headers={"Accept": "application/vnd.api+json;q=0.5, "
+                               "application/x-ndjson"})
+        self.assertEqual(res.headers["Content-Type"], "application/x-ndjson")
+
+    def test_export_empty(self):
+        res = self.fetch("/api/v1/students/",
+                         headers={"Accept": "application/x-ndjson"})
+
+        self.assertEqual(res.code, http.client.OK)
+        self.assertEqual(res.body, b"")
+
+
+class TestRepresentations(TestBase):
+    def get_app(self):
+        app = super().get_app()
+        self.api = Api(app, base_urlpath='/api/v2/')
+        self.api.representations.register(
+            resource_handlers.SortedJsonRepresentation())
+        self.api.route(resource_handlers.StudentList, "students_v2",
+                       "/students/")
+        self.api.route(resource_handlers.StudentDetails, "student_v2",
+                       "/students/(?P<id>[0-9]+)/")
+        return app
+
+    def test_negotiation(self):
+        res = self.fetch(
+            "/api/v2/students/",
+            method="POST",
+            headers={"Content-Type": "application/x-sorted+json"},
+            body=json.dumps({
+                "data": {
+                    "type": "student",
+                    "attributes": {"name": "john wick", "age": 39},
+                }
+            }))
+        self.assertEqual(res.code, http.client.CREATED)
+
+        res = self.fetch("/api/v2/students/0/",
+                         headers={"Accept": "application/x-sorted+json"})
+        self.assertEqual(res.code, http.client.OK)
+        self.assertEqual(res.headers["Content-Type"],
+                         "application/x-sorted+json")
+        self.assertEqual(res.headers.get_list("Vary"), ["Accept"])
+        document = json.loads(res.body.decode("utf-8"))
+        self.assertEqual(document["data"]["attributes"]["name"],
+                         "john wick")
+        self.assertEqual(res.body, json.dumps(document,
+                                              sort_keys=True).encode("utf-8"))
+
+        res = self.fetch("/api/v2/students/0/")
+        self.assertEqual(res.headers["Content-Type"],
+                         "application/vnd.api+json")
+
+    def test_errors(self):
+        res = self.fetch("/api/v2/students/10/",
+                         headers={"Accept": "application/x-sorted+json"})
+        self.assertEqual(res.code, http.client.NOT_FOUND)
+        self.assertEqual(res.headers["Content-Type"],
+                         "application/x-sorted+json")
+        self.assertEqual(res.headers.get_list("Vary"), ["Accept"])
+        self.assertEqual(res.body, json.dumps(
+            {"errors": [{"status": "404", "title": "Object not found"}],
+             "jsonapi": {"version": "1.0"}},
+            sort_keys=True).encode("utf-8"))
+
+
+class TestMetrics(TestBase):
+    def get_app(self):
+        app = super().get_app()
+        api = Api(app, base_urlpath='/api/v2/')
+        self.metrics = api.route_metrics("metrics", "/metrics/")
+        api.route(resource_handlers.StudentList, "students_v2", "/students/")
+        api.route(
+            resource_handlers.StudentDetails,
+            "student_v2",
+            "/students/(?P<id>[0-9]+)/")
+        return app
+
+    def test_metrics(self):
+        res = self.fetch("/api/v2/students/")
+        self.assertEqual(res.code, http.client.OK)
+        res = self.fetch("/api/v2/students/1/")
+        self.assertEqual(res.code, http.client.NOT_FOUND)
+
+        res = self.fetch("/api/v2/metrics/")
+        self.assertEqual(res.code, http.client.OK)
+        self.assertTrue(res.headers["Content-Type"].startswith("text/plain"))
+        text = res.body.decode("utf-8")
+        self.assertIn('jsonapi_requests_total{method="GET",'
+                      'resource="StudentList",status="200"} 1\n', text)
+        self.assertIn('jsonapi_requests_total{method="GET",'
+                      'resource="StudentDetails",status="404"} 1\n', text)
+        self.assertIn('jsonapi_errors_total{exception="ObjectNotFound",'
+                      'resource="StudentDetails"} 1\n', text)
+        self.assertEqual(self.metrics.data_layer_duration.count(
+            "StudentList", "get_collection"), 1)
+        self.assertEqual(self.metrics.phase_duration.count(
+            "StudentList", "authenticate"), 1)
+
+        # The other Api is not measured
+        self.fetch("/api/v1/students/")
+        self.assertEqual(self.metrics.requests.get(
+            "StudentList", "GET", "200"), 1)